@@ -2,23 +2,26 @@ import os
 from PIL import Image
 import numpy as np
 import sys
-from src.Utils import get_matrix_diff
+from src.AbilityMatcher import AbilityMatcher
+from src.TemplateStore import TemplateStore
+from src.UnknownAbilitiesIndex import UnknownAbilitiesIndex
 
 
 def test_diffs(templates, images_unknown, plot=False, thresh=1.0, debug=True):
     print("Testing all distances")
-
-    for np1, fn in images_unknown:
-        files, dists = [], []
+    matcher = AbilityMatcher({fn_template: np_template for np_template, fn_template in templates})
+    all_dists = matcher.distances([np1 for np1, _ in images_unknown])
+    for (np1, fn), dists in zip(images_unknown, all_dists):
+        files = matcher.names
         files_found = []
-        for np_template, fn_template in templates:
-            dist = get_matrix_diff(np1, np_template)
-            if debug: print("{:20}: {}".format(fn, dist))
-            files.append(fn)
-            dists.append(dist)
+        for fn_template, dist in zip(files, dists):
+            if debug: print("{:20}: {}".format(fn_template, dist))
             if dist < thresh:
                 files_found.append(fn_template)
-        print("File {}: Max={}, Min={}, Abilities={}".format(fn, max(dists), min(dists), ", ".join(files_found)))
+        sorted_dists = np.sort(dists)
+        margin = sorted_dists[1] - sorted_dists[0] if len(sorted_dists) > 1 else 0
+        print("File {}: Max={}, Min={}, Margin={}, Abilities={}".format(fn, max(dists), min(dists), margin,
+                                                                       ", ".join(files_found)))
 
         if plot:
             import matplotlib.pyplot as plt
@@ -34,9 +37,7 @@ def test_diffs(templates, images_unknown, plot=False, thresh=1.0, debug=True):
 
 
 def load_file_as_np(filename):
-    im1 = Image.open(filename)
-    np1 = np.array(im1.getdata())
-    return np1
+    return TemplateStore.loadImage(filename)
 
 
 def check_all():
@@ -48,8 +49,11 @@ def check_all():
         templates.append([load_file_as_np(os.path.join(fld_templates, file)), file])
     print("Loading images")
     images_unknown = []
-    for file in os.listdir(fld_unknown):
-        images_unknown.append([load_file_as_np(os.path.join(fld_unknown, file)), file])
+    # one image per group of near identical unknowns, most seen first
+    index = UnknownAbilitiesIndex(fld_unknown)
+    for entry in sorted(index.entries, key=lambda e: -e["count"]):
+        images_unknown.append([load_file_as_np(os.path.join(fld_unknown, entry["fn"])),
+                               "{} (seen {} times)".format(entry["fn"], entry["count"])])
     test_diffs(templates, images_unknown, plot=False, thresh=4, debug=False)
 
 
@@ -59,7 +63,7 @@ def check_one():
     templates = []
     for file in os.listdir(fld_templates):
         templates.append([load_file_as_np(os.path.join(fld_templates, file)), file])
-    images_unknown = [load_file_as_np(fn), os.path.basename(fn)]
+    images_unknown = [[load_file_as_np(fn), os.path.basename(fn)]]
 
     test_diffs(templates, images_unknown, plot=True, thresh=4, debug=False)
 
@@ -0,0 +1,27 @@
+import os
+import sys
+import time
+import logging
+from src.Utils import initialize_logging
+from src import __version__
+from src.FarmOrchestrator import FarmOrchestrator
+
+if __name__ == "__main__":
+    initialize_logging(logging.INFO)
+    logging.info(f"******** ARCHERO BOT FARM v{__version__} STARTED ********")
+    report_seconds = 600  # seconds between farm throughput logs
+    farm = FarmOrchestrator(os.path.join(os.getcwd(), "datas"), os.path.join(os.getcwd(), "farm"))
+    farm.discover()
+    if farm.start() == 0:
+        logging.error("No device available. Check 'adb devices'")
+        sys.exit(1)
+    try:
+        while len(farm.runningDevices()) > 0:
+            time.sleep(report_seconds)
+            farm.discover()
+            farm.start()
+            farm.logThroughput()
+    except KeyboardInterrupt:
+        logging.info("Stopping farm")
+    farm.stop()
+    farm.logThroughput()
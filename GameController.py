@@ -19,6 +19,10 @@ if __name__ == "__main__":
     MainWindow.setWindowTitle("Game Controller")
     data_path = os.path.join(os.getcwd(), "datas")
     model = GameControllerModel(data_path)
+    if "--calibrate" in sys.argv:
+        # play normally with default waits, recording latencies and fitting this device timing profile
+        logging.info("Calibration run: building device timing profile in %s" % model.engine.timing_profile_path)
+        model.engine.calibrating = True
     controller = GameControllerController(model)
     ui = GameControllerWindow(model, controller)
     ui.setupUi(MainWindow)
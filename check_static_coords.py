@@ -8,7 +8,7 @@ from src.Utils import readAllSizesFolders
 
 def getImageFrame(path: str):
     with Image.open(path, 'r') as im:
-        pixval = np.array(im.getdata())
+        pixval = np.asarray(im.convert("RGBA")).reshape(-1, 4)
     return pixval
 
 
@@ -36,39 +36,52 @@ screen_conector.changeScreenSize(width, heigth)
 screen_conector.debug = debug
 static_coords = screen_conector.static_coords
 
-files = os.listdir(screens_path)
-files.sort()
+files = [f for f in sorted(os.listdir(screens_path)) if f not in excluded]
+chunk_size = 32  # screens loaded at once (a 1080x1920 frame is about 8 MB)
+# All checks over all screens, one pass per chunk: frames x states matrix
+names, matches, margins, doors = None, [], {}, []
+for start in range(0, len(files), chunk_size):
+    frames = [getImageFrame(os.path.join(screens_path, file)) for file in files[start:start + chunk_size]]
+    names, chunk_matches, chunk_margins = screen_conector.getFramesStateMatrix(frames)
+    matches.append(chunk_matches)
+    for k, m in chunk_margins.items():
+        margins.setdefault(k, []).append(m)
+    doors += [screen_conector.detectDoorsOpen(frame) for frame in frames]
+    del frames
+if len(matches) > 0:
+    matches = np.concatenate(matches)
+    margins = {k: np.concatenate(m) for k, m in margins.items()}
 all_ok = True
-for file in files:
+for n_file, file in enumerate(files):
     if debug:
         print("\n\nChecking %s"%file)
-    if file not in excluded:
-        full_path = os.path.join(screens_path, file)
-        frame = getImageFrame(full_path)
-        complete_frame = screen_conector.getFrameStateComplete(frame)
-        computed = [k for k, v in complete_frame.items() if v]
-        sum = len(computed)
-        ok = False
-        exergy_print = '' if not screen_conector.checkFrame('least_5_energy', frame) else ' + least_5_energy'
-        open_door_print = '' if not screen_conector.checkDoorsOpen(frame) else ' + door_is_open'
-        if sum == 0:
-            print("NO_DETECTION - %s %s %s" % (file, exergy_print, open_door_print))
-        elif sum == 1:
-            print("OK - %s: %s %s %s" % (file, computed[0], exergy_print, open_door_print))
+        for k, m in zip(names, matches[n_file]):
+            print("%s: %s, margins: %s" % (k, "equal" if m else "not equal", margins[k][n_file].tolist()))
+    computed = [k for k, m in zip(names, matches[n_file]) if m and k in static_coords]
+    sum = len(computed)
+    ok = False
+    has_energy = 'least_5_energy' in names and matches[n_file][names.index('least_5_energy')]
+    exergy_print = '' if not has_energy else ' + least_5_energy'
+    door = doors[n_file]
+    open_door_print = '' if door is None else ' + door_is_open (%s)' % door
+    if sum == 0:
+        print("NO_DETECTION - %s %s %s" % (file, exergy_print, open_door_print))
+    elif sum == 1:
+        print("OK - %s: %s %s %s" % (file, computed[0], exergy_print, open_door_print))
+        ok = True
+    else:
+        ones_name_purged_singular = [k for k in computed if
+                                     len(screen_conector.static_coords[k]["coordinates"]) > 1]
+        removed = [k for k in computed if k not in ones_name_purged_singular]
+        if len(ones_name_purged_singular) == 0:
+            print("MUL_DETECTIONS %s: %s %s %s" % (file, ", ".join(computed), exergy_print, open_door_print))
+        elif len(ones_name_purged_singular) == 1:
+            print("OK - %s: %s. Extra detected singulars: %s %s %s" % (
+                file, ones_name_purged_singular[0], ", ".join(removed), exergy_print, open_door_print))
             ok = True
         else:
-            ones_name_purged_singular = [k for k in computed if
-                                         len(screen_conector.static_coords[k]["coordinates"]) > 1]
-            removed = [k for k in computed if k not in ones_name_purged_singular]
-            if len(ones_name_purged_singular) == 0:
-                print("MUL_DETECTIONS %s: %s %s %s" % (file, ", ".join(computed), exergy_print, open_door_print))
-            elif len(ones_name_purged_singular) == 1:
-                print("OK - %s: %s. Extra detected singulars: %s %s %s" % (
-                    file, ones_name_purged_singular[0], ", ".join(removed), exergy_print, open_door_print))
-                ok = True
-            else:
-                print("MUL_DETECTIONS %s: %s %s %s" % (file, ", ".join(ones_name_purged_singular), exergy_print, open_door_print))
-        all_ok = all_ok and ok
+            print("MUL_DETECTIONS %s: %s %s %s" % (file, ", ".join(ones_name_purged_singular), exergy_print, open_door_print))
+    all_ok = all_ok and ok
 
 if all_ok:
     print("All tests passed!")
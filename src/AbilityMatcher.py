@@ -0,0 +1,104 @@
+import logging
+import numpy as np
+from PIL import Image
+
+
+def ability_signature(image, size: int = 16) -> np.ndarray:
+    """
+    Returns a (size, size, 4) uint8 thumbnail (box filter) of an RGBA image, used to prefilter templates.
+    """
+    if not isinstance(image, Image.Image):
+        image = Image.fromarray(np.asarray(image, dtype=np.uint8), "RGBA")
+    return np.asarray(image.convert("RGBA").resize((size, size), Image.BOX), dtype=np.uint8)
+
+
+ability_signature.cache_key = "ability_signature_16"
+
+
+class AbilityMatcher(object):
+    """
+    Matches ability crops (or any crops of same size of a templates set) against all templates at once.
+    Templates are stacked in a (T, h, w, 4) uint8 array; distance is the mean absolute difference
+    (same value of Utils.get_matrix_diff).
+    When prefilter_k > 0, crops are first compared to small signatures of the templates and the exact
+    distance is computed only for the prefilter_k nearest ones (others get an infinite distance).
+    kind names the templates set in logs (e.g. "ability", "door").
+    """
+
+    def __init__(self, templates: dict, signatures: dict = None, prefilter_k: int = 0, kind: str = "ability"):
+        self.kind = kind
+        self.names = []
+        stack = []
+        shape = None
+        for name, template in templates.items():
+            shape = template.shape if shape is None else shape
+            if template.shape != shape:
+                logging.warning("%s template '%s' has shape %s instead of %s. Skipping" % (
+                    self.kind.capitalize(), name, template.shape, shape))
+                continue
+            self.names.append(name)
+            stack.append(template)
+        self.shape = shape
+        self.stack = np.stack(stack) if len(stack) > 0 else np.zeros((0, 1, 1, 4), dtype=np.uint8)
+        self.prefilter_k = prefilter_k
+        self.signatures = None
+        if prefilter_k > 0 and len(self.names) > 0:
+            if signatures is None or any(name not in signatures for name in self.names):
+                signatures = {name: ability_signature(t) for name, t in zip(self.names, stack)}
+            self.signatures = np.stack([signatures[name] for name in self.names])
+
+    @staticmethod
+    def _absDiffMean(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        # absolute difference in uint8 without wrap around: max - min
+        diff = np.maximum(a, b)
+        diff -= np.minimum(a, b)
+        return diff.reshape(diff.shape[0], diff.shape[1], -1).sum(axis=2, dtype=np.uint64) / float(diff[0, 0].size)
+
+    def _stackCrops(self, crops: list) -> np.ndarray:
+        crops = np.stack([np.asarray(c, dtype=np.uint8) for c in crops])
+        if len(self.names) > 0 and crops.shape[1:] != self.stack.shape[1:]:
+            raise ValueError("Crops shape %s differs from templates %s" % (crops.shape[1:], self.stack.shape[1:]))
+        return crops
+
+    def distances(self, crops: list) -> np.ndarray:
+        """
+        Returns a (len(crops), T) matrix of exact distances between every crop and every template.
+        """
+        crops = self._stackCrops(crops)
+        if len(self.names) == 0:
+            return np.zeros((len(crops), 0))
+        return self._absDiffMean(crops[:, None], self.stack[None])
+
+    def shortlist(self, crops: list) -> np.ndarray:
+        """
+        Returns a (len(crops), k) matrix with the indices of the prefilter_k templates nearest to each crop
+        by signature distance.
+        """
+        sigs = np.stack([ability_signature(c) for c in crops])
+        sig_dists = self._absDiffMean(sigs[:, None], self.signatures[None])
+        return np.argsort(sig_dists, axis=1, kind="stable")[:, :self.prefilter_k]
+
+    def prefilteredDistances(self, crops: list) -> np.ndarray:
+        """
+        Same as distances, but exact distances are computed only on the shortlist of each crop.
+        """
+        if self.signatures is None or self.prefilter_k >= len(self.names):
+            return self.distances(crops)
+        crops = self._stackCrops(crops)
+        candidates = self.shortlist(crops)
+        dists = np.full((len(crops), len(self.names)), np.inf)
+        for i, idx in enumerate(candidates):
+            dists[i, idx] = self._absDiffMean(crops[i:i + 1, None], self.stack[None, idx])[0]
+        return dists
+
+    def match(self, crops: list, threshold: float) -> (list, np.ndarray):
+        """
+        Returns the nearest template name of each crop ('unknown' if its distance is not under threshold)
+        and the distance matrix.
+        """
+        dists = self.prefilteredDistances(crops)
+        found = []
+        for row in dists:
+            best = int(np.argmin(row)) if len(row) > 0 else -1
+            found.append(self.names[best] if best >= 0 and row[best] < threshold else "unknown")
+        return found, dists
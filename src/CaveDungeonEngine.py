@@ -1,7 +1,10 @@
 import logging
 import json
 import time
+import threading
 from datetime import datetime
+from concurrent.futures import Future, wait
+import numpy as np
 from PyQt5.QtCore import QObject, pyqtSignal
 from src.UsbConnector import UsbConnector
 from src.GameScreenConnector import GameScreenConnector
@@ -10,6 +13,12 @@ from src.Utils import loadJsonData, readAllSizesFolders, buildDataFolder, getCoo
 from src.GameChapters import DungeonLevelType, BuildChapters, BuildLevelsTypes, MaxLevelFromType
 from src.BotStrategies import HealingStrategy, EnergyStrategy, VIPSub, BattlepassAdvSub, ReviveIfDead
 from src.LocalEngineSettingsManager import LocalEngineSettingsManager, LocalEngineSettings
+from src.PlayScheduler import PlayScheduler
+from src.InputDispatcher import InputDispatcher
+from src.MacroCompiler import MacroCompiler
+from src.CoordsCompiler import CoordsCompiler
+from src.TimingProfile import TimingProfile
+from src.RouteTable import RouteTable
 import os
 
 
@@ -29,13 +38,21 @@ class CaveEngine(QObject):
     currentDungeonChanged = pyqtSignal(int, name="currentDungeonChanged")
 
     max_level = 20  # set loops for playCave and linked to GUI logs(default is 20, DO NOT CHANGE)
-    playtime = 60  # set loop time for letPlay (default 60, total loops = playtime/self.check_seconds)
-    max_loops_popup = 10  # set loops for reactGamePopups (default 10, times to check for popups)
+    # set max time for letPlay (default 60, wall clock seconds of a room, no longer a loops count:
+    # screen checks are scheduled by PlayScheduler)
+    playtime = 60
+    max_loops_popup = 10  # set loops for reactGamePopups (default 10, popups handled or seconds on unknown screens)
+    popup_poll = 0.3  # seconds between reactGamePopups checks without capture stream
     max_loops_game = 1000  # set loops for start_one_game (default 100, farming cycles)
     max_wait = 5  # set loops for final_boss (default 5, increase sleep screens if needed more time)
     sleep_btw_screens = 8  # set wait between loops for final_boss (default 8, in seconds)
 
     UseGeneratedData = False  # Set True to use TouchManager generated data
+    UseCaptureStream = False  # Set True to keep a background screen capture stream (faster frames, more device load)
+    CenterBeforeExit = False  # Set True to center player (from his HP bar) before every exit movement
+    CenterMinConfidence = 0.6  # min share of HP bar green pixels in the player group to trust his position
+    DoorActivityRatio = 0.25  # share of door light line lit to poll screen faster (door about to open)
+    MacroAbortChecks = ["you_died_ad", "select_ability"]  # checks cancelling the rest of a watched move_macro
 
     coords_path = 'coords'
     buttons_filename = "buttons.json"
@@ -69,9 +86,14 @@ class CaveEngine(QObject):
     -------------------------------
     '''
 
-    def __init__(self, dev_connector: UsbConnector, datas_dir: str):
+    def __init__(self, dev_connector: UsbConnector, datas_dir: str, instance_dir: str = ''):
+        """
+        :param instance_dir: folder of this engine settings, statistics and timings (one per device in a farm).
+                             Empty for the current folder (statistics in datas)
+        """
         super(QObject, self).__init__()
         self.data_path = datas_dir
+        self.instance_dir = instance_dir
         self.deadcheck = False  # controled by GUI dropdown, works <50% of time to revive; costs gems unless BPAdv Sub
         self.battle_pass_advanced = False
         self.buy_energy = False
@@ -86,7 +108,9 @@ class CaveEngine(QObject):
         self.check_seconds = 6
         self.energy_count = 1
         self.tier_list_abilities = self.load_tier_list()
-        self.statisctics_manager = StatisticsManager()
+        self.statisctics_manager = StatisticsManager(instance_dir if instance_dir != '' else 'datas')
+        self.games_finished = 0  # games ended on endgame screen (won or died) since start
+        self.games_won = 0
         self.start_date = datetime.now()
         self.stat_lvl_start = 0
         self.screen_connector = GameScreenConnector(datas_dir)
@@ -94,17 +118,29 @@ class CaveEngine(QObject):
         self.width, self.heigth = 1080, 1920
         self.device_connector = dev_connector
         self.device_connector.setFunctionToCallOnConnectionStateChanged(self.onConnectionStateChanged)
+        self.input_dispatcher = InputDispatcher(self.device_connector)
         self.buttons = {}
         self.movements = {}
+        self.button_points = {}  # buttons in pixels of current resolution
+        self.macro_compiler = MacroCompiler(self.movements, self.width, self.heigth)
+        self.route_table = RouteTable(os.path.join(datas_dir, "routes"))
         self.disable_UI_logs = False  # do not change
         self.stopRequested = False  # do not change
+        self._stop_event = threading.Event()  # set with stopRequested, wakes every wait
         self.currentDataFolder = ''
         self.dataFolders = {}
         self.centerAfterCrossingDungeon = False  # do not ghange
-        self.local_settings_path = 'current_settings.json'
+        self.local_settings_path = os.path.join(instance_dir, 'current_settings.json')
         self.local_settings_manager = LocalEngineSettingsManager(self.local_settings_path)
         self.local_settings: LocalEngineSettings = self.local_settings_manager.load()
         self.initLocalSettings()
+        self.play_timings_path = os.path.join(instance_dir, 'play_timings.json')
+        self.play_scheduler = PlayScheduler(self.play_timings_path, max_interval=self.check_seconds)
+        self.popup_handlers = self._buildPopupHandlers()
+        self.calibrating = False  # set by --calibrate: records wait latencies instead of using fitted budgets
+        self.last_action = ''
+        self.timing_profile_path = os.path.join(os.path.dirname(self.local_settings_path), 'device_timings.json')
+        self.timing_profile = TimingProfile(self.timing_profile_path)
 
     def load_tier_list(self) -> dict:
         logging.log(logging.DEBUG - 5, "Loading Abilities Tier List")
@@ -175,8 +211,12 @@ class CaveEngine(QObject):
             self.initDataFolders()
             self.screen_connector.changeDeviceConnector(self.device_connector)
             self.updateScreenSizeByPhone()
+            self.timing_profile.select(self.currentDataFolder, self.device_connector.getDeviceSerial())
+            if self.UseCaptureStream:
+                self.screen_connector.startCaptureStream()
         else:
             logging.warning("No Device Detected")
+            self.screen_connector.stopCaptureStream()
 
     def updateScreenSizeByPhone(self):
         if self.device_connector is not None:
@@ -195,28 +235,40 @@ class CaveEngine(QObject):
         logging.log(logging.DEBUG - 5, "Loading Coordinates")
         self.buttons = loadJsonData(getCoordFilePath(self.buttons_filename, sizePath=self.currentDataFolder))
         self.movements = loadJsonData(getCoordFilePath(self.movements_filename, sizePath=self.currentDataFolder))
+        self.compileCoords()
 
-    def setPauseRequested(self):
-        logging.log(logging.DEBUG - 5, "Pause Requested")
+    def _requestStop(self):
+        """
+        Stops the engine thread as soon as possible: wakes every wait and cancels queued input.
+        """
         self.stopRequested = True
+        self._stop_event.set()
+        self.input_dispatcher.cancel()
         self.screen_connector.stopRequested = True
+
+    def setPauseRequested(self):
+        logging.log(logging.DEBUG - 5, "Pause Requested")
+        self._requestStop()
         self.changeEndStatus(self.endStatus + 10)  # Pause-Requested
         self.runStatiscticsSave()
 
     def setStopRequested(self):
         logging.log(logging.DEBUG - 5, "Stop Requested")
-        self.stopRequested = True
-        self.screen_connector.stopRequested = True
+        self._requestStop()
+        self.saveTimingProfile()
+        self.screen_connector.flushUnknownAbilities()
 
     def setStartRequested(self):
         logging.log(logging.DEBUG - 5, "Start Requested")
         self.stopRequested = False
+        self._stop_event.clear()
         self.screen_connector.stopRequested = False
         self.gamePaused.emit()
 
     def changeScreenSize(self, w, h):
         self.width, self.heigth = w, h
         logging.debug("New resolution set: %dx%d" % (self.width, self.heigth))
+        self.compileCoords()
         self.resolutionChanged.emit(w, h)
 
     def log(self, log: str):
@@ -227,49 +279,136 @@ class CaveEngine(QObject):
             self.addLog.emit(log)
 
     def swipe_points(self, start, stop, s):
-        start = self.buttons[start]
-        stop = self.buttons[stop]
+        start = self.button_points[start]
+        stop = self.button_points[stop]
         logging.debug("Swiping between %s and %s in %f" % (start, stop, s))
-        self.device_connector.adb_swipe([start[0] * self.width,
-                                         start[1] * self.heigth,
-                                         stop[2] * self.width,
-                                         stop[3] * self.heigth], s)
+        self.waitInput(self.input_dispatcher.swipe([start[0], start[1], stop[2], stop[3]], s))
 
-    def swipe(self, name: str, s: float):
+    def swipe(self, name: str, s: float, block: bool = True) -> Future:
+        """
+        Queues a swipe. With block False returns its future immediately, so the screen can be checked meanwhile.
+        """
         if self.stopRequested:
             exit()
         name = name.lower()  # just in case we wrote something in capital ketters
-        if name not in self.movements:
+        if name not in self.macro_compiler.vectors:
             logging.error("Movement '{}' not in movements list".format(name))
-        coord = self.movements[name]
         logging.debug("Swiping %s in %f" % (self.print_names_movements[name], s))
         self.log("Swipe %s in %.2f" % (self.print_names_movements[name], s))
-        # convert back from normalized values
-        self.device_connector.adb_swipe([coord[0][0] * self.width,
-                                         coord[0][1] * self.heigth,
-                                         coord[1][0] * self.width,
-                                         coord[1][1] * self.heigth], s)
+        self.last_action = "swipe:%s" % name
+        future = self.input_dispatcher.swipe(self.macro_compiler.vectors[name], s)
+        if block:
+            self.waitInput(future)
+        return future
 
     def tap(self, name):
         if self.stopRequested:
             exit()
         self.log("Tap %s" % name)
-        # convert back from normalized values
-        x, y = int(self.buttons[name][0] * self.width), int(self.buttons[name][1] * self.heigth)
+        x, y = int(self.button_points[name][0]), int(self.button_points[name][1])
         logging.debug("Tapping on %s at [%d, %d]" % (name, x, y))
-        self.device_connector.adb_tap((x, y))
-
-    def wait(self, s):
-        decimal = s
-        if int(s) > 0:
-            decimal = s - int(s)
-            for _ in range(int(s)):
-                if self.stopRequested:
-                    exit()
-                time.sleep(1)
-        if self.stopRequested:
-            exit()
-        time.sleep(decimal)
+        self.last_action = "tap:%s" % name
+        self.waitInput(self.input_dispatcher.tap((x, y)))
+
+    def waitInput(self, future: Future, abort_checks: list = ()) -> bool:
+        """
+        Waits until queued input future is done. With abort_checks, the screen is checked meanwhile and all
+        pending input is cancelled as soon as one of those checks (static or specific coords) matches.
+        Returns False if input was aborted. Errors of the device command (e.g. disconnection) are raised again.
+        """
+        while not future.done():
+            if self.stopRequested:
+                self.input_dispatcher.cancel()
+                exit()
+            frame = self.screen_connector.getFrame() if len(abort_checks) > 0 else None
+            for check in abort_checks:
+                if self.screen_connector.checkFrame(check, frame):
+                    cancelled = self.input_dispatcher.cancel()
+                    logging.debug("'%s' detected during movements. Cancelled %d commands" % (check, cancelled))
+                    return False
+            wait([future], timeout=0.2)
+        if future.cancelled():
+            return False
+        future.result()
+        return True
+
+    def wait(self, s, until=None, poll: float = 0.3) -> bool:
+        """
+        Waits s seconds, waking immediately on stop request.
+        :param until: optional predicate (e.g. self.untilState("endgame")) ending the wait as soon as it is True.
+                      It is evaluated on every new capture stream frame, or every poll seconds without stream.
+        :return: True if until predicate became True, False if s seconds elapsed
+        """
+        deadline = time.monotonic() + s
+        while True:
+            if self.stopRequested:
+                exit()
+            if until is not None and until():
+                return True
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return False
+            if until is None:
+                self._stop_event.wait(left)
+                continue
+            stream = self.screen_connector.capture_stream
+            if stream is not None and stream.running:
+                stream.waitNextFrame(min(left, poll))
+            else:
+                self._stop_event.wait(min(left, poll))
+
+    def untilState(self, *states):
+        """
+        Returns a predicate for wait: True when current screen state is one of states.
+        """
+        return lambda: self.screen_connector.getFrameState() in states
+
+    def wait_until(self, states, timeout: float, poll: float = 0.3) -> str:
+        """
+        Waits until one of states (static or specific coords names) is on screen, at most timeout seconds.
+        Used instead of fixed delays tuned for slow devices: timeout is the former delay.
+        :return: the detected state, None on timeout
+        """
+        if len(self.screen_connector.knownChecks(states)) == 0:
+            self.wait(timeout)
+            return None
+        found = []
+
+        def detected():
+            state = self.screen_connector.matchState(states)
+            if state is not None:
+                found.append(state)
+            return state is not None
+        self.timedWait("%s>%s" % (self.last_action, "|".join(states)), timeout, detected, poll)
+        return found[0] if len(found) > 0 else None
+
+    def wait_while(self, states, timeout: float, poll: float = 0.3) -> bool:
+        """
+        Waits until none of states is on screen anymore (e.g. a popup closed by last tap), at most timeout seconds.
+        :return: True if states left the screen, False on timeout
+        """
+        if len(self.screen_connector.knownChecks(states)) == 0:
+            self.wait(timeout)
+            return False
+        return self.timedWait("%s>!%s" % (self.last_action, "|".join(states)), timeout,
+                              lambda: self.screen_connector.matchState(states) is None, poll)
+
+    def timedWait(self, transition: str, timeout: float, until, poll: float = 0.3) -> bool:
+        """
+        wait on until predicate for an expected transition, with the device budget fitted for it (timeout when not
+        calibrated). While calibrating the default timeout is used and the observed latency is recorded.
+        """
+        budget = timeout if self.calibrating else self.timing_profile.budget(transition, timeout)
+        start = time.monotonic()
+        done = self.wait(budget, until=until, poll=poll)
+        if done and self.calibrating:
+            self.timing_profile.record(transition, time.monotonic() - start)
+        return done
+
+    def saveTimingProfile(self):
+        if self.calibrating:
+            self.timing_profile.fit()
+            self.timing_profile.save()
 
     def changeCurrentLevel(self, new_lvl):
         self.currentLevel = new_lvl
@@ -295,20 +434,9 @@ class CaveEngine(QObject):
             self.reactGamePopups()
         self.log("No Loot Left")
         self.log("Leaveing Dungeon")
-        if self.currentDungeon == 3 or self.currentDungeon == 6:
-            self.exit_movement_dungeon6()
-        elif self.currentDungeon == 7 or self.currentDungeon == 14:
-            self.exit_movement_dungeon_7()
-        elif self.currentDungeon == 10:
-            self.exit_movement_dungeon10()
-        elif self.currentDungeon == 16:
-            self.exit_movement_dungeon16()
-        elif self.currentDungeon == 18:
-            self.exit_movement_dungeon18()
-        elif self.currentDungeon == 20:
-            self.exit_movement_dungeon20()
-        else:
-            self.exit_movement_dungeon_old()
+        if self.CenterBeforeExit:
+            self.centerPlayer()
+        self.runRoute("exit")
         self.log("Left Dungeon")
         self.wait(0.5)  # wait to load to GUI
         self.exit_dungeon_uncentered_simplified()
@@ -324,138 +452,45 @@ class CaveEngine(QObject):
                 logging.debug("NOT in_game Detected")
                 self.reactGamePopups()
                 self.exit_dungeon_uncentered_simplified(do_second_check=False)
-                if self.currentDungeon == 3 or self.currentDungeon == 6:
-                    self.exit_movement_dungeon6()
-                elif self.currentDungeon == 7 or self.currentDungeon == 14:
-                    self.exit_movement_dungeon_7()
-                elif self.currentDungeon == 10 or self.currentDungeon == 16:
-                    self.exit_movement_dungeon10()
-                elif self.currentDungeon == 20:
-                    self.exit_movement_dungeon20()
-                else:
-                    self.exit_movement_dungeon_old()
+                self.runRoute("exit_again")
                 self.log("Left Dungeon Again")
                 self.wait(0.5)  # wait to load to GUI
         logging.log(logging.DEBUG - 5, "exit_dungeon_uncentered_simplified")
 
-    def exit_movement_dungeon_old(self):
-        logging.log(logging.DEBUG - 5, "exit_dungeon_old 'Improved'")
-        # self.centerPlayer()
-        self.move_macro(0,
-                        [['n', 3], ['ne', .5], ['nw', 3], ['ne', 3], ['nw', 3], ['ne', 3], ['w', .7]])
-
-    def exit_movement_dungeon_7(self):
-        logging.log(logging.DEBUG - 5, "exit_dungeon_7")
-        self.swipe('w', .7)
-        self.swipe('ne', 1.9)
-
-    def exit_movement_dungeon6(self):
-        logging.log(logging.DEBUG - 5, "exit_dungeon_6")
-        self.swipe('w', 2)
-        self.swipe('ne', 3)
-
-    def exit_movement_dungeon10(self):
-        logging.log(logging.DEBUG - 5, "exit_dungeon_10")
-        self.swipe('e', 1.5)
-        self.swipe('nw', 3)
-
-    def exit_movement_dungeon16(self):
-        logging.log(logging.DEBUG - 5, "exit_dungeon_16")
-        self.swipe('e', 1.2)
-        self.swipe('nw', 3)
-
-    def exit_movement_dungeon18(self):
-        logging.log(logging.DEBUG - 5, "exit_dungeon_18")
-        self.swipe('e', 1)
-        self.swipe('nw', 3)
-
-    def exit_movement_dungeon20(self):
-        logging.log(logging.DEBUG - 5, "exit_dungeon_20")
-        self.swipe('e', 1.5)
-        self.swipe('nw', 3)
-
-    def goTroughDungeon20(self):
-        logging.log(logging.DEBUG - 5, "Going through dungeon (designed for #20)")
-        self.log("Crossing Dungeon 20")
-        self.swipe('n', 2)
-        self.swipe('nw', 2.2)
-        if self.currentLevel == 16:
-            self.move_macro(0, [['s', .5], ['e', .5], ['n', .5]])
-        else:
-            self.move_macro(0, [['s', .3], ['e', .5], ['n', .3]])
-        self.move_macro(0, [['ne', 1.8], ['s', .3], ['w', .5], ['n', .3], ['nw', 1.5], ['ne', 1]])
-
-    def goTroughDungeon18(self):
-        logging.log(logging.DEBUG - 5, "Going through dungeon (designed for #18)")
-        self.log("Crossing Dungeon 18")
-        self.move_macro(0, [['n', 2], ['nw', 2], ['ne', 3], ['nw', 2], ['e', .7]])
-        if self.currentLevel == 6:
-            self.swipe('w', .4)
-        elif self.currentLevel == 11 or self.currentLevel == 12 or self.currentLevel == 13:
-            self.swipe('n', 2)
-            self.swipe('nw', .5)
-
-    def goTroughDungeon10(self):
-        logging.log(logging.DEBUG - 5, "Going through dungeon (designed for #10)")
-        self.log("Crossing Dungeon 10")
-        self.move_macro(0, [['n', .5], ['nw', 2.5], ['ne', 2.5], ['nw', 1.8], ['ne', 1], ['w', .7],
-                            ['s', .6], ['e', .35], ['ne', .4], ['n', 2.5], ['s', .3], ['w', .35], ['nw', .4], ['n', 1]])
-        if self.currentLevel == 18:
-            self.move_macro(0, [['w', .3], ['s', .35], ['ne', .4], ['n', .4]])
-
-    def goTroughDungeon16(self):
-        logging.log(logging.DEBUG - 5, "Going through dungeon (designed for #16)")
-        self.log("Crossing Dungeon 16")
-        self.move_macro(0, [['n', .5], ['nw', 2.5], ['ne', 2.5], ['nw', 1.8], ['ne', 1], ['w', .7]])
-        if self.currentLevel == 11 or self.currentLevel == 18:
-            self.move_macro(0, [['sw', .6], ['nw', .8]])
-        self.move_macro(0, [['se', .65], ['e', .7], ['nw', .55], ['ne', .7], ['w', .3], ['s', .6],
-                            ['sw', .3], ['nw', .7]])
-        if self.currentLevel == 6:
-            self.move_macro(0, [['s', .4], ['e', .5], ['nw', .6]])
-        elif self.currentLevel == 11 or self.currentLevel == 18:
-            self.move_macro(0, [['e', .3], ['n', .3], ['nw', .4]])
-        self.move_macro(0, [['ne', .55], ['w', .3], ['n', 1.5]])
-
-    def goTroughDungeon6(self):
-        logging.log(logging.DEBUG - 5, "Going through dungeon (designed for #6)")
-        self.log("Crossing Dungeon 6")
-        self.move_macro(0, [['n', 1.5], ['w', .3], ['n', .6], ['e', .6], ['n', .6], ['w', .6],
-                            ['n', 1.5], ['e', .3], ['n', 2]])
-
-    def goTroughDungeon3(self):
-        logging.log(logging.DEBUG - 5, "Going through dungeon (designed for #3)")
-        self.log("Crossing Dungeon 3")
-        self.move_macro(0, [['n', 1.5], ['w', .25], ['n', .5], ['e', .25], ['n', 2], ['w', 1],
-                            ['n', .5], ['e', 1], ['n', 1.5]])
-
-    def goTroughDungeon_old(self):
-        logging.log(logging.DEBUG - 5, "Going through dungeon old 'Improved'")
-        self.log("Crossing Dungeon (Improved)")
-        self.move_macro(0, [['n', 3], ['ne', .5], ['nw', 3], ['ne', 3], ['nw', 3], ['ne', 3],
-                            ['w', .7]])
-
-    def goTroughDungeon(self):
-        if self.currentDungeon == 3:
-            self.goTroughDungeon3()
-        elif self.currentDungeon == 6:
-            self.goTroughDungeon6()
-        elif self.currentDungeon == 10:
-            self.goTroughDungeon10()
-        elif self.currentDungeon == 16:
-            self.goTroughDungeon16()
-        elif self.currentDungeon == 18:
-            self.goTroughDungeon18()
-        elif self.currentDungeon == 20:
-            self.goTroughDungeon20()
-        else:
-            self.goTroughDungeon_old()
+    def compileCoords(self):
+        """
+        Converts buttons, movements and routes to absolute values of current resolution (see CoordsCompiler).
+        """
+        self.button_points = CoordsCompiler(self.width, self.heigth).buttons(self.buttons)
+        self.macro_compiler = MacroCompiler(self.movements, self.width, self.heigth)
+        self.route_table.compile(self.macro_compiler)
 
-    def centerPlayer(self):  # still not working correctly always 540px to left.
-        px, direction = self.screen_connector.getPlayerDecentering()
-        duration = 0.001 * abs(px) - 5
-        if px < self.screen_connector.door_width:
-            pass
+    def runRoute(self, phase: str):
+        """
+        Plays the route phase ("cross", "exit", "boss_door"...) of current chapter and level (see RouteTable).
+        """
+        logging.log(logging.DEBUG - 5, "Route %s of dungeon %d, level %d" % (phase, self.currentDungeon,
+                                                                            self.currentLevel))
+        for item in self.route_table.get(self.currentDungeon, self.currentLevel, phase):
+            if item[0] == RouteTable.popups_item:
+                if item[1] > 0:
+                    self.wait_while(["in_game"], item[1])  # wait for popups to load
+                self.reactGamePopups()
+            else:
+                self.run_macro(item[1], item[2])
+
+    def centerPlayer(self, frame=None):
+        """
+        Moves player horizontally to screen center, using his HP bar position. Skipped if bar is not found reliably.
+        """
+        if frame is None:
+            frame = self.screen_connector.getFrame()
+        center_px, confidence = self.screen_connector.getPlayerLocation(frame)
+        if confidence < self.CenterMinConfidence:
+            logging.debug("Player position unreliable (confidence %.2f). Not centering" % confidence)
+            return
+        px, direction = self.screen_connector.getPlayerDecentering(frame)
+        duration = 0.001 * abs(px)
         if direction == 'left':
             self.log("Centered Player <--")
             self.swipe('e', duration)
@@ -465,50 +500,90 @@ class CaveEngine(QObject):
         elif direction == "center":
             pass
 
-    def move_macro(self, delay: float, coord_and_dur: list):
+    def move_macro(self, delay: float, coord_and_dur: list, abort_checks: list = ()) -> bool:
         """
         Args:
             delay: delay time between one movement and other
             coord_and_dur: list of lists having a movement string e.g. 'nw' and a time e.g. 2.1
                            example: coord_and_dur = [['n', 2], ['e', .9], ['so', .6], ['s', 1]]
+            abort_checks: checks watched on screen while moving, cancelling remaining movements (see waitInput)
+        Returns False if aborted.
         """
-        for d, t in coord_and_dur:
-            self.swipe(d, t)
-            self.wait(delay)
+        if len(coord_and_dur) == 0:
+            return True
+        steps = self.macro_compiler.compile(delay, coord_and_dur)
+        return self.run_macro(steps, " ".join(d for d, _ in coord_and_dur), abort_checks)
+
+    def run_macro(self, steps: list, description: str, abort_checks: list = ()) -> bool:
+        """
+        Runs compiled macro steps (see MacroCompiler). Returns False if aborted.
+        """
+        if self.stopRequested:
+            exit()
+        self.log("Macro %s in %.2f" % (description, MacroCompiler.duration(steps)))
+        logging.debug("Macro steps: %s" % steps)
+        self.last_action = "macro"
+        return self.waitInput(self.input_dispatcher.macro(steps), abort_checks)
 
     def letPlay(self, _play_time: int, is_boss=False):
+        """
+        Plays current room until it is cleared, a popup or the endgame shows up, at most _play_time wall clock seconds.
+        """
         start_exp_bar = self.screen_connector.getLineExpBar()
         recheck = False
         logging.debug("Let-Play. Auto playing...")
         self.log("Searching Dungeon")
         if self.deadcheck or self.battle_pass_advanced:
             self.checkIfDead()
-        for i in range(_play_time, 0, -1):
-            if i % self.check_seconds == 0 or recheck:
-                recheck = False
-                frame = self.screen_connector.getFrame()
-                state = self.screen_connector.getFrameState(frame)
-                logging.debug("Loop Countdown / Kill Timer")
-                logging.debug(i)
-                logging.debug("Let Play. Checking screen...")
-                logging.debug("state: %s" % state)
-                if state == "in_game":
-                    continue_loop = self.letPlay_ingame(i, _play_time, start_exp_bar, frame, check_exp_bar=not is_boss)
-                else:
-                    continue_loop, recheck = self.letPlay_outgame(i, state)
-                if not continue_loop:
-                    return
-
-    def letPlay_ingame(self, i:int, _time, start_exp_bar: list, frame: int, check_exp_bar: bool) -> bool:
+        self.play_scheduler.startRoom(self.currentDungeon, self.currentLevel)
+        i = _play_time
+        while i > 0:
+            frame = self.screen_connector.getFrame()
+            state = self.screen_connector.getFrameState(frame)
+            logging.debug("Loop Countdown / Kill Timer")
+            logging.debug("%.1f" % i)
+            logging.debug("Let Play. Checking screen...")
+            logging.debug("state: %s" % state)
+            if state == "in_game":
+                continue_loop = self.letPlay_ingame(i, _play_time, start_exp_bar, frame, check_exp_bar=not is_boss)
+            else:
+                continue_loop, recheck = self.letPlay_outgame(i, state)
+            if not continue_loop:
+                # only exp gained or doors open mean cleared: death, endgame or popups must not skew clear times
+                self.play_scheduler.endRoom(cleared=state == "in_game")
+                return
+            if not recheck:
+                activity = state == "in_game" and \
+                           self.screen_connector.getDoorLightRatio(frame) >= self.DoorActivityRatio
+                self.wait(self.play_scheduler.waitTime(activity))
+            recheck = False
+            i = _play_time - self.play_scheduler.elapsed()
+        self.play_scheduler.endRoom(cleared=False)
+
+    def letPlay_ingame(self, i:int, _time, start_exp_bar: np.ndarray, frame: int, check_exp_bar: bool) -> bool:
         """
         Manages in game loop with screen checks to see if it solved the room or not.
-        @param i: Loop index
+        @param i: play time left (seconds)
         @param _time: max play time allowed for outher loop
-        @param start_exp_bar: start experience upper bar (checks if changed)
+        @param start_exp_bar: start experience upper bar mask (checks if changed)
         @param frame: the screen frame to see what's in the game
         @param check_exp_bar: know if to check upper experience bar or not
         @return: continue_loop as continue the loop in game
         """
+        # checking the fresh frame before moving: cleared rooms do not wait a whole patrol
+        logging.debug("Start. Exp & Door Checks")
+        exp_changed = check_exp_bar and self.screen_connector.checkExpBarHasChanged(start_exp_bar, frame)
+        door = self.screen_connector.detectDoorsOpen(frame) if not exp_changed else None
+        if exp_changed:
+            logging.debug("Level ended. Experience gained!")
+            self.log("Gained Experience")
+            return False
+        elif door is not None:
+            num = {"light": 1, "doors_open": 1, "doors_open1": 2, "doors_open2": 3}.get(door, 1)
+            logging.debug("Door is OPEN #%d (%s) <---------######" % (num, door))
+            self.log("Door %d is Open" % num)
+            return False
+        logging.debug("End. Exp & Door Checks")
         # added movement to increase kill enemy efficency for 10 level chapters
         if self.currentDungeon == 7 or self.currentDungeon == 14:
             logging.debug("Avoiding Boss")
@@ -521,7 +596,7 @@ class CaveEngine(QObject):
                     self.checkIfDead()
             else:
                 self.move_macro(1, [['sw', 1.5], ['se', 1], ['e', .6], ['n', .5], ['ne', 1.2],
-                                    ['w', .4], ['ne', 1], ['w', .7]])
+                                    ['w', .4], ['ne', 1], ['w', .7]], self.MacroAbortChecks)
         # added movement to increase kill enemy efficency for 20 level chapters
         elif self.currentDungeon == 3 or self.currentDungeon == 6 or \
                 self.currentDungeon == 10 or self.currentDungeon == 16 or \
@@ -534,57 +609,38 @@ class CaveEngine(QObject):
                     self.swipe(d, t)
                     self.checkIfDead()
             else:
-                self.move_macro(2, [['w', .35], ['e', .7], ['W', .7], ['w', .7], ['e', .37]])
+                self.move_macro(2, [['w', .35], ['e', .7], ['W', .7], ['w', .7], ['e', .37]], self.MacroAbortChecks)
         # added random escape methods for 30, 50 level chapters
         else:
             if i > _time * .8:
                 logging.debug("Let-Play. Time < 100%")
                 self.log("Escape route #1")
                 self.move_macro(.1, [['s', .6], ['w', .4], ['nw', 2], ['ne', 3], ['s', .6],
-                                     ['e', .4], ['ne', 2], ['nw', 3]])
+                                     ['e', .4], ['ne', 2], ['nw', 3]], self.MacroAbortChecks)
             if _time * .6 < i <= _time * .8:
                 logging.debug("Let-Play. Time < 80%")
                 self.log("Escape route #2")
                 self.move_macro(.1, [['s', .5], ['sw', 2], ['n', 1], ['nw', 2], ['ne', 2],
-                                     ['s', .5], ['se', 2], ['n', 1], ['ne', 2], ['nw', 2]])
+                                     ['s', .5], ['se', 2], ['n', 1], ['ne', 2], ['nw', 2]], self.MacroAbortChecks)
             if _time * .4 < i <= _time * .6:
                 logging.debug("Let-Play. Time < 60%")
                 self.log("Escape route #3")
                 self.move_macro(.1, [['s', .3], ['ne', 1], ['nw', 2], ['s', .3], ['nw', 1],
-                                     ['ne', 2]])
+                                     ['ne', 2]], self.MacroAbortChecks)
             if _time * .2 < i <= _time * .4:
                 logging.debug("Let-Play. Time < 40%")
                 self.log("Escape route #4")
                 self.move_macro(.1, [['sw', 2], ['n', 1], ['ne', 2], ['se', 2], ['w', 1],
-                                     ['ne', 2], ['ne', 2]])
+                                     ['ne', 2], ['ne', 2]], self.MacroAbortChecks)
             if i <= _time * .2:
                 logging.debug("Let-Play. Time < 20%")
                 self.log("Escape route #4")
                 self.move_macro(.1, [['se', 2], ['n', 1], ['nw', 2], ['sw', 2], ['n', 2],
-                                     ['ne', 2], ['nw', 2]])
-        logging.debug("Start. Exp & Door Checks")
-        if check_exp_bar and self.screen_connector.checkExpBarHasChanged(start_exp_bar, frame):
-            logging.debug("Level ended. Experience gained!")
-            self.log("Gained Experience")
-            return False
-        elif self.screen_connector.checkDoorsOpen(frame):
-            logging.debug("Door is OPEN #1 <---------######")
-            self.log("Door 1 is Open")
-            return False
-        elif self.screen_connector.checkDoorsOpen1(frame):
-            logging.debug("Door is OPEN #2 <---------######")
-            self.log("Door 2 is Open")
-            return False
-        elif self.screen_connector.checkDoorsOpen2(frame):
-            logging.debug("Door is OPEN #3 <---------######")
-            self.log("Door 3 is Open")
-            return False
-        else:
-            if i <= _time * .75:
-                logging.debug("Moving closer to door")
-                self.swipe('n', .1)
-            logging.debug("Still playing but level not ended")
-        logging.debug("End. Exp & Door Checks")
+                                     ['ne', 2], ['nw', 2]], self.MacroAbortChecks)
+        if i <= _time * .75:
+            logging.debug("Moving closer to door")
+            self.swipe('n', .1)
+        logging.debug("Still playing but level not ended")
         return True
 
     def letPlay_outgame(self, i: int, state: str) -> (bool, bool):
@@ -602,7 +658,7 @@ class CaveEngine(QObject):
                     self.pressIfDead()
                 else:
                     logging.info("Turn on 'DeadCheck' to use gems to revive!")
-                    self.wait(3)
+                    self.wait_until(["endgame"], 3)
                     logging.info("Sorry, you most likely died.")
                     self.altEndgameClose()
             else:
@@ -611,7 +667,7 @@ class CaveEngine(QObject):
         elif state == "ability_refresh":
             logging.debug("Cancel Abilty Refresh")
             self.tap('close_ability_refresh')
-            self.wait(1)
+            self.wait_while(["ability_refresh"], 1)
         elif state == "menu_home" or state == "menu_talents" or state == "menu_events" or \
                 state == "menu_equip" or state == "menu_shop":
             raise Exception('mainscreen')
@@ -655,110 +711,154 @@ class CaveEngine(QObject):
         logging.debug("State Checks End")
         return True, False
 
+    def _buildPopupHandlers(self) -> dict:
+        """
+        Returns the state -> handler table used by reactGamePopups. Every handler gets (state, frame).
+        """
+        handlers = {
+            "endgame": self._onPopupEndgame,
+            "repeat_endgame_question": self._onPopupEndgame,
+            "ability_refresh": self._onPopupAbilityRefresh,
+            "select_ability": lambda state, frame: self.chooseBestAbility(frame),
+            "fortune_wheel": self._onPopupFortuneWheel,
+            "devil_question": self._onPopupDevil,
+            "ad_ask": self._onPopupAdAsk,
+            "mistery_vendor": self._onPopupMysteryVendor,
+            "special_gift_respin_no_back_button": self._onPopupGiftNoBack,
+            "special_gift_respin": self._onPopupAdAsk,
+            "angel_heal": self._onPopupAngelHeal,
+            "on_pause": self._onPopupPause,
+            "time_prize": self._onPopupTimePrize,
+            "crash_desktop_open": self._onPopupCrashDesktop,
+        }
+        for menu in ["menu_home", "menu_talents", "menu_events", "menu_equip", "menu_shop"]:
+            handlers[menu] = self._onPopupMainScreen
+        return handlers
+
+    def _onPopupEndgame(self, state: str, frame):
+        logging.debug("React-Popup. Endgame Detected")
+        if state == "repeat_endgame_question":
+            self.changeEndStatus(self.endStatus + 7)  # You-Died
+            logging.info("Popups state: %s" % state)
+            if self.deadcheck or self.battle_pass_advanced:
+                self.pressIfDead()
+            else:
+                logging.info("Turn on 'DeadCheck' to use gems to revive!")
+                self.wait_until(["endgame"], 3)
+                logging.info("Sorry, you most likely died.")
+                self.altEndgameClose()
+        else:
+            self.changeEndStatus(self.endStatus + 8)  # Probably-Won
+            logging.info("You most likely won out of cycle.")
+            self.altEndgameClose()
+
+    def _onPopupAbilityRefresh(self, state: str, frame):
+        logging.debug("Cancel Abilty Refresh")
+        self.tap('close_ability_refresh')
+        self.wait_while([state], 1)
+
+    def _onPopupFortuneWheel(self, state: str, frame):
+        self.tap('wheel_start')
+        self.wait_while([state], 6)
+
+    def _onPopupDevil(self, state: str, frame):
+        self.tap('daemon_reject')
+        self.wait_while([state], 2)
+
+    def _onPopupAdAsk(self, state: str, frame):
+        # also special_gift_respin: same buttons
+        if self.battle_pass_advanced:
+            self.tap('wheel_start')
+            self.wait_while([state], 6)
+        else:
+            self.tap('wheel_back')
+            self.wait_while([state], 2)
+
+    def _onPopupMysteryVendor(self, state: str, frame):
+        if self.battle_pass_advanced:
+            logging.debug("Checking for Mystery Vendor Ad")
+            if self.screen_connector.checkFrame("mystery_vendor_ad", frame):
+                logging.debug("Collecting Free Stuff")
+                self.tap('wheel_start')
+                self.wait_while(["mystery_vendor_ad"], 6)
+        self.tap('wheel_back')
+        self.wait_while([state], 2)
+
+    def _onPopupGiftNoBack(self, state: str, frame):
+        # Special reward state without back button (down-left location).
+        # Just wait (at most 2 seconds) for special_gift_respin state to arrive.
+        self.wait_until(["special_gift_respin"], 2)
+
+    def _onPopupAngelHeal(self, state: str, frame):
+        if self.local_settings.healing_strategy == HealingStrategy.SmartHeal:
+            logging.debug("Popups. SmartHeal")
+            self.tap('heal_right' if self.smartHealChoice else 'heal_left')
+        else:
+            logging.debug("Popups. NormalHeal")
+            hs = self.local_settings.healing_strategy
+            self.tap('heal_right' if hs == HealingStrategy.AlwaysHeal else 'heal_left')
+        self.wait_while([state], 2)
+
+    def _onPopupPause(self, state: str, frame):
+        self.tap('resume')
+        self.wait_while([state], 2)
+
+    def _onPopupTimePrize(self, state: str, frame):
+        self.tap("collect_time_prize")
+        self.wait_until(["on_pause"], 5)
+        self.tap("resume")
+        self.wait_while(["on_pause"], 2)
+
+    def _onPopupMainScreen(self, state: str, frame):
+        raise Exception('mainscreen')
+
+    def _onPopupCrashDesktop(self, state: str, frame):
+        raise Exception('crashdesktop')
+
+    def _waitNextPopupFrame(self):
+        """
+        Waits for next frame: as soon as the capture stream has a new one, else polling every popup_poll seconds.
+        """
+        stream = self.screen_connector.capture_stream
+        if stream is not None and stream.running:
+            if self.stopRequested:
+                exit()
+            stream.waitNextFrame(self.popup_poll * 4)
+        else:
+            self.wait(self.popup_poll)
+        return self.screen_connector.getFrame()
+
     def reactGamePopups(self) -> int:
-        state = ""
+        """
+        Handles popups until in_game state. Returns immediately if first frame is already in_game.
+        Returns number of handled popups.
+        """
         i = 0
+        unhandled_start = time.monotonic()
+        frame = self.screen_connector.getFrame()
+        state = self.screen_connector.getFrameState(frame)
         while state != "in_game":
             if self.stopRequested:
                 exit()
-            self.wait(1)
-            state = self.screen_connector.getFrameState()
             logging.debug("state: %s" % state)
             logging.debug("React-Popups. Checking screen...")
-            if state == "endgame" or state == "repeat_endgame_question":
-                logging.debug("React-Popup. Endgame Detected")
-                if state == "repeat_endgame_question":
-                    self.changeEndStatus(self.endStatus + 7)  # You-Died
-                    logging.info("Popups state: %s" % state)
-                    if self.deadcheck or self.battle_pass_advanced:
-                        self.pressIfDead()
-                    else:
-                        logging.info("Turn on 'DeadCheck' to use gems to revive!")
-                        self.wait(3)
-                        logging.info("Sorry, you most likely died.")
-                        self.altEndgameClose()
-                else:
-                    self.changeEndStatus(self.endStatus + 8)  # Probably-Won
-                    logging.info("You most likely won out of cycle.")
-                    self.altEndgameClose()
-            elif state == "ability_refresh":
-                logging.debug("Cancel Abilty Refresh")
-                self.tap('close_ability_refresh')
-                self.wait(1)
-            elif state == "select_ability":
-                self.chooseBestAbility()
-            elif state == "fortune_wheel":
-                self.tap('wheel_start')
-                self.wait(6)
-            elif state == "devil_question":
-                self.tap('daemon_reject')
-                self.wait(2)
-            elif state == "ad_ask":
-                if self.battle_pass_advanced:
-                    self.tap('wheel_start')
-                    self.wait(6)
-                else:
-                    self.tap('wheel_back')
-                    self.wait(2)
-            elif state == "mistery_vendor":
-                if self.battle_pass_advanced:
-                    logging.debug("Checking for Mystery Vendor Ad")
-                    if self.screen_connector.checkFrame("mystery_vendor_ad"):
-                        logging.debug("Collecting Free Stuff")
-                        self.tap('wheel_start')
-                        self.wait(6)
-                        self.tap('wheel_back')
-                        self.wait(2)
-                    else:
-                        self.tap('wheel_back')
-                        self.wait(2)
-                else:
-                    self.tap('wheel_back')
-                    self.wait(2)
-            elif state == "special_gift_respin_no_back_button":
-                # Special reward state without back button (down-left location).
-                # Just wait 2 seconds for special_gift_respin state to arrive.
-                if self.battle_pass_advanced:
-                    self.wait(2)
-                else:
-                    self.wait(2)
-            elif state == "special_gift_respin":
-                if self.battle_pass_advanced:
-                    self.tap('wheel_start')
-                    self.wait(6)
-                else:
-                    self.tap('wheel_back')
-                    self.wait(2)
-            elif state == "angel_heal":
-                if self.local_settings.healing_strategy == HealingStrategy.SmartHeal:
-                    logging.debug("Popups. SmartHeal")
-                    self.tap('heal_right' if self.smartHealChoice else 'heal_left')
-                else:
-                    logging.debug("Popups. NormalHeal")
-                    hs = self.local_settings.healing_strategy
-                    self.tap('heal_right' if hs == HealingStrategy.AlwaysHeal else 'heal_left')
-                self.wait(2)
-            elif state == "on_pause":
-                self.tap('resume')
-                self.wait(2)
-            elif state == "time_prize":
-                self.tap("collect_time_prize")
-                self.wait(5)
-                self.tap("resume")
-                self.wait(2)
-            elif state == "menu_home" or state == "menu_talents" or state == "menu_events" or \
-                    state == "menu_equip" or state == "menu_shop":
-                raise Exception('mainscreen')
-            elif state == "crash_desktop_open":
-                raise Exception('crashdesktop')
-            if i > self.max_loops_popup:
+            handler = self.popup_handlers.get(state)
+            if handler is not None:
+                handler(state, frame)
+                i += 1
+                unhandled_start = time.monotonic()
+            if i > self.max_loops_popup or time.monotonic() - unhandled_start > self.max_loops_popup:
                 logging.info("React-Popups. Max loops reached")
                 raise Exception('unknown_screen_state')
-            i += 1
+            frame = self._waitNextPopupFrame()
+            state = self.screen_connector.getFrameState(frame)
         return i
 
-    def chooseBestAbility(self):
-        abilities = self.screen_connector.getAbilityType()
+    def chooseBestAbility(self, frame=None):
+        abilities, distances = self.screen_connector.getAbilityMatches(frame)
+        for k in ['l', 'c', 'r']:
+            logging.debug("Ability %s: %s (confidence margin %.2f)" % (
+                k, abilities[k], self.screen_connector.abilityConfidence(distances[k])))
         try:
             t1 = self.tier_list_abilities[abilities['l']]
             t2 = self.tier_list_abilities[abilities['c']]
@@ -777,13 +877,13 @@ class CaveEngine(QObject):
             logging.debug("Found best ability as " + best)
             self.log("Choosing '{}'".format(best))
             self.tap(to_press)
-            self.wait(1)  # wait for ability apply
+            self.wait_while(["select_ability"], 1)  # wait for ability apply
         except Exception as e:
             logging.error("Exception. Unable to choose best ability.")
             logging.debug("Reason: " + str(e))
             self.log("Choosing 'Left Button'")
             self.tap('ability_left')
-            self.wait(1)  # wait for ability apply
+            self.wait_while(["select_ability"], 1)  # wait for ability apply
 
     def crash_level_restart(self):
         if self.restartStatus:
@@ -793,7 +893,7 @@ class CaveEngine(QObject):
 
     def intro_lvl(self):
         logging.debug("Getting Start Items")
-        self.wait(10)  # inital wait for ability wheel to load
+        self.wait_until(["select_ability"], 10)  # inital wait for ability wheel to load
         self.reactGamePopups()
         self.swipe('n', 3)
         self.reactGamePopups()
@@ -807,7 +907,8 @@ class CaveEngine(QObject):
     def normal_lvl(self):
         logging.debug("normal_lvl")
         self.crash_level_restart()
-        self.goTroughDungeon()
+        self.log("Crossing Dungeon %d" % self.currentDungeon)
+        self.runRoute("cross")
         self.letPlay(self.playtime)
         self.reactGamePopups()
         self.exit_dungeon_uncentered()
@@ -839,36 +940,16 @@ class CaveEngine(QObject):
         logging.debug("boss_lvl")
         self.crash_level_restart()
         self.log("Attacking Boss")
-        self.move_macro(0, [['n', 0.2], ['n', 0.7], ['e', 1], ['nw', 2]])
-        if self.currentDungeon == 16:
-            if self.currentLevel == 10:
-                self.reactGamePopups()
-                self.move_macro(0, [['nw', 1.5], ['ne', 1.5]])
-            elif self.currentLevel == 15:
-                self.move_macro(0, [['n', .4], ['w', .4]])
-        self.swipe('ne', 2)
-        self.swipe('nw', 1.25)
+        self.runRoute("boss_attack")
         self.letPlay(self.playtime, is_boss=True)
         self.reactGamePopups()
-        if self.currentDungeon == 7 or self.currentDungeon == 14:
-            self.move_macro(0, [['w', 0.7], ['e', 0.8], ['w', 0.6]])
-            self.wait(2)  # wait for popups to laod
-            self.reactGamePopups()
         self.log("Moving to Door")
-        self.move_macro(0, [['s', .5], ['w', .3], ['nw', 2.5], ['e', .4], ['n', 1.5], ['e', .65]])
-        if self.currentDungeon == 7 or self.currentDungeon == 14:
-            self.move_macro(0, [['s', 0.5], ['e', 0.85], ['ne', 0.75], ['nw', 0.7], ['w', 0.55]])
-            self.wait(2)  # wait for popups to laod
-            self.reactGamePopups()
-            if self.currentLevel == 5 or self.currentLevel == 6:
-                self.move_macro(0, [['s', 0.3], ['ne', 0.6], ['nw', 0.6]])
-            if self.currentLevel == 8 or self.currentLevel == 9:
-                self.move_macro(0, [['s', 0.3], ['w', 0.3], ['nw', 0.6]])
+        self.runRoute("boss_door")
         self.exit_dungeon_uncentered()
 
-    def checkIfDead(self):
+    def checkIfDead(self, frame=None):
         logging.debug("Started Dead Check")
-        if self.screen_connector.checkFrame("you_died_ad"):
+        if self.screen_connector.checkFrame("you_died_ad", frame):
             self.pressIfDead()
         logging.debug("Completed Dead Checks")
 
@@ -890,22 +971,31 @@ class CaveEngine(QObject):
         if self.currentDungeon == 3 or self.currentDungeon == 6 or self.currentDungeon == 10:
             self.swipe('w', 2)
             i = 0
+            frames = []
+
+            def bossDied():
+                # one capture for all checks, kept for the checks after the wait
+                frames[:] = [self.screen_connector.getFrame()]
+                return self.screen_connector.checkBoss3Died(frames[0]) or \
+                    self.screen_connector.checkBoss6Died(frames[0]) or \
+                    self.screen_connector.checkBoss10Died(frames[0])
             while i < self.max_wait:
-                self.wait(self.sleep_btw_screens)
-                if self.screen_connector.checkBoss3Died():
+                self.wait(self.sleep_btw_screens, bossDied, poll=1)
+                frame = frames[0]
+                if self.screen_connector.checkBoss3Died(frame):
                     logging.debug("boss dead and door open #3")
                     self.log("Boss Dead #1")
                     break
-                if self.screen_connector.checkBoss6Died():
+                if self.screen_connector.checkBoss6Died(frame):
                     logging.debug("boss dead and door open #6")
                     self.log("Boss Dead #2")
                     break
-                if self.screen_connector.checkBoss10Died():
+                if self.screen_connector.checkBoss10Died(frame):
                     logging.debug("boss dead and door open #10")
                     self.log("Boss Dead #3")
                     break
                 if self.deadcheck or self.battle_pass_advanced:
-                    self.checkIfDead()
+                    self.checkIfDead(frame)
                 logging.debug(i)
                 i += 1
             self.reactGamePopups()
@@ -943,7 +1033,7 @@ class CaveEngine(QObject):
             self.move_macro(0, [['e', 1], ['nw', 2.5]])
             self.log("Left Dungeon!")
         i = 0
-        self.wait(8)  # wait for endgame loot screen to load
+        self.wait_until(["endgame"], 8)  # wait for endgame loot screen to load
         state = self.screen_connector.getFrameState()
         if state == "in_game":
             logging.info("Exception. Still in_game; let's try to escape")
@@ -1002,7 +1092,7 @@ class CaveEngine(QObject):
                     logging.debug("Popups. NormalHeal")
                     hs = self.local_settings.healing_strategy
                     self.tap('heal_right' if hs == HealingStrategy.AlwaysHeal else 'heal_left')
-                self.wait(2)
+                self.wait_while(["angel_heal"], 2)
                 self.move_macro(0, [['n', .65], ['e', .9], ['n', .25], ['nw', 1.8]])
                 self.wait(2)  # wait for room transition to complete
                 state = self.screen_connector.getFrameState()
@@ -1025,38 +1115,38 @@ class CaveEngine(QObject):
                 self.wait(0.5)
                 self.tap("farm_back")
                 self.unknownStatus = 0
-                self.wait(5)
+                self.wait_until(["menu_home"], 5)
             state = self.screen_connector.getFrameState()
             logging.info("Start state: %s" % state)
             if state == "game_not_responding":
                 logging.info("Closing Game to Restart")
                 self.tap("game_not_respond_ok")
-                self.wait(10)
+                self.wait_until(["crash_desktop_open"], 10)
             if state == "menu_talents" or state == "menu_events":
                 logging.info("Changing to World Menu")
                 self.tap("menu_world_left")
-                self.wait(2)
+                self.wait_until(["menu_home"], 2)
             elif state == "menu_equip" or state == "menu_shop":
                 logging.info("Changing to World Menu")
                 self.tap("menu_world_right")
-                self.wait(2)
+                self.wait_until(["menu_home"], 2)
             elif state == "monster_farm_home":
                 logging.info("Change to World Menu")
                 self.tap("farm_back")
-                self.wait(6)
+                self.wait_until(["menu_home"], 6)
             elif state == "menu_expedition":
                 logging.info("Change to World Menu")
                 self.tap("farm_back")
-                self.wait(6)
+                self.wait_until(["menu_home"], 6)
             elif state == "crash_desktop_open":
                 self.changeStartStatus(self.startStatus + 1)  # Crash-Desktop
                 self.restartStatus = True
                 logging.info("Opening Game Now")
                 self.tap("open_game")
-                self.wait(90)
+                self.wait_until(["menu_home"], 90)
             if state == "crash_load_screen_1" or state == "crash_load_screen_2":
                 logging.info("Not Loaded Yet, waiting 60 more")
-                self.wait(60)
+                self.wait_until(["menu_home"], 60)
             if self.currentLevel > 0:
                 if self.screen_connector.checkFrame('menu_home'):
                     logging.debug("Home Menu detected... setting to lvl 0 now.")
@@ -1123,6 +1213,8 @@ class CaveEngine(QObject):
         logging.debug("*** Saving Game Statistics ***")
         self.statisctics_manager.saveOneGame(self.start_date, self.stat_lvl_start, self.currentLevel,
                                              self.currentDungeon, self.startStatus, self.endStatus)
+        self.saveTimingProfile()
+        self.screen_connector.flushUnknownAbilities()
 
     def checkForEnergy(self):
         energy_check = True
@@ -1149,21 +1241,22 @@ class CaveEngine(QObject):
                     logging.info("BPAdv Free Energy Check")
                     self.log("Free Energy Check")
                     self.tap('open_energy_buy')
-                    self.wait(8)  # wait for load energy store
+                    self.wait_until(["free_ad_energy"], 8)  # wait for load energy store
                     if self.screen_connector.checkFrame("free_ad_energy"):
                         logging.info("xxxxxxxxxxxxxxxxx Free Ad Energy xxxxxxxxxxxxxxxxx")
                         self.tap('get_ad_energy')
-                        self.wait(6)  # wait for load energy bar
+                        self.wait_while(["free_ad_energy"], 6)  # wait for load energy bar
                         check_farm = False
                         check_energy = False
                     else:
                         self.tap('close_energy_buy')
-                        self.wait(4)  # wait for close buy energy
+                        self.wait_until(["menu_home"], 4)  # wait for close buy energy
                 if check_farm:
                     logging.info("Monster Farm Energy Check")
                     self.log("Farm Energy Check")
                     self.tap('farm_open')
-                    self.wait(6)  # wait for farm open
+                    # wait for farm open
+                    self.wait_until(["monster_farm_visit", "monster_farm_visit_free", "monster_farm_home"], 6)
                     frame = self.screen_connector.getFrame()
                     is_farm_visit = self.screen_connector.checkFrame("monster_farm_visit", frame)
                     is_farm_visit_free = self.screen_connector.checkFrame("monster_farm_visit_free", frame)
@@ -1216,10 +1309,10 @@ class CaveEngine(QObject):
                             i += 1
                         self.wait(2)  # wait for energy close
                         self.tap('farm_back')
-                        self.wait(4)  # wait for farm back
+                        self.wait_until(["monster_farm_home"], 4)  # wait for farm back
                         check_energy = False
                     self.tap('farm_back')
-                    self.wait(6)  # wait for menu_home
+                    self.wait_until(["menu_home"], 6)  # wait for menu_home
                 if check_energy:
                     logging.info("Energy Strategy Check")
                     self.log("Energy Strategy Check")
@@ -1242,9 +1335,9 @@ class CaveEngine(QObject):
                     if self.buy_energy and state == 'menu_home':
                         if self.energy_count <= self.max_buy_energy:
                             self.tap('open_energy_buy')
-                            self.wait(8)  # wait for load energy store
+                            self.wait(8)  # wait for load energy store (no coords detect it loaded)
                             self.tap('buy_more_energy')
-                            self.wait(6)  # wait for load energy bar
+                            self.wait_until(["menu_home"], 6)  # wait for load energy bar
                             logging.info("xxxxxxxxxxxxxxxxxx Bought Energy xxxxxxxxxxxxxxxxx")
                             logging.info(self.energy_count)
                             self.energy_count += 1
@@ -1274,7 +1367,7 @@ class CaveEngine(QObject):
         if self.screen_connector.checkFrame("game_announcement", frame):
             logging.info("Closing Announcement")
             self.tap("close_announcement")
-            self.wait(4)
+            self.wait_while(["game_announcement"], 4)
             ui_changed = True
         frame = self.screen_connector.getFrame() if ui_changed else frame
         ui_changed = False
@@ -1282,7 +1375,7 @@ class CaveEngine(QObject):
         if self.screen_connector.checkFrame("legendary_challenge", frame):
             logging.info("Okay to new Legendary Challenge")
             self.tap("close_legendary_challenge")
-            self.wait(4)
+            self.wait_while(["legendary_challenge"], 4)
             ui_changed = True
         frame = self.screen_connector.getFrame() if ui_changed else frame
         ui_changed = False
@@ -1291,7 +1384,7 @@ class CaveEngine(QObject):
             logging.info("Okay to New Season. Update BPAdv dropdown in GUI to False")
             self.tap("close_new_season")
             self.battle_pass_advanced = False  # only works once manully set dropdown in GUI to False
-            self.wait(4)
+            self.wait_while(["popup_new_season"], 4)
             ui_changed = True
         frame = self.screen_connector.getFrame() if ui_changed else frame
         ui_changed = False
@@ -1299,7 +1392,7 @@ class CaveEngine(QObject):
         if self.screen_connector.checkFrame("popup_home_patrol", frame):
             logging.info("Collecting time patrol")
             self.tap("collect_hero_patrol")
-            self.wait(6)
+            self.wait_while(["popup_home_patrol"], 6)
             self.tap("collect_hero_patrol")  # click again somewhere to close popup with token things
             ui_changed = True
         frame = self.screen_connector.getFrame() if ui_changed else frame
@@ -1308,7 +1401,7 @@ class CaveEngine(QObject):
         if self.screen_connector.checkFrame("btn_home_time_reward", frame):
             logging.info("Closing patrol_close")
             self.tap("close_hero_patrol")
-            self.wait(4)
+            self.wait_while(["btn_home_time_reward"], 4)
             ui_changed = True
         if self.local_settings.vip_sub == VIPSub.TrueVIP:
             frame = self.screen_connector.getFrame() if ui_changed else frame
@@ -1320,9 +1413,9 @@ class CaveEngine(QObject):
                 logging.info("Collecting VIP-Privilege Rewards 1")
                 self.log("VIP-Privilege Rewards 1")
                 self.tap("collect_vip_rewards")
-                self.wait(6)
+                self.wait_while(["popup_vip_rewards"], 6)
                 self.tap("close_vip_rewards")
-                self.wait(4)
+                self.wait_until(["popup_vip_rewards", "menu_home"], 4)
                 ui_changed = True
             frame = self.screen_connector.getFrame() if ui_changed else frame
             ui_changed = False
@@ -1331,9 +1424,9 @@ class CaveEngine(QObject):
                 logging.info("Collecting VIP-Privilege Rewards 2")
                 self.log("VIP-Privilege Rewards 2")
                 self.tap("collect_vip_rewards")
-                self.wait(6)
+                self.wait_while(["popup_vip_rewards"], 6)
                 self.tap("close_vip_rewards")
-                self.wait(4)
+                self.wait_until(["popup_vip_rewards", "menu_home"], 4)
                 ui_changed = True
         frame = self.screen_connector.getFrame() if ui_changed else frame
         ui_changed = False
@@ -1341,7 +1434,7 @@ class CaveEngine(QObject):
         if self.screen_connector.checkFrame("popup_need_this", frame):
             logging.info("Rejecting Must Need Ad 0")
             self.tap("close_need_this")
-            self.wait(4)
+            self.wait_while(["popup_need_this"], 4)
             ui_changed = True
         frame = self.screen_connector.getFrame() if ui_changed else frame
         ui_changed = False
@@ -1349,7 +1442,7 @@ class CaveEngine(QObject):
         if self.screen_connector.checkFrame("popup_need_this_1", frame):
             logging.info("Rejecting Must Need Ad 1")
             self.tap("close_need_this")
-            self.wait(4)
+            self.wait_while(["popup_need_this_1"], 4)
             ui_changed = True
         frame = self.screen_connector.getFrame() if ui_changed else frame
         ui_changed = False
@@ -1357,7 +1450,7 @@ class CaveEngine(QObject):
         if self.screen_connector.checkFrame("popup_need_this_2", frame):
             logging.info("Rejecting Must Need Ad 2")
             self.tap("close_need_this_2")
-            self.wait(4)
+            self.wait_while(["popup_need_this_2"], 4)
             ui_changed = True
         frame = self.screen_connector.getFrame() if ui_changed else frame
         ui_changed = False
@@ -1365,7 +1458,7 @@ class CaveEngine(QObject):
         if self.screen_connector.checkFrame("popup_welcome_back", frame):
             logging.info("Rejecting Welcome Back Ad")
             self.tap("close_need_this")
-            self.wait(4)
+            self.wait_while(["popup_welcome_back"], 4)
             ui_changed = True
         frame = self.screen_connector.getFrame() if ui_changed else frame
         ui_changed = False
@@ -1373,9 +1466,9 @@ class CaveEngine(QObject):
         if self.screen_connector.checkFrame("time_prize", frame):
             logging.info("Collecting time prize")
             self.tap("collect_time_prize")
-            self.wait(5)
+            self.wait_until(["on_pause"], 5)
             self.tap("resume")
-            self.wait(2)
+            self.wait_while(["on_pause"], 2)
             ui_changed = True
         frame = self.screen_connector.getFrame() if ui_changed else frame
         # ui_changed = False
@@ -1383,14 +1476,14 @@ class CaveEngine(QObject):
         if self.screen_connector.checkFrame("crash_continue_yes", frame):
             logging.info("Resuming Previous Game")
             self.tap("continue_yes")
-            self.wait(10)
+            self.wait_until(["in_game", "select_ability", "on_pause"], 10)
             # ui_changed = True
 
     def chooseCave(self):
         logging.debug("Choosing Cave Start")
         self.log("Main Menu")
         self.tap('start')
-        self.wait(6)  # wait for no_raid button to load
+        self.wait_until(["quick_raid_option", "select_ability", "in_game"], 6)  # wait for no_raid button to load
         logging.debug("Checking for raid options")
         if not self.screen_connector.checkFrame("quick_raid_option"):
             logging.debug("No Quick Raid Option, win 5 times first")
@@ -1430,7 +1523,7 @@ class CaveEngine(QObject):
 
     def _manage_exit_from_endgame(self):
         logging.debug("manage_exit_from_endgame")
-        self.wait(8)  # wait for endgame loot screen to load
+        self.wait_until(["endgame", "menu_home"], 8)  # wait for endgame loot screen to load
         state = self.screen_connector.getFrameState()
         logging.info("End state: %s" % state)
         if state == 'menu_home':
@@ -1455,6 +1548,7 @@ class CaveEngine(QObject):
             self.runStatiscticsSave()
             logging.info("Exit_Endgame. You won!")
             self.log("You won, Game over!")
+            self.games_won += 1
             self.gameWon.emit()
             self.pressCloseEndgame()
         elif state != 'endgame':
@@ -1462,7 +1556,7 @@ class CaveEngine(QObject):
             self.runStatiscticsSave()
             logging.info("Exit_Endgame. Maybe you leveled up; or unexpected screen?")
             self.tap('level_up_endgame')  # maybe you leveled up trying to get endgame
-            self.wait(8)  # wait for endgame loot screen to load
+            self.wait_until(["endgame"], 8)  # wait for endgame loot screen to load
         self.pressCloseEndIfEndedFrame()
 
     def pressCloseEndIfEndedFrame(self):
@@ -1473,13 +1567,15 @@ class CaveEngine(QObject):
             self.changeEndStatus(self.endStatus + 5)  # Won Game
             self.runStatiscticsSave()
             logging.info("Exit_Endgame_2. You Won!")
+            self.games_won += 1
             self.pressCloseEndgame()
 
     def pressCloseEndgame(self):
         logging.log(logging.DEBUG - 5, "Press_Close_End. Going back to main Menu")
+        self.games_finished += 1
         self.tap('close_end')
         self.currentLevel = 0
-        self.wait(8)  # wait for go back to main menu
+        self.wait_until(["menu_home"], 8)  # wait for go back to main menu
 
     def altEndgameClose(self):
         self.runStatiscticsSave()
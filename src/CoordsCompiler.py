@@ -0,0 +1,52 @@
+import numpy as np
+
+
+class CoordsCompiler(object):
+    """
+    Converts normalized coordinates files (buttons, movements, static coords) to absolute integer values of a
+    given screen size, once when coords or resolution change, so that taps, swipes and checks only look them up.
+    Values are truncated like int(x * width), int(y * height).
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+
+    def scale(self, values) -> np.ndarray:
+        """
+        Returns normalized [x, y, x, y, ...] values as absolute integers.
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1)
+        sizes = np.resize(np.array([self.width, self.height], dtype=np.float64), len(values))
+        return (values * sizes).astype(np.int64)
+
+    def points(self, coords) -> np.ndarray:
+        """
+        Returns a (n, 2) array of absolute x, y of normalized [[x, y], ...] points.
+        """
+        return self.scale(np.asarray(coords, dtype=np.float64).reshape(-1, 2)).reshape(-1, 2)
+
+    def flatIndices(self, coords) -> np.ndarray:
+        """
+        Returns offsets of normalized [[x, y], ...] points in a flatten (width*height, C) frame.
+        """
+        points = self.points(coords)
+        return points[:, 1] * self.width + points[:, 0]
+
+    def buttons(self, buttons: dict) -> dict:
+        """
+        name -> absolute values of a buttons file entry ([x, y] tap point, or [x1, y1, x2, y2]).
+        """
+        return {name: self.scale(values) for name, values in buttons.items()}
+
+    def movements(self, movements: dict) -> dict:
+        """
+        name -> [x1, y1, x2, y2] absolute swipe vector of a movements file entry ([[x1, y1], [x2, y2]]).
+        """
+        return {name: self.scale(coords) for name, coords in movements.items()}
+
+    def checks(self, coords: dict) -> dict:
+        """
+        name -> flat frame offsets of the points of a static coords file entry.
+        """
+        return {name: self.flatIndices(v["coordinates"]) for name, v in coords.items()}
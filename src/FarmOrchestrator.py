@@ -0,0 +1,113 @@
+import os
+import time
+import logging
+from src.UsbConnector import UsbConnector
+from src.CaveDungeonEngine import CaveEngine
+from src.WorkerThread import WorkerThread
+
+
+class FarmDevice(object):
+    """
+    One device of the farm: its connector, its engine and the thread playing on it.
+    """
+
+    def __init__(self, serial: str, connector, engine: CaveEngine):
+        self.serial = serial
+        self.connector = connector
+        self.engine = engine
+        self.thread: WorkerThread = None
+        self.start_time = None
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def hours(self) -> float:
+        return 0.0 if self.start_time is None else (time.monotonic() - self.start_time) / 3600.0
+
+    def gamesPerHour(self) -> float:
+        hours = self.hours()
+        return self.engine.games_finished / hours if hours > 0 else 0.0
+
+
+class FarmOrchestrator(object):
+    """
+    Plays on every adb device at once: one UsbConnector, CaveEngine (with its GameScreenConnector) and thread per
+    device serial. Each engine keeps settings, statistics and timings in farm_path/<serial>, while coordinates and
+    templates are loaded once and shared by all engines (see GameScreenConnector.changeScreenSize).
+    """
+
+    def __init__(self, data_path: str, farm_path: str = "farm"):
+        self.data_path = data_path
+        self.farm_path = farm_path
+        self.devices = {}  # serial -> FarmDevice
+
+    def devicePath(self, serial: str) -> str:
+        # emulators serials are like 127.0.0.1:62001
+        return os.path.join(self.farm_path, serial.replace(":", "_").replace("/", "_"))
+
+    def discover(self) -> list:
+        """
+        Adds an engine for every adb device not in the farm yet. Returns the new serials.
+        """
+        added = []
+        for serial in UsbConnector.listDeviceSerials():
+            if serial not in self.devices:
+                self.addDevice(serial)
+                added.append(serial)
+        logging.info("Farm devices: %d (%d new)" % (len(self.devices), len(added)))
+        return added
+
+    def addDevice(self, serial: str, connector=None) -> FarmDevice:
+        folder = self.devicePath(serial)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        if connector is None:
+            connector = UsbConnector(connect_now=False, serial=serial)
+        device = FarmDevice(serial, connector, CaveEngine(connector, self.data_path, instance_dir=folder))
+        self.devices[serial] = device
+        return device
+
+    def start(self) -> int:
+        """
+        Connects and starts playing on every device not running yet. Returns the number of running devices.
+        """
+        for serial, device in self.devices.items():
+            if device.running:
+                continue
+            if not device.connector.tryConnect():
+                logging.warning("Farm device %s not available" % serial)
+                continue
+            device.engine.setStartRequested()
+            device.thread = WorkerThread(daemon=True, name="farm-%s" % serial)
+            device.thread.function = device.engine.start_infinite_play
+            device.start_time = time.monotonic()
+            device.thread.start()
+            logging.info("Farm device %s started" % serial)
+        return len(self.runningDevices())
+
+    def stop(self, timeout: float = 10):
+        for device in self.devices.values():
+            device.engine.setStopRequested()
+        for device in self.devices.values():
+            if device.thread is not None:
+                device.thread.join(timeout=timeout)
+
+    def runningDevices(self) -> list:
+        return [serial for serial, device in self.devices.items() if device.running]
+
+    def throughput(self) -> dict:
+        """
+        Returns finished games (won or died) per hour of every device and of the whole farm ("total": sum of
+        devices rates).
+        """
+        rates = {serial: device.gamesPerHour() for serial, device in self.devices.items()}
+        rates["total"] = sum(rates.values())
+        return rates
+
+    def logThroughput(self):
+        for serial, device in self.devices.items():
+            logging.info("%s: %d games (%d won) in %.2f h, %.2f games/hour" % (
+                serial, device.engine.games_finished, device.engine.games_won, device.hours(), device.gamesPerHour()))
+        logging.info("Farm: %d running devices, %.2f games/hour" % (len(self.runningDevices()),
+                                                                    self.throughput()["total"]))
@@ -0,0 +1,82 @@
+import numpy as np
+from PIL import Image
+
+
+class FrameContext(object):
+    """
+    One captured frame, backed by a single uint8 (height*width, 4) RGBA buffer with zero-copy flat, 2-D and
+    PIL views, and memoized features (state, lines, template distances...) so that checks called many times
+    on the same frame compute everything once.
+    Indexing and slicing act as on the flatten (width*height, 4) pixels array, so a FrameContext can be passed
+    wherever a flatten frame is expected. Frames are never modified after capture.
+    """
+
+    def __init__(self, pixels: np.ndarray, width: int, height: int):
+        self.width = width
+        self.height = height
+        pixels = pixels.reshape(width * height, -1)
+        if pixels.dtype != np.uint8 or pixels.shape[1] != 4:
+            # e.g. png fallback captures: converted once to the uint8 RGBA layout of raw captures
+            rgba = np.full((width * height, 4), 255, dtype=np.uint8)
+            rgba[:, :min(4, pixels.shape[1])] = pixels[:, :4]
+            pixels = rgba
+        self.pixels = pixels
+        self._memo = {}
+
+    @staticmethod
+    def wrap(frame, width: int, height: int):
+        """
+        Returns frame as a FrameContext (flatten or (h, w, C) array, PIL image). FrameContext and None are
+        returned as they are.
+        """
+        if frame is None or isinstance(frame, FrameContext):
+            return frame
+        if isinstance(frame, Image.Image):
+            return FrameContext(np.asarray(frame.convert("RGBA")), frame.width, frame.height)
+        return FrameContext(np.asarray(frame), width, height)
+
+    def memo(self, key, compute):
+        """
+        Returns the value stored with key, computing it with compute() the first time.
+        """
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    @property
+    def flat(self) -> np.ndarray:
+        return self.pixels
+
+    @property
+    def hwc(self) -> np.ndarray:
+        """
+        (height, width, C) view of pixels.
+        """
+        return self.memo("hwc", lambda: self.pixels.reshape(self.height, self.width, -1))
+
+    @property
+    def pil(self) -> Image.Image:
+        """
+        PIL RGBA image of pixels (sharing same buffer when pixels are contiguous).
+        """
+        def build():
+            if self.pixels.flags.c_contiguous:
+                return Image.frombuffer("RGBA", (self.width, self.height), self.pixels, "raw", "RGBA", 0, 1)
+            return Image.fromarray(np.ascontiguousarray(self.hwc), "RGBA")
+        return self.memo("pil", build)
+
+    def crop(self, bbox) -> np.ndarray:
+        """
+        Returns [x1, y1, x2, y2] box as a (h, w, C) view.
+        """
+        x1, y1, x2, y2 = bbox
+        return self.hwc[y1:y2, x1:x2]
+
+    def __len__(self):
+        return len(self.pixels)
+
+    def __getitem__(self, item):
+        return self.pixels[item]
+
+    def __array__(self, dtype=None, copy=None):
+        return self.pixels if dtype is None else self.pixels.astype(dtype)
@@ -3,9 +3,23 @@ import json
 import numpy as np
 from PIL import Image
 import os
+import threading
 from src.Utils import loadJsonData, buildDataFolder, get_matrix_diff
+from src.ScreenCaptureStream import ScreenCaptureStream
+from src.SparseFrame import SparseFrame
+from src.FrameContext import FrameContext
+from src.StateClassifier import StateClassifier
+from src.CoordsCompiler import CoordsCompiler
+from src.TemplateStore import TemplateStore
+from src.AbilityMatcher import AbilityMatcher, ability_signature
+from src.UnknownAbilitiesIndex import UnknownAbilitiesIndex
+from src import LineAnalysis
 
 class GameScreenConnector:
+    _shared_lock = threading.Lock()
+    _shared_resolution_data = {}  # (data path, width, height, prefilter k, files mtimes) -> loaded coords and templates
+    _shared_unknown_abilities = {}  # folder -> UnknownAbilitiesIndex, shared by connectors saving in same folder
+
     def __init__(self, data_path, device_connector=None):
         self.data_path = data_path
         self.device_connector = device_connector
@@ -17,6 +31,9 @@ class GameScreenConnector:
         self.hor_lines_path = ''
         self.specific_checks_coords = {}
         self.static_coords = {}
+        self.checks_indices = {}  # static and specific coords name -> flat frame offsets of its points
+        self.state_classifier: StateClassifier = None
+        self.checks_classifier: StateClassifier = None
         self.door_width = 180.0 / 1080.0
         self.yellow_experience = [255, 170, 16, 255]
         self.green_hp = [70, 158, 47, 255]
@@ -25,43 +42,83 @@ class GameScreenConnector:
         # Line coordinates: x1,y1,x2,y2
         self.hor_lines = {}
         self.stopRequested = False
+        self.debug = False  # per pixel diagnostics of every check (slow). Use explainCheck for a single one
         self.abilities_treshold = 5
         self.abilities_templates = {}
+        self.abilities_signatures = {}
+        self.abilities_prefilter_k = 8  # exact match only on the k nearest thumbnails. 0 to compare all templates
+        self.ability_matcher = AbilityMatcher({})
         self.abilities_unknown_fld = "abilities_unknown"
         if not os.path.exists(self.abilities_unknown_fld): os.mkdir(self.abilities_unknown_fld)
+        self.unknown_abilities: UnknownAbilitiesIndex = None  # loaded on first unknown ability
         self.general_templates = {}
+        self.door_templates = ["doors_open", "doors_open1", "doors_open2"]  # same bbox, checked together
+        self.door_matcher = AbilityMatcher({}, kind="door")
+        self.capture_stream: ScreenCaptureStream = None
+        self.roi_capture = False  # Set True to capture only needed rows when a check is called without a frame
 
     def load_abilities_templates(self):
         file = os.path.join(self.data_path, "abilities", "abilities_templates_fns.json")
         abilities_folder = os.path.join(self.data_path, "abilities", "abilities_templates")
         with open(file) as file_in:
             abs_json = json.load(file_in)
-        abilities = {}
+        paths = {}
         for ab, fn in abs_json.items():
             path = os.path.join(abilities_folder, fn)
             if not os.path.exists(path):
                 logging.warning(f"Ability '{fn}' from dictionary does not exist. Skipping")
                 continue
-            with Image.open(path) as im:
-                abilities[ab] = np.array(im.getdata())
-        return abilities
+            paths[ab] = path
+        store = TemplateStore(os.path.join(self.data_path, "abilities", "abilities_templates_cache.npz"),
+                              signature=ability_signature)
+        templates = store.load(paths)
+        self.abilities_signatures = store.signatures
+        return templates
 
     def load_general_templates(self):
         file = os.path.join(self.data_path, "general", "general_templates.json")
         general_folder = os.path.join(self.data_path, "general", "general_templates")
         with open(file) as file_in:
             gen_json = json.load(file_in)
+        store = TemplateStore(os.path.join(self.data_path, "general", "general_templates_cache.npz"))
+        images = store.load({ab: os.path.join(general_folder, v["fn"]) for ab, v in gen_json.items()})
         templates = {}
         for ab, v in gen_json.items():
             templates[ab] = v
-            with Image.open(os.path.join(general_folder, v["fn"])) as im:
-                templates[ab]["template"] = np.array(im.getdata())
+            templates[ab]["template"] = images[ab]
         return templates
 
     def changeDeviceConnector(self, new_dev):
+        self.stopCaptureStream()
         self.device_connector = new_dev
 
+    def startCaptureStream(self, **stream_args) -> bool:
+        """
+        Starts a background capture stream on current device. getFrame will then return its latest frame.
+        :param stream_args: ScreenCaptureStream arguments (ring_size, max_frame_age, max_wait_fresh)
+        """
+        self.stopCaptureStream()
+        if self.device_connector is None:
+            return False
+        stream = ScreenCaptureStream(self.device_connector, **stream_args)
+        if not stream.start():
+            return False
+        self.capture_stream = stream
+        return True
+
+    def stopCaptureStream(self):
+        if self.capture_stream is not None:
+            logging.info("Stopping capture stream. Frames: %d, dropped: %d" % (
+                self.capture_stream.captured_frames, self.capture_stream.dropped_frames))
+            self.capture_stream.stop()
+            self.capture_stream = None
+
     def changeScreenSize(self, w, h):
+        """
+        Loads coordinates and templates of the new resolution. They are read-only once loaded, so connectors of
+        the same data folder (one per device in a farm) share them, until coords or templates files are modified
+        or the matching settings (abilities_prefilter_k) differ.
+        """
         self.width, self.height = w, h
         self.coords_path = os.path.join(self.data_path, buildDataFolder(self.width, self.height), "coords",
                                         "static_coords.json")
@@ -69,13 +126,49 @@ class GameScreenConnector:
                                                  "static_specific_coords.json")
         self.hor_lines_path = os.path.join(self.data_path, buildDataFolder(self.width, self.height), "coords",
                                            "hor_lines.json")
-
-        self.specific_checks_coords = loadJsonData(self.specific_checks_path)
-        self.static_coords = loadJsonData(self.coords_path)
-        self.hor_lines = loadJsonData(self.hor_lines_path)
-
-        self.abilities_templates = self.load_abilities_templates()
-        self.general_templates = self.load_general_templates()
+        paths = [self.coords_path, self.specific_checks_path, self.hor_lines_path] + self._templatesFiles()
+        key = (os.path.abspath(self.data_path), w, h, self.abilities_prefilter_k) + tuple(
+            os.path.getmtime(p) if os.path.exists(p) else 0 for p in paths)
+        with GameScreenConnector._shared_lock:
+            data = GameScreenConnector._shared_resolution_data.get(key)
+            if data is None:
+                data = self._loadResolutionData()
+                GameScreenConnector._shared_resolution_data[key] = data
+        for name, value in data.items():
+            setattr(self, name, value)
+
+    def _templatesFiles(self) -> list:
+        """
+        Abilities and general templates files: dictionaries and every image of their folders.
+        """
+        files = [os.path.join(self.data_path, "abilities", "abilities_templates_fns.json"),
+                 os.path.join(self.data_path, "general", "general_templates.json")]
+        for folder in [os.path.join(self.data_path, "abilities", "abilities_templates"),
+                       os.path.join(self.data_path, "general", "general_templates")]:
+            files.append(folder)
+            if os.path.isdir(folder):
+                files += [os.path.join(folder, f) for f in sorted(os.listdir(folder))]
+        return files
+
+    def _loadResolutionData(self) -> dict:
+        data = {"specific_checks_coords": loadJsonData(self.specific_checks_path),
+                "static_coords": loadJsonData(self.coords_path),
+                "hor_lines": loadJsonData(self.hor_lines_path)}
+        all_checks = {**data["static_coords"], **data["specific_checks_coords"]}
+        data["checks_indices"] = CoordsCompiler(self.width, self.height).checks(all_checks)
+        data["state_classifier"] = StateClassifier(data["static_coords"], self.width, self.height,
+                                                   data["checks_indices"])
+        data["checks_classifier"] = StateClassifier(all_checks, self.width, self.height, data["checks_indices"])
+
+        data["abilities_templates"] = self.load_abilities_templates()
+        data["abilities_signatures"] = self.abilities_signatures
+        data["ability_matcher"] = AbilityMatcher(data["abilities_templates"], self.abilities_signatures,
+                                                 self.abilities_prefilter_k)
+        data["general_templates"] = self.load_general_templates()
+        data["door_matcher"] = AbilityMatcher({n: data["general_templates"][n]["template"]
+                                               for n in self.door_templates if n in data["general_templates"]},
+                                              kind="door")
+        return data
 
     def pixel_equals(self, px_readed, px_expected, around=5):
         arr = [5, 5, 5]
@@ -83,81 +176,123 @@ class GameScreenConnector:
             arr = [around, around, around]
         elif isinstance(around, list):
             arr = [around[0], around[1], around[2]]
-        # checking only RGB from RGBA
-        return px_expected[0] - arr[0] <= px_readed[0] <= px_expected[0] + arr[0] \
-               and px_expected[1] - arr[1] <= px_readed[1] <= px_expected[1] + arr[1] \
-               and px_expected[2] - arr[2] <= px_readed[2] <= px_expected[2] + arr[2]
-
-    def getFrameAttr(self, frame, attributes):
-        attr_data = []
-        for attr in attributes:
-            x = int(attr[0] * self.width)
-            y = int(attr[1] * self.height)
-            attr_data.append(frame[int(y * self.width + x)])
-        return attr_data
+        # checking only RGB from RGBA. Casting to int as raw frames are uint8 (would wrap around)
+        r, g, b = int(px_readed[0]), int(px_readed[1]), int(px_readed[2])
+        er, eg, eb = int(px_expected[0]), int(px_expected[1]), int(px_expected[2])
+        return er - arr[0] <= r <= er + arr[0] \
+               and eg - arr[1] <= g <= eg + arr[1] \
+               and eb - arr[2] <= b <= eb + arr[2]
+
+    def getFrameAttr(self, frame, attributes, indices=None):
+        """
+        Returns pixels of frame at given normalized points.
+        :param indices: flat offsets of those points, if already compiled (see checkIndices)
+        """
+        if indices is None:
+            indices = CoordsCompiler(self.width, self.height).flatIndices(attributes)
+        if isinstance(frame, FrameContext):
+            frame = frame.flat
+        if isinstance(frame, np.ndarray):
+            return frame[indices]
+        return [frame[i] for i in indices]  # sparse frames: pixels of captured bands only
+
+    def checkIndices(self, coords_name: str, coords: dict) -> np.ndarray:
+        """
+        Returns compiled flat offsets of a static or specific coords entry (compiled now if not loaded from files).
+        """
+        indices = self.checks_indices.get(coords_name)
+        if indices is None or len(indices) != len(coords["coordinates"]):
+            indices = CoordsCompiler(self.width, self.height).flatIndices(coords["coordinates"])
+        return indices
 
-    def _check_screen_points_equal(self, frame, points_list, points_value, around=2):
+    def _check_screen_points_equal(self, frame, points_list, points_value, around=2, indices=None):
         """
         Gets 2 lists of x,y coordinates where to get values and list of values to comapre.
         Returns true if current frame have those values
         :param points_list: a list of x,y coordinates (absolute, not normalized)
         :param points_value: a list (same size of points_list) with values for equals check (values are 4d)
         :param around: an integer for interval of search: +around and -around.
+        :param indices: compiled flat offsets of points_list (see checkIndices)
         :return:
         """
         if len(points_list) != len(points_value):
             logging.info("Wrong size between points and values!")
             return False
+        attr_data = self.getFrameAttr(frame, points_list, indices)
+        if not self.debug:
+            for px, val in zip(attr_data, points_value):
+                if not self.pixel_equals(px, val, around=around):
+                    return False
+            return True
+        equal, table = self._points_table(attr_data, points_value, around)
         lvl = logging.DEBUG - 1
-        logging.log(lvl, "-----------------------------------")
-        logging.log(lvl,"|   Smartphone   |     Values     |")
-        attr_data = self.getFrameAttr(frame, points_list)
+        for line in table:
+            logging.log(lvl, line)
+        return equal
+
+    def _points_table(self, attr_data, points_value, around) -> (bool, list):
+        table = ["-----------------------------------", "|   Smartphone   |     Values     |"]
         equal = True
         for i in range(len(attr_data)):
-            logging.log(lvl,"| %4d %4d %4d | %4d %4d %4d |" % (
+            table.append("| %4d %4d %4d | %4d %4d %4d |" % (
                 attr_data[i][0], attr_data[i][1], attr_data[i][2], points_value[i][0], points_value[i][1],
                 points_value[i][2]))
             if not self.pixel_equals(attr_data[i], points_value[i], around=around):
                 equal = False
-        logging.log(lvl,"|-->         %s" % ("  equal           <--|" if equal else "not equal         <--|"))
-        logging.log(lvl,"-----------------------------------")
-        return equal
+        table.append("|-->         %s" % ("  equal           <--|" if equal else "not equal         <--|"))
+        table.append("-----------------------------------")
+        return equal, table
+
+    def explainCheck(self, coords_name: str, frame=None) -> str:
+        """
+        Returns the table of read and expected pixels for one static or specific check on given frame
+        (takes a screen if none passed), as printed by checks in debug mode.
+        """
+        if coords_name in self.static_coords:
+            v = self.static_coords[coords_name]
+        elif coords_name in self.specific_checks_coords:
+            v = self.specific_checks_coords[coords_name]
+        else:
+            return "No coordinates called %s is saved in memory!" % coords_name
+        if len(v["coordinates"]) != len(v["values"]):
+            return "Wrong size between points and values!"
+        if frame is None:
+            frame = self.getFrame()
+        around = 2 if "around" not in v.keys() else v["around"]
+        attr_data = self.getFrameAttr(frame, v["coordinates"], self.checkIndices(coords_name, v))
+        _, table = self._points_table(attr_data, v["values"], around)
+        return "%s (around = %s)\n%s" % (coords_name, around, "\n".join(table))
 
     def checkBoss6Died(self, frame=None):
         if frame is None:
-            frame = self.getFrame(return_pillow=True)
+            frame = self.getFrame()
         # check up field empty (no boss inside)
         res = self._check_general_template("final_boss_empty_up_field", frame)
         return res
 
     def checkBoss10Died(self, frame=None):
         if frame is None:
-            frame = self.getFrame(return_pillow=True)
+            frame = self.getFrame()
         # check up field empty (no boss inside)
         res = self._check_general_template("final_boss_empty_up_field2", frame)
         return res
 
     def checkBoss3Died(self, frame=None):
         if frame is None:
-            frame = self.getFrame(return_pillow=True)
+            frame = self.getFrame()
         # check up field empty (no boss inside)
         res = self._check_general_template("final_boss_empty_up_field1", frame)
         return res
 
-    def checkDoorsOpen(self, frame=None):
-        if frame is None:
-            frame = self.getFrame()
+    def _checkDoorsLight(self, frame) -> bool:
+        return self._memo(frame, "doors_light", lambda: self._computeDoorsLight(frame))
+
+    def _computeDoorsLight(self, frame) -> bool:
         # Check white light horizontal line inside door
         #490x630 to 600x630 hor line
-        sizes = self.hor_lines['hor_door_light']
-        line_door = self._getHorLine(sizes, frame)
-        white_yellow = True
-        for px in line_door:
-            # check if pixels are 250-255, 250-255, 190-255
-            if px[0] <= 250 or px[1] <= 250 or px[2] <= 190:
-                white_yellow = False
-                break
-        if white_yellow:
+        line_door = self._getHorLine(self.hor_lines['hor_door_light'], frame)
+        # check if pixels are 251-255, 251-255, 191-255
+        if LineAnalysis.all_in_range(line_door, [251, 251, 191], [255, 255, 255]):
             return True
         #check hp bar height....
         px_up = 50
@@ -166,13 +301,54 @@ class GameScreenConnector:
             line = self._getHorLine(
                 [480 / 1080.0, h_bar - ((px_up * i) / self.height), 600 / 1080.0, h_bar - ((px_up * i) / self.height)],
                 frame)
-            white = True
-            for px in line:
-                if px[0] != 255 or px[1] != 255 or px[2] != 255:
-                    white = False
-                    break
-            if white:
+            if LineAnalysis.all_in_range(line, [255, 255, 255], [255, 255, 255]):
                 return True
+        return False
+
+    def getDoorLightRatio(self, frame=None) -> float:
+        """
+        Returns the share of door light line pixels already lit (1 when door is open).
+        """
+        if frame is None:
+            frame = self.getFrame()
+
+        def ratio():
+            lit = LineAnalysis.range_mask(self._getHorLine(self.hor_lines['hor_door_light'], frame),
+                                          [251, 251, 191], [255, 255, 255])
+            return float(lit.mean()) if len(lit) > 0 else 0.0
+        return self._memo(frame, "doors_light_ratio", ratio)
+
+    def detectDoorsOpen(self, frame=None) -> str:
+        """
+        Checks all open door variants on one frame: the door light lines once, then all door templates
+        (same bbox) in one batched comparison.
+        Returns 'light' if door light found, else nearest door template name under its threshold, else None.
+        """
+        if frame is None:
+            frame = self.getFrame()
+        return self._memo(frame, "doors", lambda: self._computeDoorsOpen(frame))
+
+    def _computeDoorsOpen(self, frame) -> str:
+        if self._checkDoorsLight(frame):
+            return "light"
+        if len(self.door_matcher.names) == 0:
+            return None
+        bbox = self.general_templates[self.door_matcher.names[0]]["bbox"]
+        crp_np = self._cropFrame(frame, bbox)
+        if crp_np.shape != self.door_matcher.stack.shape[1:]:
+            logging.info("Error during doors check: wrong shape")
+            return None
+        dists = self.door_matcher.distances([crp_np])[0]
+        for i in np.argsort(dists, kind="stable"):
+            name = self.door_matcher.names[i]
+            if dists[i] < self.general_templates[name]["th"]:
+                return name
+        return None
+
+    def checkDoorsOpen(self, frame=None):
+        if frame is None:
+            frame = self.getFrame()
+        if self._checkDoorsLight(frame): return True
         #check template
         res = self._check_general_template("doors_open", frame)
         if res: return True
@@ -181,32 +357,7 @@ class GameScreenConnector:
     def checkDoorsOpen1(self, frame=None):
         if frame is None:
             frame = self.getFrame()
-        # Check white light horizontal line inside door
-        #490x630 to 600x630 hor line
-        sizes = self.hor_lines['hor_door_light']
-        line_door = self._getHorLine(sizes, frame)
-        white_yellow = True
-        for px in line_door:
-            # check if pixels are 250-255, 250-255, 190-255
-            if px[0] <= 250 or px[1] <= 250 or px[2] <= 190:
-                white_yellow = False
-                break
-        if white_yellow:
-            return True
-        #check hp bar height....
-        px_up = 50
-        h_bar = self.hor_lines['hor_hp_bar'][1]  # HP bar height
-        for i in range(1, 4, 1):
-            line = self._getHorLine(
-                [480 / 1080.0, h_bar - ((px_up * i) / self.height), 600 / 1080.0, h_bar - ((px_up * i) / self.height)],
-                frame)
-            white = True
-            for px in line:
-                if px[0] != 255 or px[1] != 255 or px[2] != 255:
-                    white = False
-                    break
-            if white:
-                return True
+        if self._checkDoorsLight(frame): return True
         #check template
         res = self._check_general_template("doors_open1", frame)
         if res: return True
@@ -215,37 +366,12 @@ class GameScreenConnector:
     def checkDoorsOpen2(self, frame=None):
         if frame is None:
             frame = self.getFrame()
-        # Check white light horizontal line inside door
-        #490x630 to 600x630 hor line
-        sizes = self.hor_lines['hor_door_light']
-        line_door = self._getHorLine(sizes, frame)
-        white_yellow = True
-        for px in line_door:
-            # check if pixels are 250-255, 250-255, 190-255
-            if px[0] <= 250 or px[1] <= 250 or px[2] <= 190:
-                white_yellow = False
-                break
-        if white_yellow:
-            return True
-        #check hp bar height....
-        px_up = 50
-        h_bar = self.hor_lines['hor_hp_bar'][1]  # HP bar height
-        for i in range(1, 4, 1):
-            line = self._getHorLine(
-                [480 / 1080.0, h_bar - ((px_up * i) / self.height), 600 / 1080.0, h_bar - ((px_up * i) / self.height)],
-                frame)
-            white = True
-            for px in line:
-                if px[0] != 255 or px[1] != 255 or px[2] != 255:
-                    white = False
-                    break
-            if white:
-                return True
+        if self._checkDoorsLight(frame): return True
         #check template
         res = self._check_general_template("doors_open2", frame)
         if res: return True
         return False
-    
+
     def checkFrame(self, coords_name: str, frame=None):
         """
         Given a coordinates name it checkes if the Frame has those pixels.
@@ -260,35 +386,118 @@ class GameScreenConnector:
         else:
             logging.info("No coordinates called %s is saved in memory! Returning false." % coords_name)
             return False
-        logging.debug("Checking %s" % (coords_name))
+        logging.debug("Checking %s", coords_name)
         if frame is None:
-            frame = self.getFrame()
+            if self.roi_capture:
+                frame = self.getFrameRegions(self.getRegionsBboxes(coords_names=[coords_name]))
+            else:
+                frame = self.getFrame()
         around = 2 if "around" not in dict_to_take[coords_name].keys() else dict_to_take[coords_name]["around"]
-        is_equal = self._check_screen_points_equal(frame, dict_to_take[coords_name]["coordinates"],
-                                                   dict_to_take[coords_name]["values"], around=around)
+        coords = dict_to_take[coords_name]
+        is_equal = self._check_screen_points_equal(frame, coords["coordinates"], coords["values"], around=around,
+                                                   indices=self.checkIndices(coords_name, coords))
         return is_equal
 
     def getFrame(self, return_pillow:bool=False):
+        """
+        Captures a frame as a FrameContext (one uint8 HxWx4 buffer with flat, 2-D and PIL views), usable by every
+        check. return_pillow only returns its PIL view, for callers that need an image.
+        """
         if self.stopRequested:
             exit()
-        return self.device_connector.adb_screen_getpixels(return_pillow)
+        frame = None
+        if self.capture_stream is not None and self.capture_stream.running:
+            pixels = self.capture_stream.getLatestFrame()
+            if pixels is not None:
+                frame = FrameContext(pixels, self.capture_stream.width, self.capture_stream.height)
+            else:
+                logging.debug("Capture stream has no fresh frame. Capturing directly")
+        if frame is None:
+            pixels = self.device_connector.adb_screen_getpixels(False)
+            if len(pixels) != self.width * self.height:
+                logging.warning("Captured frame has not %dx%d pixels" % (self.width, self.height))
+                return pixels
+            frame = FrameContext(pixels, self.width, self.height)
+        return frame.pil if return_pillow else frame
+
+    @staticmethod
+    def _memo(frame, key, compute):
+        # features of a FrameContext are computed once per frame
+        if isinstance(frame, FrameContext):
+            return frame.memo(key, compute)
+        return compute()
+
+    def getFrameRegions(self, bboxes: list) -> SparseFrame:
+        """
+        Captures only rows needed by given absolute [x1, y1, x2, y2] boxes (y2 excluded).
+        Returned sparse frame can be used by checks reading inside those boxes.
+        """
+        if self.stopRequested:
+            exit()
+        return self.device_connector.adb_screen_getregions(bboxes)
+
+    def _horLineBbox(self, hor_line) -> list:
+        x1, y1, x2 = hor_line[0] * self.width, hor_line[1] * self.height, hor_line[2] * self.width
+        start = int(y1 * self.width + x1)
+        stop = start + int(x2 - x1)
+        return [[0, start // self.width, self.width, (stop - 1) // self.width + 1]]
+
+    def getRegionsBboxes(self, coords_names=(), hor_lines=(), templates=(), abilities=False) -> list:
+        """
+        Returns the union of absolute boxes read by given checks, to be used with getFrameRegions.
+        :param coords_names: static or specific coordinates names
+        :param hor_lines: horizontal line names or [x1, y1, x2, y2] normalized lines
+        :param templates: general templates names
+        :param abilities: add the 3 abilities crops
+        """
+        bboxes = []
+        for name in coords_names:
+            coords = self.static_coords[name] if name in self.static_coords else self.specific_checks_coords[name]
+            for index in self.checkIndices(name, coords):
+                y, x = divmod(int(index), self.width)
+                bboxes.append([x, y, x + 1, y + 1])
+        for line in hor_lines:
+            bboxes += self._horLineBbox(self.hor_lines[line] if isinstance(line, str) else line)
+        for name in templates:
+            bboxes.append(self.general_templates[name]["bbox"])
+        if abilities:
+            bboxes += list(self._abilities_bboxes())
+        return bboxes
+
+    def getFramesStateMatrix(self, frames) -> tuple:
+        """
+        Evaluates every static and specific check over one frame or a stack of N frames in a single pass.
+        :param frames: a flatten frame, a (N, width*height, C) array or a list of flatten frames
+        :return: (names, matches, margins) with matches a (N, len(names)) boolean matrix and margins a dictionary
+                 name -> (N, points) distances from thresholds (negative when a point is out of range)
+        """
+        matches, margins = self.checks_classifier.evaluate(frames)
+        segments = self.checks_classifier.segments
+        margins_dict = {name: margins[:, segments == i] for i, name in enumerate(self.checks_classifier.names)}
+        return self.checks_classifier.names, matches, margins_dict
 
-    def getFrameStateComplete(self, frame=None) -> dict:
+    def getFrameStateComplete(self, frame=None, include_specific: bool = False) -> dict:
         """
         Computes a complete check on given frame (takes a screen if none passed.
         Returns a dictionary with all known states with boolean value assigned.
+        :param include_specific: also add static_specific_coords checks
         :return:
         """
         result = {}
         if frame is None:
             frame = self.getFrame()
+        if self.checks_classifier is not None:
+            names, matches = self._memo(frame, "checks", lambda: self.getFramesStateMatrix(frame)[:2])
+            return {k: bool(m) for k, m in zip(names, matches[0])
+                    if include_specific or k in self.static_coords}
         for k, v in self.static_coords.items():
             around = 2 if "around" not in self.static_coords[k].keys() else self.static_coords[k]["around"]
-            logging.debug("Checking %s, around = %d" % (k, around))
-            result[k] = self._check_screen_points_equal(frame, v["coordinates"], v["values"], around=around)
+            logging.debug("Checking %s, around = %s", k, around)
+            result[k] = self._check_screen_points_equal(frame, v["coordinates"], v["values"], around=around,
+                                                        indices=self.checkIndices(k, v))
         return result
 
-    def _extract_abilities_3(self, frame):
+    def _abilities_bboxes(self):
         #TODO: get thoose from json file in coords
         w, h = 1080, 1920
 
@@ -299,7 +508,12 @@ class GameScreenConnector:
         c1 = (x1, y1, x1 + sw, y1 + sh)
         c2 = (x2, y1, x2 + sw, y1 + sh)
         c3 = (x3, y1, x3 + sw, y1 + sh)
+        return c1, c2, c3
 
+    def _extract_abilities_3(self, frame):
+        c1, c2, c3 = self._abilities_bboxes()
+        if isinstance(frame, (SparseFrame, FrameContext)):
+            return tuple(Image.fromarray(np.ascontiguousarray(frame.crop(c))).convert("RGBA") for c in (c1, c2, c3))
         cr1, cr2, cr3 = frame.crop(c1), frame.crop(c2), frame.crop(c3)
         return cr1, cr2, cr3
 
@@ -313,54 +527,96 @@ class GameScreenConnector:
         Returns:
 
         """
-        if frame is None:
-            frame = self.getFrame(return_pillow=True)
-        cr1, cr2, cr3 = self._extract_abilities_3(frame)
-        a1, a2, a3 = np.array(cr1.getdata()), np.array(cr2.getdata()), np.array(cr3.getdata())
-        states = {"l":"unknown", "c":"unknown", "r":"unknown"}
-        for ab_image, k in zip([a1, a2, a3], states.keys()):
-            for ab_name, ab_template in self.abilities_templates.items():
-                dist = get_matrix_diff(ab_image, ab_template)
-                if dist < self.abilities_treshold:
-                    states[k] = ab_name
-                    break
-        if states["l"] == "unknown": self.save_unknown_ability(cr1)
-        if states["c"] == "unknown": self.save_unknown_ability(cr2)
-        if states["r"] == "unknown": self.save_unknown_ability(cr3)
+        states, _ = self.getAbilityMatches(frame)
         return states
 
+    def getAbilityMatches(self, frame=None) -> (dict, dict):
+        """
+        Matches the 3 abilities crops against all templates at once.
+        Returns the states dictionary of getAbilityType ("l", "c", "r" -> nearest ability name under threshold or
+        unknown) and the full distances table ("l", "c", "r" -> {ability name: distance}).
+        """
+        if frame is None:
+            if self.roi_capture:
+                frame = self.getFrameRegions(self.getRegionsBboxes(abilities=True))
+            else:
+                frame = self.getFrame()
+        crops = self._extract_abilities_3(frame)
+        found, dists = self.ability_matcher.match([np.asarray(cr.convert("RGBA")) for cr in crops],
+                                                  self.abilities_treshold)
+        states, distances = {}, {}
+        for k, name, row, cr in zip(["l", "c", "r"], found, dists, crops):
+            states[k] = name
+            distances[k] = dict(zip(self.ability_matcher.names, row.tolist()))
+            if name == "unknown": self.save_unknown_ability(cr)
+        return states, distances
+
+    @staticmethod
+    def abilityConfidence(distances: dict) -> float:
+        """
+        Returns margin between second best and best distance of one slot (higher is more reliable).
+        """
+        d = sorted(distances.values())
+        if len(d) < 2:
+            return float('inf') if len(d) == 1 else 0.0
+        return d[1] - d[0]
+
+    def _cropFrame(self, frame, bbox) -> np.ndarray:
+        """
+        Returns bbox [x1, y1, x2, y2] of frame (flattern ZZZx4 np.ndarray, SparseFrame or PIL) as a (h, w, 4) array.
+        """
+        if isinstance(frame, (SparseFrame, FrameContext)):
+            return frame.crop(bbox)
+        elif type(frame) == np.ndarray:
+            x1, y1, x2, y2 = bbox
+            frame2 = frame.reshape(self.height, self.width, -1)
+            return frame2[y1:y2, x1:x2]
+        else: #PIL
+            crp = frame.crop(bbox)
+            return np.asarray(crp.convert("RGBA"))
+
     def _check_general_template(self, name_of_template, frame=None):
         """
         Computes a frame check based on saved data and returns true if thery are similar.
         :param name_of_template:
-        :param frame: Either flattern ZZZx4 np.ndarray or PIL full image
+        :param frame: Either FrameContext, flattern ZZZx4 np.ndarray, SparseFrame or PIL full image
         :return:
         """
         if frame is None:
-            frame = self.getFrame(return_pillow=True)
+            if self.roi_capture:
+                frame = self.getFrameRegions(self.getRegionsBboxes(templates=[name_of_template]))
+            else:
+                frame = self.getFrame()
         v = self.general_templates[name_of_template]
-        if type(frame) == np.ndarray:
-            x1,y1,x2,y2 = v["bbox"]
-            frame2 = frame.reshape(self.height, self.width, 4)
-            fram2_crp = frame2[y1:y2, x1:x2]
-            crp_np = fram2_crp.reshape(fram2_crp.shape[0]*fram2_crp.shape[1], 4)
-        else: #PIL
-            crp = frame.crop(v["bbox"])
-            crp_np = np.array(crp.getdata())
-        if crp_np.shape[0] != v["template"].shape[0] or crp_np.shape[1] != v["template"].shape[1]:
+        dist = self._memo(frame, ("template", name_of_template), lambda: self._templateDistance(v, frame))
+        if dist is None:
             logging.info("Error during templates check: wrong shape")
             return False
-        dist = get_matrix_diff(crp_np, v["template"])
         return dist < v["th"]
 
+    def _templateDistance(self, v: dict, frame) -> float:
+        crp_np = self._cropFrame(frame, v["bbox"])
+        if crp_np.shape != v["template"].shape:
+            return None
+        return get_matrix_diff(crp_np, v["template"])
+
     def save_unknown_ability(self, ability_pil):
-        num = 0
-        path = os.path.join(self.abilities_unknown_fld, "unknown_ability_{}.png".format(num))
-        while os.path.exists(path):
-            num += 1
-            path = os.path.join(self.abilities_unknown_fld, "unknown_ability_{}.png".format(num))
-        ability_pil.save(path)
-        logging.info("Unknown ability {} saved in {}".format(num, path))
+        with GameScreenConnector._shared_lock:
+            if self.unknown_abilities is None:
+                folder = os.path.abspath(self.abilities_unknown_fld)
+                if folder not in GameScreenConnector._shared_unknown_abilities:
+                    GameScreenConnector._shared_unknown_abilities[folder] = UnknownAbilitiesIndex(folder)
+                self.unknown_abilities = GameScreenConnector._shared_unknown_abilities[folder]
+            path, saved = self.unknown_abilities.add(ability_pil)
+        if saved:
+            logging.info("Unknown ability saved in {}".format(path))
+        else:
+            logging.debug("Unknown ability already saved in {}".format(path))
+
+    def flushUnknownAbilities(self):
+        with GameScreenConnector._shared_lock:
+            if self.unknown_abilities is not None:
+                self.unknown_abilities.flush()
 
     def getFrameState(self, frame=None) -> str:
         """
@@ -371,14 +627,44 @@ class GameScreenConnector:
         state = "unknown"
         if frame is None:
             frame = self.getFrame()
+        if self.state_classifier is not None:
+            return self._memo(frame, "state", lambda: self.state_classifier.classify(frame))
         for k, v in self.static_coords.items():
             around = 2 if "around" not in self.static_coords[k].keys() else self.static_coords[k]["around"]
-            logging.debug("Checking %s, around = %d" % (k, around))
-            if self._check_screen_points_equal(frame, v["coordinates"], v["values"], around=around):
+            logging.debug("Checking %s, around = %s", k, around)
+            if self._check_screen_points_equal(frame, v["coordinates"], v["values"], around=around,
+                                               indices=self.checkIndices(k, v)):
                 state = k
                 break
         return state
 
+    def getFrameStates(self, frame=None) -> list:
+        """
+        Returns all states matching given frame (takes a screen if none passed), in static_coords order.
+        """
+        if frame is None:
+            frame = self.getFrame()
+        if self.state_classifier is not None:
+            return self._memo(frame, "states", lambda: self.state_classifier.classifyAll(frame))
+        return [k for k, v in self.getFrameStateComplete(frame).items() if v]
+
+    def knownChecks(self, names) -> list:
+        """
+        Returns the names of given ones saved in static or specific coords.
+        """
+        return [n for n in names if n in self.static_coords or n in self.specific_checks_coords]
+
+    def matchState(self, states, frame=None) -> str:
+        """
+        Returns the first of states (static or specific coords names) matching given frame, None if none matches.
+        """
+        if frame is None:
+            frame = self.getFrame()
+        for name in self.knownChecks(states):
+            if self.checkFrame(name, frame):
+                return name
+        return None
+
     def _getHorLine(self, hor_line, frame):
         """
         Returns a horizontal line (list of colors) given hor_line [x1, y1, x2, y2] coordinates. If no frame given, it takes a screen.
@@ -389,98 +675,53 @@ class GameScreenConnector:
         x1, y1, x2, y2 = hor_line[0] * self.width, hor_line[1] * self.height, hor_line[2] * self.width, hor_line[
             3] * self.height
         if frame is None:
-            frame = self.getFrame()
+            if self.roi_capture:
+                frame = self.getFrameRegions(self._horLineBbox(hor_line))
+            else:
+                frame = self.getFrame()
         start = int(y1 * self.width + x1)
         size = int(x2 - x1)
-        line = frame[start:start + size]
-        return line
+        return self._memo(frame, ("line", start, size), lambda: frame[start:start + size])
 
     def getLineExpBar(self, frame=None):
         """
-        Returns the colors of Experience bar as a line. If no frame given, it takes a screen.
+        Returns the Experience bar as a boolean mask (True where pixel is experience yellow).
+        If no frame given, it takes a screen.
         :param frame:
         :return:
         """
-        line = self._getHorLine(self.hor_lines["hor_exp_bar"], frame)
-        masked_yellow = []
-        for px in line:
-            if self.pixel_equals(px, self.yellow_experience, 3):
-                masked_yellow.append(px)
-            else:
-                masked_yellow.append([0, 0, 0, 0])
-        return masked_yellow
+        return self._memo(frame, "exp_bar", lambda: LineAnalysis.color_mask(
+            self._getHorLine(self.hor_lines["hor_exp_bar"], frame), self.yellow_experience, 3))
 
-    def filterRawHpLine_window(self, line):
+    def filterLineByColor(self, line):
         """
-            Given a horizontal array of pixels RGBA, filter data in order to obtain position of character based on his HP.
+        Returns a (n, 4) uint8 line with green_hp where pixel is hp green, black elsewhere.
         """
-        # Filter outlayers:
-        first_filter = self.removeOutlayersInLine(line, self.green_hp)
-        return first_filter
+        mask = LineAnalysis.colors_mask(line, [self.green_hp, self.green_hp_high], [8, 12, 8])
+        masked_green = np.zeros((len(mask), 4), dtype=np.uint8)
+        masked_green[mask] = self.green_hp
+        return masked_green
 
-    def filterRawHpLine_convolution(self, line):
+    def getPlayerLocation(self, frame=None) -> (float, float):
         """
-            Given a horizontal array of pixels RGBA, convolve pixel in order to get clean location of player
+        Finds the player from his HP bar: center (px) of the largest group of hp green pixels and a confidence
+        in [0, 1] (0 if no bar found, center is then screen center). If no frame given, it takes a screen.
         """
-        # TODO: finish this or use filterRawHpLine_window
-        return line
-
-    def filterLineByColor(self, line):
-        masked_green = []
-        i = 0
-        for px in line:
-            i += 1
-            if i == 452:
-                a = 0
-            if self.pixel_equals(px, self.green_hp, [8, 12, 8]) or self.pixel_equals(px, self.green_hp_high,
-                                                                                     [8, 12, 8]):
-                masked_green.append(self.green_hp)
-            else:
-                masked_green.append([0, 0, 0, 0])
-        return masked_green
-
-    def getPlayerDecenteringByStartStop(self, line):
-        first = 0
-        last = 0
-        for i, el in enumerate(line):
-            if self.pixel_equals(self.green_hp, el, 2):
-                if first == 0:
-                    first = i
-                last = i
-        center_px = (last + first) / 2
-        center_diff = int((self.width / 2) - center_px)
-        return center_diff
-
-    def getPlayerDecenteringByMaxGreenGroup(self, line):
-        groups = []
-        high_val = self.green_hp[1]
-        start = 0
-        in_block = False
-        biggest_width = [0, 0, 0]
-        for i, el in enumerate(line):
-            if el[1] == high_val:
-                if in_block:
-                    groups.append([start, i, i - start])
-                    if groups[-1][-1] > biggest_width[-1]:
-                        biggest_width = groups[-1]
-                else:
-                    in_block = True
-                    start = i
-        center_px = (biggest_width[0] + biggest_width[1]) / 2
+        line = self.getLineHpBar(frame)
+        mask = LineAnalysis.colors_mask(line, [self.green_hp, self.green_hp_high], [8, 12, 8])
+        center_px, length, confidence = LineAnalysis.largest_run(mask)
+        if confidence == 0:
+            return self.width / 2, 0.0
+        return center_px, confidence
+
+    def getPlayerDecentering(self, frame=None) -> (int, str):
+        center_px, confidence = self.getPlayerLocation(frame)
         center_diff = int((self.width / 2) - center_px)
-        return center_diff
-
-    def getPlayerDecentering(self) -> (int, str):
-        line = self.getLineHpBar()
-        line = self.filterLineByColor(line)
-        line_filtered = self.filterRawHpLine_window(line)
-        # center_diff = self.getPlayerDecenteringByStartStop(line_filtered)
-        center_diff = self.getPlayerDecenteringByMaxGreenGroup(line_filtered)
         if abs(center_diff) < (self.door_width * self.width):
             dir = "center"
         else:
             dir = "right" if center_diff < 0 else "left"
-        logging.info("Character on the %s side by %dpx" % (dir, abs(center_diff)))
+        logging.info("Character on the %s side by %dpx (confidence %.2f)" % (dir, abs(center_diff), confidence))
         return center_diff, dir
 
     def getLineHpBar(self, frame=None):
@@ -492,29 +733,6 @@ class GameScreenConnector:
         line = self._getHorLine(self.hor_lines["hor_hp_bar"], frame)
         return line
 
-    def removeOutlayersInLine(self, masked_green, high_pixel_color):
-        line = masked_green.copy()
-        n = len(line)
-        i = 0
-        window_width = 15
-        min_greens_pixels = 9
-        while i < n:
-            if i in range(window_width):  # First 4 take black. no problem losing them
-                line[i] = [0, 0, 0, 0]
-            else:
-                if i > 370:
-                    a = 3
-                sum = 0
-                for j in range(window_width):
-                    sum += 1 if masked_green[i - j][0] == high_pixel_color[0] else 0
-                for j in range(window_width):
-                    line[i - j] = [0, 0, 0, 0] if sum < min_greens_pixels else high_pixel_color
-                i += window_width - 1  # Skip() and go to next window
-            i += 1
-        for i in range(window_width):  # Last 4 take black. no problem losing them
-            line[n - i - 1] = [0, 0, 0, 0]
-        return line
-
     def getHorLine(self, line_name: str, frame=None):
         """
         Returns the colors of Experience bar as a line. If no frame given, it takes a screen.
@@ -528,16 +746,7 @@ class GameScreenConnector:
         return self._getHorLine(self.hor_lines[line_name], frame)
 
     def _checkBarHasChanged(self, old_line_hor_bar, current_exp_bar, around=0):
-        if len(old_line_hor_bar) != len(current_exp_bar):
-            min_len = min(len(old_line_hor_bar), len(current_exp_bar))
-            old_line_hor_bar = old_line_hor_bar[:min_len]
-            current_exp_bar = current_exp_bar[:min_len]
-        changed = False
-        for i in range(len(old_line_hor_bar)):
-            if not self.pixel_equals(old_line_hor_bar[i], current_exp_bar[i], around=around):
-                changed = True
-                break
-        return changed
+        return LineAnalysis.has_changed(old_line_hor_bar, current_exp_bar, around)
 
     def checkExpBarHasChanged(self, old_line_hor_bar, frame=None):
         """
@@ -0,0 +1,117 @@
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from src.WorkerThread import WorkerThread
+
+
+class InputDispatcher(object):
+    """
+    Sends swipes and taps to the device from a dedicated worker thread, in the order they are queued.
+    Every command returns a Future, so the caller can keep analysing the screen while the device moves.
+    cancel() drops every command not started yet and stops a running macro after its current swipe
+    (a swipe already sent to the device always completes).
+    """
+
+    def __init__(self, device_connector):
+        self.device_connector = device_connector
+        self._queue = queue.Queue()
+        self._cancel_cond = threading.Condition()
+        self._generation = 0  # increased on every cancel, interrupting pauses queued before
+        self._thread = None
+        self._lock = threading.Lock()
+        self._macro_running = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self._thread = WorkerThread(daemon=True)
+            self._thread.function = self._worker
+            self._thread.start()
+
+    def stop(self):
+        self.cancel()
+        if self.running:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def _submit(self, function, *args) -> Future:
+        self.start()
+        future = Future()
+        self._queue.put((future, function, args))
+        return future
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            future, function, args = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(function(*args))
+            except Exception as e:
+                logging.error("Input command failed: %s" % str(e))
+                future.set_exception(e)
+
+    def _pause(self, s: float, generation: int) -> bool:
+        with self._cancel_cond:
+            return not self._cancel_cond.wait_for(lambda: self._generation != generation, timeout=s)
+
+    def swipe(self, locations, s: float) -> Future:
+        return self._submit(self.device_connector.adb_swipe, locations, s)
+
+    def _macro(self, steps: list) -> bool:
+        self._macro_running = True
+        try:
+            return self.device_connector.adb_swipe_macro(steps)
+        finally:
+            self._macro_running = False
+
+    def macro(self, steps: list) -> Future:
+        """
+        Queues a compiled macro (see MacroCompiler), executed on the device by one shell script.
+        """
+        return self._submit(self._macro, steps)
+
+    def tap(self, coord) -> Future:
+        return self._submit(self.device_connector.adb_tap, coord)
+
+    def pause(self, s: float) -> Future:
+        """
+        Queues a delay between two commands (result is False if interrupted by cancel).
+        """
+        return self._submit(self._pause, s, self._generation)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def cancel(self) -> int:
+        """
+        Cancels all queued commands not started yet and interrupts a running pause.
+        Returns the number of cancelled commands.
+        """
+        cancelled = 0
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:  # keep stop request
+                self._queue.put(None)
+                break
+            if item[0].cancel():
+                cancelled += 1
+        with self._cancel_cond:
+            self._generation += 1
+            self._cancel_cond.notify_all()
+        if self._macro_running:
+            self.device_connector.adb_cancel_macro()
+        return cancelled
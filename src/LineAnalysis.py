@@ -0,0 +1,100 @@
+"""
+Boolean array operations on horizontal lines of pixels (as returned by GameScreenConnector._getHorLine).
+A line is any (n, 3+) sequence of pixels; only RGB channels are considered, as in pixel_equals.
+"""
+import numpy as np
+
+
+def as_rgb(line) -> np.ndarray:
+    """
+    Returns line as a (n, 3) int16 array (no uint8 wrap around on subtractions).
+    """
+    arr = np.asarray(line)
+    if arr.size == 0:
+        return np.zeros((0, 3), dtype=np.int16)
+    return arr.reshape(len(arr), -1)[:, :3].astype(np.int16)
+
+
+def _around3(around) -> np.ndarray:
+    if isinstance(around, int):
+        return np.array([around, around, around], dtype=np.int16)
+    elif isinstance(around, list):
+        return np.array(around[:3], dtype=np.int16)
+    return np.array([5, 5, 5], dtype=np.int16)
+
+
+def color_mask(line, color, around=5) -> np.ndarray:
+    """
+    Returns a boolean mask of pixels equal to color within around (same rule of pixel_equals).
+    """
+    diff = np.abs(as_rgb(line) - np.array(color[:3], dtype=np.int16))
+    return np.all(diff <= _around3(around), axis=1)
+
+
+def colors_mask(line, colors: list, around=5) -> np.ndarray:
+    """
+    Returns a boolean mask of pixels equal to any of colors within around.
+    """
+    rgb = as_rgb(line)
+    mask = np.zeros(len(rgb), dtype=bool)
+    for color in colors:
+        mask |= color_mask(rgb, color, around)
+    return mask
+
+
+def range_mask(line, lower, upper) -> np.ndarray:
+    """
+    Returns a boolean mask of pixels with every RGB channel inside [lower, upper].
+    """
+    rgb = as_rgb(line)
+    return np.all((rgb >= np.array(lower[:3])) & (rgb <= np.array(upper[:3])), axis=1)
+
+
+def all_in_range(line, lower, upper) -> bool:
+    """
+    True if all pixels of line are inside [lower, upper] (also True for an empty line).
+    """
+    return bool(np.all(range_mask(line, lower, upper)))
+
+
+def has_changed(old_line, new_line, around=0) -> bool:
+    """
+    True if any pixel changed more than around on a channel. Lines of different length are compared on the
+    shortest one. Boolean masks are compared element by element.
+    """
+    old_line, new_line = np.asarray(old_line), np.asarray(new_line)
+    n = min(len(old_line), len(new_line))
+    if old_line.dtype == bool or new_line.dtype == bool:
+        return bool(np.any(old_line[:n] != new_line[:n]))
+    diff = np.abs(as_rgb(old_line[:n]) - as_rgb(new_line[:n]))
+    return bool(np.any(diff > _around3(around)))
+
+
+def runs(mask) -> np.ndarray:
+    """
+    Returns a (k, 2) array with [start, stop) of every run of True values in mask.
+    """
+    padded = np.concatenate([[False], np.asarray(mask, dtype=bool), [False]])
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    return edges.reshape(-1, 2)
+
+
+def largest_run(mask, window: int = 15, min_count: int = 9) -> (float, int, float):
+    """
+    Finds the largest group of True values in mask, ignoring sparse noise and filling small holes: a pixel is
+    kept when at least min_count pixels of the window centered on it are True.
+    Returns (center, length, confidence), with confidence the share of kept pixels that are in the largest run
+    (0 if nothing found, center is then -1).
+    """
+    mask = np.asarray(mask, dtype=bool)
+    if len(mask) == 0:
+        return -1, 0, 0.0
+    counts = np.convolve(mask.astype(np.int32), np.ones(window, dtype=np.int32), mode="same")
+    kept = counts >= min_count
+    found = runs(kept)
+    if len(found) == 0:
+        return -1, 0, 0.0
+    lengths = found[:, 1] - found[:, 0]
+    best = int(np.argmax(lengths))
+    start, stop = found[best]
+    return float(start + stop - 1) / 2, int(lengths[best]), float(lengths[best] / lengths.sum())
@@ -0,0 +1,43 @@
+from src.CoordsCompiler import CoordsCompiler
+
+
+class MacroCompiler(object):
+    """
+    Turns a movements macro ([['n', .5], ['nw', 2.5], ...]) into absolute swipe steps and into a single
+    shell script, run on the device in one adb command (no process spawn and transport gap between steps).
+    The script writes its pid in pid_file, so the remaining steps can be cancelled by killing it.
+    """
+    pid_file = "/data/local/tmp/archero_macro.pid"
+
+    def __init__(self, movements: dict, width: int, height: int):
+        self.movements = movements
+        self.width = width
+        self.height = height
+        self.vectors = {name: v.tolist() for name, v in CoordsCompiler(width, height).movements(movements).items()}
+
+    def compile(self, delay: float, coord_and_dur: list) -> list:
+        """
+        Returns a list of [x1, y1, x2, y2, duration, delay_after] steps (pixels and seconds).
+        """
+        return [self.vectors[name.lower()] + [t, delay] for name, t in coord_and_dur]
+
+    @staticmethod
+    def duration(steps: list) -> float:
+        return sum(step[4] + step[5] for step in steps)
+
+    @classmethod
+    def toScript(cls, steps: list) -> str:
+        """
+        Returns the one line shell script executing all steps.
+        """
+        parts = ["echo $$ > %s" % cls.pid_file]
+        for x1, y1, x2, y2, t, delay in steps:
+            parts.append("input swipe %d %d %d %d %d" % (x1, y1, x2, y2, int(t * 1000)))
+            if delay > 0:
+                parts.append("sleep %.3f" % delay)
+        parts.append("rm -f %s" % cls.pid_file)
+        return "; ".join(parts)
+
+    @classmethod
+    def cancelScript(cls) -> str:
+        return "if [ -f {0} ]; then kill $(cat {0}); rm -f {0}; fi".format(cls.pid_file)
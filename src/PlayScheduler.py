@@ -0,0 +1,93 @@
+import os
+import time
+import logging
+import statistics
+from src.Utils import loadJsonData, saveJsonObject
+
+
+class PlayScheduler(object):
+    """
+    Chooses when letPlay captures next frame, from the time rooms of the same chapter and level took to clear
+    in previous runs (persisted in a json file):
+    - long before expected clear time (known long fight) it backs off to max_interval
+    - near expected clear time it polls every expected/6 seconds (within min and max interval)
+    - as soon as the room shows activity (experience gained, door light appearing) it polls every min_interval
+    """
+
+    def __init__(self, history_path: str, min_interval: float = 0.5, max_interval: float = 6.0,
+                 history_size: int = 10):
+        self.history_path = history_path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.history_size = history_size
+        self.history = {}  # chapter -> level -> list of seconds to clear
+        self.room = None
+        self.room_start = 0.0
+        self.last_poll = 0.0
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.history_path):
+            return
+        try:
+            self.history = loadJsonData(self.history_path)
+        except Exception as e:
+            logging.warning("Unable to read play timings %s: %s" % (self.history_path, str(e)))
+            self.history = {}
+
+    def save(self):
+        try:
+            saveJsonObject(self.history_path, self.history)
+        except Exception as e:
+            logging.warning("Unable to write play timings %s: %s" % (self.history_path, str(e)))
+
+    def expectedClearTime(self, chapter: int, level: int) -> float:
+        """
+        Median of last clear times of given room, None if never cleared.
+        """
+        times = self.history.get(str(chapter), {}).get(str(level), [])
+        return statistics.median(times) if len(times) > 0 else None
+
+    def startRoom(self, chapter: int, level: int):
+        self.room = (str(chapter), str(level))
+        self.room_start = self.last_poll = time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.room_start
+
+    def nextInterval(self, activity: bool = False) -> float:
+        """
+        Seconds between two captures at this moment of current room.
+        """
+        if activity:
+            return self.min_interval
+        expected = self.expectedClearTime(*self.room) if self.room is not None else None
+        if expected is None:
+            return self.max_interval / 2
+        if self.elapsed() < expected * 0.5:
+            return self.max_interval
+        return min(self.max_interval, max(self.min_interval, expected / 6))
+
+    def waitTime(self, activity: bool = False) -> float:
+        """
+        Seconds left before next capture (time spent in movements since last capture is already counted).
+        Marks the capture as done.
+        """
+        now = time.monotonic()
+        left = max(0.0, self.nextInterval(activity) - (now - self.last_poll))
+        self.last_poll = now + left
+        return left
+
+    def endRoom(self, cleared: bool):
+        """
+        Records clear time of current room (only if cleared) and saves history.
+        """
+        if self.room is None:
+            return
+        if cleared:
+            chapter, level = self.room
+            times = self.history.setdefault(chapter, {}).setdefault(level, [])
+            times.append(round(self.elapsed(), 2))
+            del times[:-self.history_size]
+            self.save()
+        self.room = None
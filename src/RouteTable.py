@@ -0,0 +1,78 @@
+import os
+import logging
+from src.Utils import loadJsonData
+from src.MacroCompiler import MacroCompiler
+
+
+class RouteTable(object):
+    """
+    Movement routes of every chapter, loaded once from a routes folder holding default.json and <chapter>.json
+    files:
+    {
+        "phases": {"cross": [["n", 1.5], ["w", .3], ...], "exit": [...], ...},
+        "levels": {"6": {"cross": [...]}, "11,12,13": {"cross": [...]}}
+    }
+    A phase is a list of movements ([direction, seconds]) and of ["popups", seconds] items, waiting at most
+    seconds for a popup and handling it. A chapter phase replaces the default one, a level phase replaces the
+    chapter one. compile() turns every phase into absolute swipe steps (see MacroCompiler) so get() is a lookup.
+    """
+    default_name = "default"
+    popups_item = "popups"
+
+    def __init__(self, routes_path: str):
+        self.routes_path = routes_path
+        self.routes = {}  # chapter (str, or default_name) -> route dict
+        self.compiled = {}  # (chapter, level, phase) -> list of ("macro", steps, description) / ("popups", seconds)
+        self.load()
+
+    def load(self):
+        self.routes = {}
+        if not os.path.isdir(self.routes_path):
+            logging.warning("Routes folder %s not found" % self.routes_path)
+            return
+        for filename in sorted(os.listdir(self.routes_path)):
+            name, ext = os.path.splitext(filename)
+            if ext != ".json":
+                continue
+            try:
+                self.routes[name] = loadJsonData(os.path.join(self.routes_path, filename))
+            except Exception as e:
+                logging.error("Unable to load route %s: %s" % (filename, str(e)))
+
+    def _compilePhase(self, compiler: MacroCompiler, items: list) -> list:
+        compiled = []
+        moves = []
+        for name, value in items + [[self.popups_item, None]]:
+            if name != self.popups_item:
+                moves.append([name, value])
+                continue
+            if len(moves) > 0:
+                compiled.append(("macro", compiler.compile(0, moves), " ".join(d for d, _ in moves)))
+                moves = []
+            if value is not None:
+                compiled.append((self.popups_item, value))
+        return compiled
+
+    def compile(self, compiler: MacroCompiler):
+        """
+        Compiles every route phase with the macro compiler of current movements and screen size. Level keys
+        (comma separated levels) are expanded.
+        """
+        self.compiled = {}
+        for chapter, route in self.routes.items():
+            for phase, items in route.get("phases", {}).items():
+                self.compiled[(chapter, None, phase)] = self._compilePhase(compiler, items)
+            for levels, phases in route.get("levels", {}).items():
+                for level in levels.split(","):
+                    for phase, items in phases.items():
+                        self.compiled[(chapter, int(level), phase)] = self._compilePhase(compiler, items)
+
+    def get(self, chapter: int, level: int, phase: str) -> list:
+        """
+        Returns compiled phase for chapter and level (empty list if no route defines it).
+        """
+        chapter = str(chapter)
+        for key in [(chapter, level, phase), (chapter, None, phase), (self.default_name, None, phase)]:
+            if key in self.compiled:
+                return self.compiled[key]
+        return []
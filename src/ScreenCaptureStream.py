@@ -0,0 +1,187 @@
+import logging
+import socket
+import threading
+import time
+import numpy as np
+from src.UsbConnector import UsbConnector, ScreenCaptureMode, raw_screencap_header
+from src.WorkerThread import WorkerThread
+
+
+class ScreenCaptureStream(object):
+    """
+    Keeps one long lived raw screencap loop open on device and decodes frames in background
+    into a ring of preallocated (width*height, 4) uint8 buffers.
+    """
+    # Looping screencap inside a single exec session: frames arrive back to back on one socket
+    stream_cmd = "while true; do /system/bin/screencap; done"
+
+    def __init__(self, device_connector: UsbConnector, ring_size: int = 4, max_frame_age: float = 0.5,
+                 max_wait_fresh: float = 1.0):
+        """
+        :param ring_size: number of preallocated frames (at least 3: latest, one being read, one being written)
+        :param max_frame_age: seconds after which latest frame is considered stale
+        :param max_wait_fresh: seconds to wait for a fresh frame before giving up (caller should capture directly)
+        """
+        self.device_connector = device_connector
+        self.ring_size = max(3, ring_size)
+        self.max_frame_age = max_frame_age
+        self.max_wait_fresh = max_wait_fresh
+        self.width = 0
+        self.height = 0
+        self.header_size = 0
+        self.captured_frames = 0
+        self.dropped_frames = 0
+        self.running = False
+        self._ring = None
+        self._discard = None
+        self._latest = -1
+        self._latest_time = 0.0
+        self._latest_consumed = True
+        self._reading = set()
+        self._cond = threading.Condition()
+        self._conn = None
+        self._stopRequested = False
+        self._thread = None
+
+    def start(self) -> bool:
+        """
+        Starts the capture loop. Returns False if device does not support raw captures.
+        """
+        if self.running:
+            return True
+        if not self.device_connector.isConnected() or self.device_connector.capture_mode != ScreenCaptureMode.Raw:
+            logging.info("Capture stream needs a connected device with raw capture mode")
+            return False
+        try:
+            self.width, self.height, self.header_size = raw_screencap_header(self.device_connector._screencap_raw())
+        except Exception as e:
+            logging.warning("Unable to start capture stream: %s" % str(e))
+            return False
+        self._ring = np.empty((self.ring_size, self.width * self.height, 4), dtype=np.uint8)
+        self._discard = np.empty(self.width * self.height * 4, dtype=np.uint8)  # frames received with no free slot
+        self._latest = -1
+        self._latest_consumed = True
+        self._reading = set()
+        self.captured_frames = 0
+        self.dropped_frames = 0
+        self._stopRequested = False
+        self._conn = self.device_connector.adb_exec_stream(self.stream_cmd)
+        if self._conn is None:
+            return False
+        self.running = True
+        self._thread = WorkerThread(daemon=True)
+        self._thread.function = self._captureLoop
+        self._thread.start()
+        logging.info("Capture stream started at %dx%d with %d frames ring" % (self.width, self.height, self.ring_size))
+        return True
+
+    def stop(self):
+        self._stopRequested = True
+        if self._conn is not None:
+            try:
+                # unblocks a pending recv in capture thread
+                self._conn.socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._conn.close()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self._thread = None
+        self._conn = None
+        self.running = False
+        with self._cond:
+            self._cond.notify_all()
+
+    def _recvExact(self, view) -> bool:
+        sock = self._conn.socket
+        got, n = 0, len(view)
+        while got < n:
+            r = sock.recv_into(view[got:], n - got)
+            if r == 0:
+                return False
+            got += r
+        return True
+
+    def _nextWriteSlot(self) -> int:
+        with self._cond:
+            busy = self._reading | {self._latest}
+        for i in range(1, self.ring_size + 1):
+            slot = (self._latest + i) % self.ring_size
+            if slot not in busy:
+                return slot
+        return -1
+
+    def _captureLoop(self):
+        header = memoryview(bytearray(self.header_size))
+        expected = np.array([self.width, self.height], dtype='<u4')
+        try:
+            while not self._stopRequested:
+                if not self._recvExact(header):
+                    break
+                if not np.array_equal(np.frombuffer(header, dtype='<u4', count=2), expected):
+                    logging.warning("Capture stream: screen size changed, stopping stream")
+                    break
+                slot = self._nextWriteSlot()
+                if slot < 0:
+                    # every slot is being read: consume the frame and drop it
+                    if not self._recvExact(memoryview(self._discard)):
+                        break
+                    with self._cond:
+                        self.dropped_frames += 1
+                    continue
+                if not self._recvExact(memoryview(self._ring[slot].reshape(-1))):
+                    break
+                with self._cond:
+                    if not self._latest_consumed:
+                        self.dropped_frames += 1
+                    self._latest = slot
+                    self._latest_time = time.time()
+                    self._latest_consumed = False
+                    self.captured_frames += 1
+                    self._cond.notify_all()
+        except Exception as e:
+            if not self._stopRequested:
+                logging.warning("Capture stream interrupted: %s" % str(e))
+        self.running = False
+        with self._cond:
+            self._cond.notify_all()
+
+    def latestFrameAge(self) -> float:
+        if self._latest < 0:
+            return float('inf')
+        return time.time() - self._latest_time
+
+    def getLatestFrame(self, max_age: float = None, copy: bool = True):
+        """
+        Returns latest frame as (width*height, 4) uint8 array, or None if no frame newer than max_age
+        arrived within max_wait_fresh seconds.
+        With copy=False a read only view on the ring is returned: it stays valid only until ring_size-2 new frames.
+        """
+        max_age = self.max_frame_age if max_age is None else max_age
+        with self._cond:
+            fresh = lambda: not self.running or (self._latest >= 0 and time.time() - self._latest_time <= max_age)
+            if not fresh():
+                self._cond.wait_for(fresh, timeout=self.max_wait_fresh)
+            if self._latest < 0 or time.time() - self._latest_time > max_age:
+                return None
+            slot = self._latest
+            self._latest_consumed = True
+            if not copy:
+                view = self._ring[slot].view()
+                view.flags.writeable = False
+                return view
+            self._reading.add(slot)
+        try:
+            return self._ring[slot].copy()
+        finally:
+            with self._cond:
+                self._reading.discard(slot)
+
+    def waitNextFrame(self, timeout: float) -> bool:
+        """
+        Blocks until a frame newer than the current latest one arrives. Returns False on timeout or stream stop.
+        """
+        with self._cond:
+            current = self.captured_frames
+            return self._cond.wait_for(lambda: not self.running or self.captured_frames > current,
+                                       timeout=timeout) and self.running
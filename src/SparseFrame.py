@@ -0,0 +1,79 @@
+import numpy as np
+
+
+def merge_row_bands(bboxes, height: int, gap: int = 8) -> list:
+    """
+    Merges absolute [x1, y1, x2, y2] boxes (y2 excluded) into sorted, non overlapping [y1, y2) row bands.
+    Bands closer than gap rows are joined (fetching few extra rows is cheaper than another transfer).
+    """
+    rows = sorted([max(0, int(b[1])), min(height, int(b[3]))] for b in bboxes)
+    bands = []
+    for y1, y2 in rows:
+        if y2 <= y1:
+            continue
+        if bands and y1 <= bands[-1][1] + gap:
+            bands[-1][1] = max(bands[-1][1], y2)
+        else:
+            bands.append([y1, y2])
+    return bands
+
+
+class SparseFrame(object):
+    """
+    A frame where only some full width row bands were captured.
+    Indexing works like the flatten (width*height, 4) frame for pixels and horizontal segments of captured rows.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        # list of (y1, y2, pixels (y2-y1, width, 4))
+        self.bands = []
+
+    def addBand(self, y1: int, pixels: np.ndarray):
+        pixels = pixels.reshape(-1, self.width, pixels.shape[-1])
+        self.bands.append((y1, y1 + pixels.shape[0], pixels))
+
+    @staticmethod
+    def fromFullFrame(frame: np.ndarray, width: int, height: int, bands: list):
+        sparse = SparseFrame(width, height)
+        full = frame.reshape(height, width, -1)
+        for y1, y2 in bands:
+            sparse.addBand(y1, full[y1:y2])
+        return sparse
+
+    def _band(self, y1: int, y2: int):
+        for b1, b2, pixels in self.bands:
+            if b1 <= y1 and y2 <= b2:
+                return b1, pixels
+        raise IndexError("Rows %d-%d were not captured in this sparse frame" % (y1, y2))
+
+    def covers(self, bbox) -> bool:
+        try:
+            self._band(int(bbox[1]), int(bbox[3]))
+            return True
+        except IndexError:
+            return False
+
+    def __len__(self):
+        return self.width * self.height
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop = int(item.start or 0), int(item.stop if item.stop is not None else len(self))
+            y, x1 = divmod(start, self.width)
+            last_y = (stop - 1) // self.width
+            b1, pixels = self._band(y, last_y + 1)
+            offset = (y - b1) * self.width + x1
+            return pixels.reshape(-1, pixels.shape[-1])[offset:offset + stop - start]
+        y, x = divmod(int(item), self.width)
+        b1, pixels = self._band(y, y + 1)
+        return pixels[y - b1, x]
+
+    def crop(self, bbox) -> np.ndarray:
+        """
+        Returns (y2-y1, x2-x1, 4) pixels of bbox [x1, y1, x2, y2] (PIL crop convention, ends excluded).
+        """
+        x1, y1, x2, y2 = [int(v) for v in bbox]
+        b1, pixels = self._band(y1, y2)
+        return pixels[y1 - b1:y2 - b1, x1:x2]
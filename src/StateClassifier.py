@@ -0,0 +1,107 @@
+import logging
+import numpy as np
+from src.FrameContext import FrameContext
+from src.CoordsCompiler import CoordsCompiler
+
+
+class StateClassifier(object):
+    """
+    Compiled form of a coordinates dictionary (e.g. static_coords) for a given screen size, built on the flat
+    offsets compiled by CoordsCompiler.
+    All points of all states are checked with one gather and one broadcast compare,
+    giving same results of GameScreenConnector._check_screen_points_equal called state by state.
+    """
+
+    def __init__(self, coords: dict, width: int, height: int, indices: dict = None):
+        """
+        :param indices: name -> flat offsets of coords points, as compiled by CoordsCompiler.checks
+                        (compiled now if not given)
+        """
+        self.width = width
+        self.height = height
+        self.names = list(coords.keys())
+        if indices is None:
+            indices = CoordsCompiler(width, height).checks(coords)
+        offsets, lower, upper, segments = [], [], [], []
+        self.valid = np.ones(len(self.names), dtype=bool)
+        for s, name in enumerate(self.names):
+            v = coords[name]
+            idx, values = np.asarray(indices[name], dtype=np.int64), np.asarray(v["values"], dtype=np.int32)
+            if len(idx) != len(values):
+                logging.info("Wrong size between points and values in %s!" % name)
+                self.valid[s] = False
+                continue
+            if len(idx) == 0:
+                continue
+            inside = idx < width * height
+            if not np.all(inside):
+                logging.warning("Point of %s is outside a %dx%d screen" % (name, width, height))
+                self.valid[s] = False
+            arr = np.array(self._aroundToList(v["around"] if "around" in v else 2), dtype=np.int32)
+            values = values[inside, :3]
+            offsets.append(idx[inside])
+            lower.append(values - arr)
+            upper.append(values + arr)
+            segments.append(np.full(len(values), s, dtype=np.int64))
+        # flat pixel offsets of every point, their per channel bounds and the state each one belongs to
+        self.indices = np.concatenate(offsets) if len(offsets) > 0 else np.zeros(0, dtype=np.int64)
+        self.lower = np.concatenate(lower) if len(lower) > 0 else np.zeros((0, 3), dtype=np.int32)
+        self.upper = np.concatenate(upper) if len(upper) > 0 else np.zeros((0, 3), dtype=np.int32)
+        self.segments = np.concatenate(segments) if len(segments) > 0 else np.zeros(0, dtype=np.int64)
+        # (points, states) membership, to reduce many frames at once
+        self._membership = np.zeros((len(self.indices), len(self.names)), dtype=np.int32)
+        self._membership[np.arange(len(self.indices)), self.segments] = 1
+
+    @staticmethod
+    def _aroundToList(around) -> list:
+        # same interpretation of GameScreenConnector.pixel_equals
+        if isinstance(around, int):
+            return [around, around, around]
+        elif isinstance(around, list):
+            return [around[0], around[1], around[2]]
+        return [5, 5, 5]
+
+    def _gather(self, frame) -> np.ndarray:
+        if isinstance(frame, FrameContext):
+            frame = frame.flat
+        if isinstance(frame, np.ndarray) and frame.ndim == 2 and frame.shape[0] == self.width * self.height:
+            return frame[self.indices, :3]
+        return np.array([frame[int(i)][:3] for i in self.indices], dtype=np.int32).reshape(-1, 3)
+
+    def _gatherStack(self, frames) -> np.ndarray:
+        if isinstance(frames, np.ndarray) and frames.ndim == 3:
+            return frames[:, self.indices, :3].astype(np.int32)
+        if isinstance(frames, np.ndarray) and frames.ndim == 2:
+            frames = [frames]
+        return np.stack([self._gather(f) for f in frames]).astype(np.int32).reshape(-1, len(self.indices), 3)
+
+    def evaluate(self, frames) -> tuple:
+        """
+        Evaluates all states over one frame or a stack of N frames ((N, width*height, C) array or list of frames).
+        Returns (matches, margins):
+        matches is a (N, states) boolean matrix, margins a (N, points) matrix with the distance of each point
+        from its nearest threshold (negative when out of range). Use segments to know which state a point is of.
+        """
+        px = self._gatherStack(frames)
+        margins = np.minimum(px - self.lower, self.upper - px).min(axis=2)
+        fails = (margins < 0).astype(np.int32) @ self._membership
+        return (fails == 0) & self.valid, margins
+
+    def matches(self, frame) -> np.ndarray:
+        """
+        Returns a boolean array (one value per state, same order of names) telling which states match frame.
+        """
+        px = self._gather(frame)
+        ok = np.all((px >= self.lower) & (px <= self.upper), axis=1)
+        fails = np.bincount(self.segments[~ok], minlength=len(self.names))
+        return (fails == 0) & self.valid
+
+    def classify(self, frame) -> str:
+        """
+        Returns first matching state (in coordinates dictionary order) or 'unknown'.
+        """
+        found = np.flatnonzero(self.matches(frame))
+        return self.names[found[0]] if len(found) > 0 else "unknown"
+
+    def classifyAll(self, frame) -> list:
+        return [self.names[i] for i in np.flatnonzero(self.matches(frame))]
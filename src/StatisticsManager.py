@@ -6,8 +6,8 @@ import time
 
 class StatisticsManager(object):
 
-    def __init__(self):
-        self.statistics_folder = 'datas'
+    def __init__(self, statistics_folder: str = 'datas'):
+        self.statistics_folder = statistics_folder
         if not os.path.isdir(self.statistics_folder):
             print("info: creating statistics folder (this should already exist, something wrong is going on)")
             os.mkdir(self.statistics_folder)
@@ -0,0 +1,74 @@
+import os
+import json
+import logging
+import numpy as np
+from PIL import Image
+
+
+class TemplateStore(object):
+    """
+    Loads template images as contiguous uint8 (height, width, 4) RGBA arrays.
+    Arrays are persisted in a single uncompressed .npz next to the templates and reused
+    while every template file keeps same size and modification time.
+    An optional signature function (e.g. a small thumbnail) is precomputed for every template and
+    cached in same file, available in signatures after load.
+    """
+    index_key = "__index__"
+    signature_prefix = "sig:"
+
+    def __init__(self, cache_path: str, signature=None):
+        self.cache_path = cache_path
+        self.signature = signature
+        self.signatures = {}
+
+    @staticmethod
+    def _fileKey(path: str) -> list:
+        st = os.stat(path)
+        return [os.path.basename(path), st.st_mtime_ns, st.st_size]
+
+    @staticmethod
+    def loadImage(path: str) -> np.ndarray:
+        with Image.open(path) as im:
+            return np.ascontiguousarray(np.asarray(im.convert("RGBA")))
+
+    def _loadCache(self, index: dict) -> dict:
+        if not os.path.exists(self.cache_path):
+            return None
+        try:
+            with np.load(self.cache_path) as cache:
+                if json.loads(str(cache[self.index_key])) != index:
+                    return None
+                names = [name for name in index if name != self.index_key]
+                templates = {name: cache[name] for name in names}
+                if self.signature is not None:
+                    self.signatures = {name: cache[self.signature_prefix + name] for name in names}
+                return templates
+        except Exception as e:
+            logging.warning("Unable to read templates cache %s: %s" % (self.cache_path, str(e)))
+            return None
+
+    def _saveCache(self, index: dict, templates: dict):
+        tmp_path = self.cache_path + ".tmp.npz"
+        try:
+            sigs = {self.signature_prefix + name: sig for name, sig in self.signatures.items()}
+            np.savez(tmp_path, **{self.index_key: np.array(json.dumps(index))}, **templates, **sigs)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logging.warning("Unable to write templates cache %s: %s" % (self.cache_path, str(e)))
+
+    def load(self, paths: dict) -> dict:
+        """
+        Returns a dictionary name -> uint8 (h, w, 4) array for given name -> image path dictionary.
+        """
+        index = {name: self._fileKey(path) for name, path in paths.items()}
+        if self.signature is not None:
+            # rebuild when signature function changes
+            index[self.index_key] = getattr(self.signature, "cache_key", self.signature.__name__)
+        templates = self._loadCache(index)
+        if templates is None:
+            logging.debug("Building templates cache %s" % self.cache_path)
+            templates = {name: self.loadImage(path) for name, path in paths.items()}
+            if self.signature is not None:
+                self.signatures = {name: self.signature(t) for name, t in templates.items()}
+            self._saveCache(index, templates)
+        return templates
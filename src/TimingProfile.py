@@ -0,0 +1,77 @@
+import os
+import logging
+import numpy as np
+from src.Utils import loadJsonData, saveJsonObject
+
+
+class TimingProfile(object):
+    """
+    Device specific wait budgets, persisted in a json file per resolution folder and device serial:
+    {folder: {serial: {"samples": {transition: [seconds, ...]}, "budgets": {transition: seconds}}}}
+    A transition is a wait for an expected screen after an action (e.g. "tap:start>menu_home"); its samples are
+    the observed latencies, recorded only while calibrating. The budget of a transition is the quantile of its
+    samples plus margin seconds, and replaces the default wait once min_samples were recorded.
+    """
+
+    def __init__(self, path: str, quantile: float = 0.95, margin: float = 0.5, min_samples: int = 5,
+                 history_size: int = 50):
+        self.path = path
+        self.quantile = quantile
+        self.margin = margin
+        self.min_samples = min_samples
+        self.history_size = history_size
+        self.profiles = {}
+        self.profile = None
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            self.profiles = loadJsonData(self.path)
+        except Exception as e:
+            logging.warning("Unable to read timing profiles %s: %s" % (self.path, str(e)))
+            self.profiles = {}
+
+    def save(self):
+        try:
+            saveJsonObject(self.path, self.profiles)
+        except Exception as e:
+            logging.warning("Unable to write timing profiles %s: %s" % (self.path, str(e)))
+
+    def select(self, folder: str, serial: str):
+        """
+        Selects the profile of given resolution folder and device serial (created empty if missing).
+        """
+        device = self.profiles.setdefault(folder, {}).setdefault(serial or "unknown", {})
+        device.setdefault("samples", {})
+        device.setdefault("budgets", {})
+        self.profile = device
+        logging.info("Timing profile %s/%s: %d fitted transitions" % (folder, serial, len(device["budgets"])))
+
+    def record(self, transition: str, seconds: float):
+        if self.profile is None:
+            return
+        samples = self.profile["samples"].setdefault(transition, [])
+        samples.append(round(seconds, 3))
+        del samples[:-self.history_size]
+
+    def fit(self) -> dict:
+        """
+        Computes budgets of selected profile transitions having at least min_samples samples.
+        """
+        if self.profile is None:
+            return {}
+        budgets = self.profile["budgets"]
+        for transition, samples in self.profile["samples"].items():
+            if len(samples) >= self.min_samples:
+                budgets[transition] = round(float(np.quantile(samples, self.quantile)) + self.margin, 2)
+        return budgets
+
+    def budget(self, transition: str, default: float) -> float:
+        """
+        Returns fitted budget of transition, default if not calibrated on this device.
+        """
+        if self.profile is None:
+            return default
+        return self.profile["budgets"].get(transition, default)
@@ -0,0 +1,114 @@
+import os
+import re
+import json
+import logging
+import numpy as np
+from PIL import Image
+
+
+def dhash(image, size: int = 8) -> int:
+    """
+    Returns the 64 bit difference hash of a PIL image or RGBA array: one bit per horizontal gradient sign
+    of a (size, size + 1) grayscale thumbnail.
+    """
+    if not isinstance(image, Image.Image):
+        image = Image.fromarray(np.asarray(image, dtype=np.uint8))
+    px = np.asarray(image.convert("L").resize((size + 1, size), Image.BOX), dtype=np.int16)
+    bits = (px[:, 1:] > px[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class UnknownAbilitiesIndex(object):
+    """
+    On disk index (json in the unknown abilities folder) of saved unknown abilities.
+    A crop whose hash is within radius bits of an already saved one is only counted, else it is saved
+    with next free id, kept in memory.
+    The index is written on new entries and every flush_hits duplicates counted (flush() writes pending counts).
+    """
+    index_name = "unknown_index.json"
+    file_pattern = "unknown_ability_{}.png"
+
+    def __init__(self, folder: str, radius: int = 6, flush_hits: int = 20):
+        self.folder = folder
+        self.radius = radius
+        self.flush_hits = flush_hits
+        self._pending_hits = 0  # duplicates counted since last save
+        self.index_path = os.path.join(folder, self.index_name)
+        self.next_id = 0
+        self.entries = []  # [{"fn", "hash", "count"}]
+        self._hashes = np.zeros(0, dtype=np.uint64)
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path) as f:
+                    data = json.load(f)
+                self.next_id = data["next_id"]
+                self.entries = data["entries"]
+            except Exception as e:
+                logging.warning("Unable to read unknown abilities index %s: %s. Rebuilding" % (self.index_path, str(e)))
+                self._rebuild()
+        else:
+            self._rebuild()
+        self._hashes = np.array([int(e["hash"], 16) for e in self.entries], dtype=np.uint64)
+
+    def _rebuild(self):
+        # index images already in folder (saved before the index existed)
+        self.next_id, self.entries = 0, []
+        regex = re.compile(r"^unknown_ability_(\d+)\.png$")
+        for fn in sorted(os.listdir(self.folder)):
+            m = regex.match(fn)
+            if m is None:
+                continue
+            self.next_id = max(self.next_id, int(m.group(1)) + 1)
+            with Image.open(os.path.join(self.folder, fn)) as im:
+                self.entries.append({"fn": fn, "hash": "%016x" % dhash(im), "count": 1})
+        self.save()
+
+    def save(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"next_id": self.next_id, "entries": self.entries}, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+        self._pending_hits = 0
+
+    def flush(self):
+        """
+        Saves duplicates counts not written yet.
+        """
+        if self._pending_hits > 0:
+            self.save()
+
+    def nearest(self, h: int) -> (int, int):
+        """
+        Returns (entry position, hamming distance) of nearest saved hash, (-1, 64) if index is empty.
+        """
+        if len(self._hashes) == 0:
+            return -1, 64
+        xor = np.bitwise_xor(self._hashes, np.uint64(h))
+        dists = np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+        best = int(np.argmin(dists))
+        return best, int(dists[best])
+
+    def add(self, ability_pil) -> (str, bool):
+        """
+        Saves ability_pil if not already seen. Returns (path of saved or matching image, True if saved).
+        """
+        h = dhash(ability_pil)
+        pos, dist = self.nearest(h)
+        if pos >= 0 and dist <= self.radius:
+            entry = self.entries[pos]
+            entry["count"] += 1
+            self._pending_hits += 1
+            if self._pending_hits >= self.flush_hits:
+                self.save()
+            return os.path.join(self.folder, entry["fn"]), False
+        fn = self.file_pattern.format(self.next_id)
+        self.next_id += 1
+        path = os.path.join(self.folder, fn)
+        ability_pil.save(path)
+        self.entries.append({"fn": fn, "hash": "%016x" % h, "count": 1})
+        self._hashes = np.append(self._hashes, np.uint64(h))
+        self.save()
+        return path, True
@@ -5,8 +5,11 @@ from PIL import Image
 import numpy as np
 import io
 import time
+import enum
 import logging
 from src.WorkerThread import WorkerThread
+from src.SparseFrame import SparseFrame, merge_row_bands
+from src.MacroCompiler import MacroCompiler
 
 """
 This is the library
@@ -14,9 +17,67 @@ https://pypi.org/project/pure-python-adb/
 """
 
 
+class ScreenCaptureMode(str, enum.Enum):
+    Png = "png"
+    Raw = "raw"
+
+
+# android PixelFormat values accepted from a raw screencap
+RAW_FORMAT_RGBA_8888 = 1
+
+
+def raw_screencap_header(data) -> tuple:
+    """
+    Parses the header of a complete 'screencap' (without -p) output as (width, height, header_size).
+    Header is width, height, format (+ colorspace on android >= 9) as little endian uint32.
+    """
+    if len(data) < 12:
+        raise ValueError("Raw screencap too short (%d bytes)" % len(data))
+    w, h, fmt = np.frombuffer(data, dtype='<u4', count=3)
+    w, h, fmt = int(w), int(h), int(fmt)
+    if fmt != RAW_FORMAT_RGBA_8888:
+        raise ValueError("Unsupported raw screencap pixel format %d" % fmt)
+    size = w * h * 4
+    if len(data) - 16 == size:
+        header = 16
+    elif len(data) - 12 == size:
+        header = 12
+    else:
+        raise ValueError("Raw screencap of %d bytes does not match %dx%d" % (len(data), w, h))
+    return w, h, header
+
+
+def decode_raw_screencap(data) -> tuple:
+    """
+    Decodes the output of 'screencap' (without -p) as (width, height, pixels).
+    Pixels are a (width*height, 4) uint8 RGBA view on data, no copy is done.
+    """
+    w, h, header = raw_screencap_header(data)
+    size = w * h * 4
+    pixels = np.frombuffer(data, dtype=np.uint8, count=size, offset=header).reshape(w * h, 4)
+    return w, h, pixels
+
+
+def parse_adb_devices(output: str) -> list:
+    """
+    Returns serials of ready devices (state 'device') listed in 'adb devices' output.
+    """
+    serials = []
+    for line in output.splitlines()[1:]:
+        parts = line.split()
+        if len(parts) >= 2 and parts[1] == "device":
+            serials.append(parts[0])
+    return serials
+
+
 class UsbConnector(object):
 
-    def __init__(self, connect_now:bool=True):
+    def __init__(self, connect_now:bool=True, capture_mode: ScreenCaptureMode = ScreenCaptureMode.Raw,
+                 serial: str = None):
+        """
+        :param serial: adb serial of the device to use (one connector per device). None for first device found.
+        """
+        self.serial = serial
         self.connected = False
         self._client: AdbClient = None
         self.my_device: Device = None
@@ -27,6 +88,10 @@ class UsbConnector(object):
         self.connectionCheckThread = WorkerThread()
         self._continousCheckStopRequired = False
         self.started = False
+        self.capture_mode = capture_mode
+        self._raw_header = None  # (width, height, header_size) of last raw capture
+        self.roi_tmp_file = "/data/local/tmp/archero_roi.raw"
+        self.roi_capture = True  # rows cut on device. Disabled after first failure
         if connect_now: self._startConnectionCheck()
 
     def connect(self):
@@ -55,7 +120,16 @@ class UsbConnector(object):
         if function not in self.checkingConnectionFunctions:
             self.checkingConnectionFunctions.append(function)
 
+    @staticmethod
+    def listDeviceSerials() -> list:
+        try:
+            return parse_adb_devices(os.popen("adb devices").read())
+        except:
+            return []
+
     def getDeviceSerialNo(self):
+        if self.serial is not None:
+            return self.serial if self.serial in self.listDeviceSerials() else None
         try:
             device = os.popen("adb devices").read().split('\n', 1)[1].split("device")[0].strip()
             device = None if device == '' else device
@@ -79,8 +153,13 @@ class UsbConnector(object):
         self.checkingConnectionChange(True)
         ports = [5037, 62001]
         ok = False
-        os.system("adb disconnect")
-        dev = 'device'
+        dev = self.serial
+        if self.serial is not None:
+            # given device only: adb connect/disconnect would drop the other devices of a farm
+            ports = []
+            ok = self.getDeviceSerialNo() is not None
+        else:
+            os.system("adb disconnect")
         for p in ports:
             os.system("adb connect {}:{}".format(self._host, p))
             dev = self.getDeviceSerialNo()
@@ -112,9 +191,53 @@ class UsbConnector(object):
             return ''
         return self.my_device.get_serial_no()
 
+    def getDeviceSerial(self) -> str:
+        return self._get_device_id()
+
+    def _screencap_raw(self):
+        """
+        Gets raw RGBA framebuffer (no png encoding on device) through an exec service (no tty newline mangling)
+        """
+        conn = self.my_device.create_connection()
+        with conn:
+            conn.send("exec:/system/bin/screencap")
+            return conn.read_all()
+
+    def adb_exec_stream(self, cmd: str):
+        """
+        Opens a long lived exec connection running cmd on device. Returned connection has to be closed by caller.
+        """
+        if not self.connected:
+            return None
+        conn = self.my_device.create_connection()
+        conn.send("exec:" + cmd)
+        return conn
+
+    def _capture_raw(self):
+        """
+        Returns (width, height, pixels) from a raw screencap, None on failure (caller captures a png instead).
+        If raw capture is not supported (no exec service, unsupported header or pixel format) this connector
+        switches to png captures. I/O errors only fall back for this frame.
+        """
+        try:
+            data = self._screencap_raw()
+            self._raw_header = raw_screencap_header(data)
+            return decode_raw_screencap(data)
+        except (ValueError, RuntimeError) as e:
+            logging.warning("Raw screen capture unavailable (%s). Falling back to png capture" % str(e))
+            self.capture_mode = ScreenCaptureMode.Png
+            return None
+        except Exception as e:
+            logging.warning("Raw screen capture failed (%s). Using png capture for this frame" % str(e))
+            return None
+
     def adb_get_size(self) -> tuple:
         if not self.connected:
             return 0, 0
+        if self.capture_mode == ScreenCaptureMode.Raw:
+            captured = self._capture_raw()
+            if captured is not None:
+                return captured[0], captured[1]
         bytes_screen = self.my_device.screencap()
         im = Image.open(io.BytesIO(bytes_screen))
         w, h = im.size
@@ -134,15 +257,69 @@ class UsbConnector(object):
     def adb_screen_getpixels(self, return_pillow:bool):
         if not self.connected:
             return np.zeros((1080, 2220))
+        if self.capture_mode == ScreenCaptureMode.Raw:
+            captured = self._capture_raw()
+            if captured is not None:
+                w, h, pixels = captured
+                if return_pillow:
+                    return Image.frombuffer("RGBA", (w, h), pixels, "raw", "RGBA", 0, 1)
+                return pixels
         bytes_screen = self.my_device.screencap()
         im = Image.open(io.BytesIO(bytes_screen))
         if not return_pillow:
-            pixval = np.array(im.getdata())
+            # same uint8 RGBA layout of raw captures
+            pixval = np.asarray(im.convert("RGBA")).reshape(-1, 4)
             im.close()
             return pixval
         else:
             return im
 
+    def _screencap_raw_bands(self, bands: list) -> bytes:
+        """
+        Captures screen once on device and sends back only given row bands, concatenated.
+        """
+        w, h, header = self._raw_header
+        row = w * 4
+        parts = ["/system/bin/screencap > %s" % self.roi_tmp_file]
+        for y1, y2 in bands:
+            parts.append("tail -c +%d %s | head -c %d" % (header + y1 * row + 1, self.roi_tmp_file, (y2 - y1) * row))
+        conn = self.my_device.create_connection()
+        with conn:
+            conn.send("exec:" + " && ".join(parts))
+            return conn.read_all()
+
+    def adb_screen_getregions(self, bboxes: list) -> SparseFrame:
+        """
+        Captures only the rows needed by given absolute [x1, y1, x2, y2] boxes (y2 excluded).
+        With raw capture rows are cut on device, otherwise (or once that failed) a full frame is cropped on host.
+        """
+        if not self.connected:
+            return None
+        if self.capture_mode == ScreenCaptureMode.Raw and self._raw_header is None:
+            self._capture_raw()
+        if self.capture_mode == ScreenCaptureMode.Raw and self.roi_capture and self._raw_header is not None:
+            w, h, _ = self._raw_header
+            bands = merge_row_bands(bboxes, h)
+            try:
+                data = self._screencap_raw_bands(bands)
+                expected = sum(y2 - y1 for y1, y2 in bands) * w * 4
+                if len(data) != expected:
+                    raise ValueError("got %d bytes instead of %d" % (len(data), expected))
+                frame = SparseFrame(w, h)
+                offset = 0
+                for y1, y2 in bands:
+                    size = (y2 - y1) * w * 4
+                    frame.addBand(y1, np.frombuffer(data, dtype=np.uint8, count=size, offset=offset))
+                    offset += size
+                return frame
+            except Exception as e:
+                logging.warning("Region capture failed (%s). Cropping full frames instead" % str(e))
+                self.roi_capture = False
+        with self.adb_screen_getpixels(True) as im:
+            w, h = im.size
+            full = np.asarray(im.convert("RGBA"))
+        return SparseFrame.fromFullFrame(full, w, h, merge_row_bands(bboxes, h))
+
     def adb_swipe(self, locations, s) -> bool:
         if not self.connected:
             return False
@@ -158,6 +335,25 @@ class UsbConnector(object):
         self.my_device.input_swipe(int(x1), int(y1), int(x2), int(y2), s)
         return True
 
+    def adb_swipe_macro(self, steps: list) -> bool:
+        """
+        Executes all swipes of a compiled macro (see MacroCompiler.compile) with one shell command,
+        returning when last step ends.
+        """
+        if not self.connected:
+            return False
+        self.my_device.shell(MacroCompiler.toScript(steps))
+        return True
+
+    def adb_cancel_macro(self) -> bool:
+        """
+        Stops the running macro script after its current swipe.
+        """
+        if not self.connected:
+            return False
+        self.my_device.shell(MacroCompiler.cancelScript())
+        return True
+
     def adb_tap(self, coord) -> bool:
         if not self.connected:
             return False
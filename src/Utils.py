@@ -5,7 +5,11 @@ import logging
 
 
 def get_matrix_diff(mat1, mat2):
-    dist = np.mean(np.abs(mat1 - mat2))
+    if mat1.dtype == np.uint8 and mat2.dtype == np.uint8:
+        # int16 is enough for pixels difference and avoids uint8 wrap around
+        dist = np.mean(np.abs(np.subtract(mat1, mat2, dtype=np.int16)))
+    else:
+        dist = np.mean(np.abs(mat1 - mat2))
     return dist
 
 
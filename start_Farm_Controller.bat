@@ -0,0 +1,3 @@
+@echo off
+python.exe FarmController.py
+pause
\ No newline at end of file
@@ -0,0 +1,49 @@
+from unittest import TestCase
+
+import numpy as np
+
+from src.AbilityMatcher import AbilityMatcher
+from src.Utils import get_matrix_diff
+
+
+class TestAbilityMatcher(TestCase):
+
+    def setUp(self) -> None:
+        rs = np.random.RandomState(5)
+        self.templates = {"ab_%d" % i: rs.randint(0, 256, (8, 8, 4)).astype(np.uint8) for i in range(6)}
+        self.matcher = AbilityMatcher(self.templates)
+        self.rs = rs
+
+    def test_distances_as_matrix_diff(self):
+        crops = [self.rs.randint(0, 256, (8, 8, 4)).astype(np.uint8) for _ in range(3)]
+        dists = self.matcher.distances(crops)
+        assert dists.shape == (3, 6)
+        for i, crop in enumerate(crops):
+            for j, name in enumerate(self.matcher.names):
+                assert abs(dists[i, j] - get_matrix_diff(crop, self.templates[name])) < 1e-9
+
+    def test_match_nearest_under_threshold(self):
+        near = self.templates["ab_4"].astype(np.int16) + 1
+        crops = [np.clip(near, 0, 255).astype(np.uint8), self.templates["ab_1"],
+                 self.rs.randint(0, 256, (8, 8, 4)).astype(np.uint8)]
+        found, dists = self.matcher.match(crops, threshold=5)
+        assert found == ["ab_4", "ab_1", "unknown"]
+        assert dists[1, self.matcher.names.index("ab_1")] == 0
+
+    def test_skips_wrong_shapes(self):
+        templates = dict(self.templates)
+        templates["small"] = np.zeros((4, 4, 4), dtype=np.uint8)
+        assert "small" not in AbilityMatcher(templates).names
+        with self.assertLogs(level="WARNING") as logs:
+            AbilityMatcher(templates, kind="door")
+        assert "Door template 'small'" in logs.output[0]
+
+    def test_prefilter_same_match(self):
+        matcher = AbilityMatcher(self.templates, prefilter_k=2)
+        crops = [self.templates["ab_3"], self.templates["ab_0"]]
+        found, dists = matcher.match(crops, threshold=5)
+        assert found == ["ab_3", "ab_0"]
+        # exact distances only for the shortlist
+        assert np.isfinite(dists).sum(axis=1).tolist() == [2, 2]
+        exact = self.matcher.distances(crops)
+        assert np.array_equal(dists[np.isfinite(dists)], exact[np.isfinite(dists)])
@@ -37,3 +37,105 @@ class TestCaveEngine(TestCase):
         assert new_level == self.engine.currentLevel, "Level not changed"
         assert self.level_signal_arrived, "Signal for level change not arrived"
 
+
+    def test_react_popups_table(self):
+        states = ["in_game"]
+        taps = []
+        self.engine.screen_connector.getFrame = lambda: None
+        self.engine.screen_connector.getFrameState = lambda frame=None: states.pop(0)
+        self.engine.tap = lambda name: taps.append(name)
+        self.engine.wait = lambda s: None
+        assert self.engine.reactGamePopups() == 0
+        states.extend(["devil_question", "unknown", "on_pause", "in_game"])
+        assert self.engine.reactGamePopups() == 2
+        assert taps == ['daemon_reject', 'resume']
+        states.extend(["menu_home"])
+        with self.assertRaises(Exception):
+            self.engine.reactGamePopups()
+
+    def test_wait_until(self):
+        import time
+        import threading
+        states = ["unknown", "unknown", "endgame"]
+        self.engine.screen_connector.getFrameState = lambda frame=None: states.pop(0) if len(states) > 1 else states[0]
+        start = time.monotonic()
+        assert self.engine.wait(5, self.engine.untilState("endgame"), poll=0.01)
+        assert time.monotonic() - start < 1
+        assert not self.engine.wait(0.05, lambda: False, poll=0.01)
+        threading.Timer(0.1, self.engine.setStopRequested).start()
+        start = time.monotonic()
+        with self.assertRaises(SystemExit):
+            self.engine.wait(5)
+        assert time.monotonic() - start < 1
+
+    def test_wait_until_states(self):
+        import time
+        states = ["unknown", "unknown", "menu_home"]
+        self.engine.screen_connector.static_coords = {"menu_home": {}, "endgame": {}}
+        self.engine.screen_connector.getFrame = lambda: None
+        self.engine.screen_connector.checkFrame = lambda name, frame=None: name == (
+            states.pop(0) if len(states) > 1 else states[0])
+        start = time.monotonic()
+        assert self.engine.wait_until(["endgame", "menu_home"], 5, poll=0.01) == "menu_home"
+        assert time.monotonic() - start < 1
+        assert self.engine.wait_until(["endgame"], 0.05, poll=0.01) is None
+        assert self.engine.wait_while(["endgame"], 5, poll=0.01)
+        assert not self.engine.wait_while(["menu_home"], 0.05, poll=0.01)
+        start = time.monotonic()
+        assert self.engine.wait_until(["no_coords_saved"], 0.1) is None
+        assert time.monotonic() - start >= 0.1
+
+    def test_wait_until_timing_profile(self):
+        import time
+        self.engine.timing_profile.path = os.path.join("datas", "device_timings.json")
+        self.engine.timing_profile.min_samples = 1
+        self.engine.timing_profile.select("1080x1920", "serial1")
+        self.engine.screen_connector.static_coords = {"menu_home": {}}
+        self.engine.screen_connector.getFrame = lambda: None
+        self.engine.screen_connector.checkFrame = lambda name, frame=None: True
+        self.engine.last_action = "tap:start"
+        self.engine.calibrating = True
+        assert self.engine.wait_until(["menu_home"], 5, poll=0.01) == "menu_home"
+        self.engine.saveTimingProfile()
+        assert os.path.exists(self.engine.timing_profile.path)
+        assert self.engine.timing_profile.budget("tap:start>menu_home", 5) < 1
+        self.engine.calibrating = False
+        self.engine.screen_connector.checkFrame = lambda name, frame=None: False
+        start = time.monotonic()
+        assert self.engine.wait_until(["menu_home"], 5, poll=0.01) is None
+        assert time.monotonic() - start < 1
+
+    def test_pause_wakes_wait(self):
+        import time
+        import threading
+        self.engine.runStatiscticsSave = lambda: None
+        threading.Timer(0.1, self.engine.setPauseRequested).start()
+        start = time.monotonic()
+        with self.assertRaises(SystemExit):
+            self.engine.wait(60)
+        assert time.monotonic() - start < 1
+
+    def test_let_play_records_only_cleared_rooms(self):
+        rooms = []
+        connector = self.engine.screen_connector
+        connector.getLineExpBar = lambda frame=None: None
+        connector.getFrame = lambda: None
+        self.engine.checkIfDead = lambda: None
+        self.engine.play_scheduler.endRoom = lambda cleared: rooms.append(cleared)
+        self.engine.letPlay_ingame = lambda *args, **kwargs: False
+        connector.getFrameState = lambda frame=None: "in_game"
+        self.engine.letPlay(60)
+        self.engine.letPlay_outgame = lambda i, state: (False, False)
+        connector.getFrameState = lambda frame=None: "endgame"
+        self.engine.letPlay(60)
+        assert rooms == [True, False]
+
+    def test_wait_input_raises_command_error(self):
+        from concurrent.futures import Future
+        future = Future()
+        future.set_exception(ConnectionError("device offline"))
+        with self.assertRaises(ConnectionError):
+            self.engine.waitInput(future)
+        future = Future()
+        future.cancel()
+        assert not self.engine.waitInput(future)
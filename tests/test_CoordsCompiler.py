@@ -0,0 +1,30 @@
+from unittest import TestCase
+
+import numpy as np
+
+from src.CoordsCompiler import CoordsCompiler
+
+
+class TestCoordsCompiler(TestCase):
+
+    def setUp(self) -> None:
+        self.w, self.h = 1081, 2339
+        self.compiler = CoordsCompiler(self.w, self.h)
+
+    def test_buttons_and_movements(self):
+        buttons = self.compiler.buttons({"start": [0.5, 0.77], "swipe": [0.1, 0.2, 0.3, 0.4]})
+        assert buttons["start"].tolist() == [int(0.5 * self.w), int(0.77 * self.h)]
+        assert buttons["swipe"].tolist() == [int(0.1 * self.w), int(0.2 * self.h), int(0.3 * self.w),
+                                             int(0.4 * self.h)]
+        vectors = self.compiler.movements({"n": [[0.5, 0.8], [0.5, 0.6]]})
+        assert vectors["n"].tolist() == [int(0.5 * self.w), int(0.8 * self.h), int(0.5 * self.w), int(0.6 * self.h)]
+
+    def test_checks_same_offsets(self):
+        rs = np.random.RandomState(0)
+        coords = {"state_%d" % i: {"coordinates": rs.rand(i + 1, 2).tolist()} for i in range(20)}
+        indices = self.compiler.checks(coords)
+        for name, v in coords.items():
+            expected = [int(int(p[1] * self.h) * self.w + int(p[0] * self.w)) for p in v["coordinates"]]
+            assert indices[name].tolist() == expected, name
+        assert self.compiler.flatIndices([]).shape == (0,)
+        assert indices[name].dtype == np.int64
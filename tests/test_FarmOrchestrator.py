@@ -0,0 +1,53 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+from src.FarmOrchestrator import FarmOrchestrator
+from src.UsbConnector import UsbConnector, parse_adb_devices
+
+
+class TestFarmOrchestrator(TestCase):
+
+    def setUp(self) -> None:
+        self.folder = tempfile.mkdtemp()
+        data_path = os.path.join(self.folder, "datas")
+        os.makedirs(os.path.join(data_path, "abilities"))
+        with open(os.path.join(data_path, "abilities", "tier_list.json"), 'w') as file:
+            file.write(json.dumps({"multishot": 1}))
+        self.farm_path = os.path.join(self.folder, "farm")
+        self.farm = FarmOrchestrator(data_path, self.farm_path)
+
+    def tearDown(self) -> None:
+        self.farm.stop(timeout=1)
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_parse_adb_devices(self):
+        output = "List of devices attached\n127.0.0.1:62001\tdevice\nemulator-5556\toffline\nR58M\tdevice\n\n"
+        assert parse_adb_devices(output) == ["127.0.0.1:62001", "R58M"]
+
+    def test_discover_isolated_engines(self):
+        with patch.object(UsbConnector, "listDeviceSerials", return_value=["127.0.0.1:62001", "R58M"]):
+            assert self.farm.discover() == ["127.0.0.1:62001", "R58M"]
+            assert self.farm.discover() == []
+        first, second = self.farm.devices["127.0.0.1:62001"], self.farm.devices["R58M"]
+        assert first.connector.serial == "127.0.0.1:62001"
+        assert first.engine.screen_connector is not second.engine.screen_connector
+        assert first.engine.local_settings_path == os.path.join(self.farm_path, "127.0.0.1_62001",
+                                                               "current_settings.json")
+        assert os.path.exists(first.engine.local_settings_path)
+        assert os.path.exists(os.path.join(self.farm_path, "R58M", "statistics.csv"))
+
+    def test_throughput(self):
+        with patch.object(UsbConnector, "listDeviceSerials", return_value=["a", "b"]):
+            self.farm.discover()
+        for serial, games in [("a", 3), ("b", 1)]:
+            device = self.farm.devices[serial]
+            device.engine.games_finished = games
+            device.start_time = time.monotonic() - 1800
+        rates = self.farm.throughput()
+        assert abs(rates["a"] - 6) < 0.1 and abs(rates["b"] - 2) < 0.1
+        assert abs(rates["total"] - 8) < 0.1
+        assert self.farm.start() == 0  # no adb device connected
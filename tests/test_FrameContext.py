@@ -0,0 +1,49 @@
+from unittest import TestCase
+
+import numpy as np
+from PIL import Image
+
+from src.FrameContext import FrameContext
+from src.StateClassifier import StateClassifier
+
+
+class TestFrameContext(TestCase):
+
+    def setUp(self) -> None:
+        self.w, self.h = 8, 6
+        self.pixels = np.random.RandomState(4).randint(0, 256, (self.w * self.h, 4)).astype(np.uint8)
+        self.frame = FrameContext(self.pixels, self.w, self.h)
+
+    def test_views_share_buffer(self):
+        assert np.shares_memory(self.frame.hwc, self.pixels)
+        assert np.array_equal(self.frame[10], self.pixels[10])
+        assert np.array_equal(self.frame[3:9], self.pixels[3:9])
+        assert np.array_equal(self.frame.crop([1, 2, 4, 5]), self.pixels.reshape(self.h, self.w, 4)[2:5, 1:4])
+        assert self.frame.pil.size == (self.w, self.h)
+        assert self.frame.pil.getpixel((3, 2)) == tuple(self.pixels[2 * self.w + 3])
+        assert np.asarray(self.frame).shape == (self.w * self.h, 4)
+
+    def test_memo_computed_once(self):
+        calls = []
+        for _ in range(3):
+            value = self.frame.memo("feature", lambda: calls.append(1) or len(calls))
+        assert value == 1 and len(calls) == 1
+
+    def test_wrap(self):
+        assert FrameContext.wrap(self.frame, self.w, self.h) is self.frame
+        im = Image.fromarray(self.pixels.reshape(self.h, self.w, 4))
+        assert np.array_equal(FrameContext.wrap(im, 0, 0).flat, self.pixels)
+
+    def test_classifier_accepts_context(self):
+        px = self.pixels[2 * self.w + 4]
+        coords = {"state": {"coordinates": [[0.5, 0.34]], "values": [px.tolist()], "around": 1}}
+        classifier = StateClassifier(coords, self.w, self.h)
+        assert classifier.classify(self.frame) == "state"
+
+    def test_png_pixels_converted_once(self):
+        rgb = self.pixels[:, :3].astype(np.int64)
+        frame = FrameContext(rgb, self.w, self.h)
+        assert frame.flat.dtype == np.uint8 and frame.flat.shape == (self.w * self.h, 4)
+        assert np.array_equal(frame.flat[:, :3], self.pixels[:, :3])
+        assert (frame.flat[:, 3] == 255).all()
+        assert frame.pil.getpixel((0, 0)) == tuple(frame.flat[0])
@@ -0,0 +1,84 @@
+from unittest import TestCase
+
+import numpy as np
+
+from src.GameScreenConnector import GameScreenConnector
+
+
+class TestGameScreenConnector(TestCase):
+
+    def setUp(self) -> None:
+        self.w, self.h = 40, 60
+        self.screen = GameScreenConnector("datas")
+        self.screen.width, self.screen.height = self.w, self.h
+        self.screen.static_coords = {
+            "white_corner": {"coordinates": [[0.0, 0.0], [0.5, 0.5]],
+                             "values": [[255, 255, 255, 255], [255, 255, 255, 255]],
+                             "around": 3}}
+        self.frame = np.zeros((self.w * self.h, 4), dtype=np.uint8)
+        self.frame[0] = [255, 255, 255, 255]
+        self.frame[30 * self.w + 20] = [253, 254, 255, 255]
+
+    def test_check_frame_fast_and_debug(self):
+        assert self.screen.checkFrame("white_corner", self.frame)
+        self.screen.debug = True
+        assert self.screen.checkFrame("white_corner", self.frame)
+        self.frame[0] = [240, 255, 255, 255]
+        assert not self.screen.checkFrame("white_corner", self.frame)
+        self.screen.debug = False
+        assert not self.screen.checkFrame("white_corner", self.frame)
+
+    def test_explain_check(self):
+        table = self.screen.explainCheck("white_corner", self.frame)
+        assert "|  253  254  255 |  255  255  255 |" in table
+        assert "  equal" in table
+        self.frame[0] = [0, 0, 0, 255]
+        assert "not equal" in self.screen.explainCheck("white_corner", self.frame)
+
+    def test_detect_doors_open(self):
+        from src.AbilityMatcher import AbilityMatcher
+        rs = np.random.RandomState(1)
+        templates = {}
+        for name in self.screen.door_templates:
+            templates[name] = {"bbox": [4, 6, 14, 10], "th": 25,
+                               "template": rs.randint(0, 256, (4, 10, 4)).astype(np.uint8)}
+        self.screen.general_templates = templates
+        self.screen.door_matcher = AbilityMatcher({n: v["template"] for n, v in templates.items()})
+        self.screen.hor_lines = {"hor_door_light": [0.0, 0.95, 0.5, 0.95], "hor_hp_bar": [0.0, 0.9, 1.0, 0.9]}
+        self.screen.height = 200  # hp bar offset lines are 50px apart
+        frame = np.zeros((200, self.w, 4), dtype=np.uint8)
+        assert self.screen.detectDoorsOpen(frame.reshape(-1, 4)) is None
+        assert not self.screen.checkDoorsOpen1(frame.reshape(-1, 4))
+        frame[6:10, 4:14] = templates["doors_open1"]["template"]
+        assert self.screen.detectDoorsOpen(frame.reshape(-1, 4)) == "doors_open1"
+        assert self.screen.checkDoorsOpen1(frame.reshape(-1, 4)) and not self.screen.checkDoorsOpen2(frame.reshape(-1, 4))
+        frame[190, :20] = [255, 255, 200, 255]
+        assert self.screen.detectDoorsOpen(frame.reshape(-1, 4)) == "light"
+
+    def test_frame_context_memoizes_templates(self):
+        from src.FrameContext import FrameContext
+        self.screen.general_templates = {"t": {"bbox": [0, 0, 2, 2], "th": 5,
+                                               "template": np.full((2, 2, 4), 255, dtype=np.uint8)}}
+        frame = FrameContext(self.frame, self.w, self.h)
+        calls = []
+        distance = self.screen._templateDistance
+        self.screen._templateDistance = lambda v, f: calls.append(1) or distance(v, f)
+        assert not self.screen._check_general_template("t", frame)
+        assert not self.screen._check_general_template("t", frame)
+        assert len(calls) == 1
+        assert self.screen.checkFrame("white_corner", frame)
+
+    def test_get_frame_single_type(self):
+        from src.FrameContext import FrameContext
+
+        class FakeConnector:
+            def adb_screen_getpixels(self, return_pillow):
+                return frame_pixels
+
+        frame_pixels = self.frame
+        self.screen.device_connector = FakeConnector()
+        frame = self.screen.getFrame()
+        assert isinstance(frame, FrameContext)
+        assert self.screen.checkFrame("white_corner", frame)
+        assert frame.pil.getpixel((20, 30)) == (253, 254, 255, 255)
+        assert self.screen.getFrame(return_pillow=True).size == (self.w, self.h)
@@ -0,0 +1,82 @@
+import time
+import threading
+from unittest import TestCase
+
+from src.InputDispatcher import InputDispatcher
+
+
+class FakeConnector:
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+
+    def adb_swipe(self, locations, s):
+        self.calls.append(("swipe", locations, s))
+        self.release.wait(2)
+        return True
+
+    def adb_swipe_macro(self, steps):
+        self.calls.append(("macro", steps))
+        self.release.wait(2)
+        return True
+
+    def adb_cancel_macro(self):
+        self.calls.append(("cancel_macro",))
+        self.release.set()
+        return True
+
+    def adb_tap(self, coord):
+        self.calls.append(("tap", coord))
+        return True
+
+
+class TestInputDispatcher(TestCase):
+
+    def setUp(self) -> None:
+        self.connector = FakeConnector()
+        self.dispatcher = InputDispatcher(self.connector)
+
+    def tearDown(self) -> None:
+        self.connector.release.set()
+        self.dispatcher.stop()
+
+    def test_commands_in_order_without_blocking(self):
+        first = self.dispatcher.swipe([0, 0, 10, 10], 0.5)
+        tap = self.dispatcher.tap((3, 4))
+        assert not tap.done()  # caller is free while device swipes
+        self.connector.release.set()
+        assert first.result(timeout=2) and tap.result(timeout=2)
+        assert [c[0] for c in self.connector.calls] == ["swipe", "tap"]
+
+    def test_cancel_pending(self):
+        running = self.dispatcher.swipe([0, 0, 10, 10], 0.5)
+        pause = self.dispatcher.pause(5)
+        last = self.dispatcher.tap((1, 1))
+        deadline = time.time() + 2
+        while len(self.connector.calls) == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert self.dispatcher.cancel() == 2
+        assert pause.cancelled() and last.cancelled()
+        self.connector.release.set()
+        assert running.result(timeout=2)
+        assert [c[0] for c in self.connector.calls] == ["swipe"]
+
+    def test_cancel_interrupts_pause(self):
+        pause = self.dispatcher.pause(5)
+        deadline = time.time() + 2
+        while not pause.running() and time.time() < deadline:
+            time.sleep(0.01)
+        start = time.time()
+        self.dispatcher.cancel()
+        assert pause.result(timeout=2) is False
+        assert time.time() - start < 1
+
+    def test_cancel_running_macro(self):
+        macro = self.dispatcher.macro([[0, 0, 10, 10, 1, 0]])
+        deadline = time.time() + 2
+        while len(self.connector.calls) == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        self.dispatcher.cancel()
+        assert macro.result(timeout=2)
+        assert [c[0] for c in self.connector.calls] == ["macro", "cancel_macro"]
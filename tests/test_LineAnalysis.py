@@ -0,0 +1,67 @@
+from unittest import TestCase
+
+import numpy as np
+
+from src import LineAnalysis
+from src.GameScreenConnector import GameScreenConnector
+
+
+class TestLineAnalysis(TestCase):
+
+    def setUp(self) -> None:
+        self.screen = GameScreenConnector("datas")
+        rs = np.random.RandomState(3)
+        self.line = rs.randint(0, 256, (300, 4)).astype(np.uint8)
+        self.line[::7] = self.screen.green_hp
+        self.line[::11] = [80, 170, 60, 255]
+
+    def test_color_mask_as_pixel_equals(self):
+        for color, around in [(self.screen.green_hp, [8, 12, 8]), (self.screen.yellow_experience, 3), ([0, 0, 0], 60)]:
+            expected = [self.screen.pixel_equals(px, color, around) for px in self.line]
+            assert LineAnalysis.color_mask(self.line, color, around).tolist() == expected
+
+    def test_filter_line_by_color(self):
+        masked = self.screen.filterLineByColor(self.line)
+        assert masked.shape == (300, 4)
+        assert list(masked[7]) == self.screen.green_hp and list(masked[11]) == self.screen.green_hp
+        assert list(masked[1]) == [0, 0, 0, 0]
+
+    def test_ranges_and_changes(self):
+        white = np.full((10, 4), 255, dtype=np.uint8)
+        assert LineAnalysis.all_in_range(white, [251, 251, 191], [255, 255, 255])
+        white[3, 2] = 190
+        assert not LineAnalysis.all_in_range(white, [251, 251, 191], [255, 255, 255])
+        assert LineAnalysis.all_in_range([], [255, 255, 255], [255, 255, 255])
+        changed = self.line.copy()
+        changed[250, 1] = (int(changed[250, 1]) + 3) % 256
+        # compared on the shortest line
+        assert not LineAnalysis.has_changed(self.line, changed[:200], around=0)
+        assert LineAnalysis.has_changed(self.line, changed, around=2)
+        assert not LineAnalysis.has_changed(self.line, self.line.copy(), around=0)
+        mask = np.zeros(20, dtype=bool)
+        assert not LineAnalysis.has_changed(mask, mask.copy())
+        mask2 = mask.copy()
+        mask2[4] = True
+        assert LineAnalysis.has_changed(mask, mask2)
+
+    def test_largest_run(self):
+        mask = np.zeros(200, dtype=bool)
+        mask[20:25] = True  # noise, too short
+        mask[100:141] = True
+        mask[120] = False  # hole inside bar
+        center, length, confidence = LineAnalysis.largest_run(mask)
+        assert center == 120 and length == 39 and confidence == 1.0
+        assert LineAnalysis.runs(mask).tolist() == [[20, 25], [100, 120], [121, 141]]
+        mask[150:170] = True
+        center, length, confidence = LineAnalysis.largest_run(mask)
+        assert center == 120 and 0.5 < confidence < 1
+        assert LineAnalysis.largest_run(np.zeros(10, dtype=bool)) == (-1, 0, 0.0)
+
+    def test_player_location(self):
+        self.screen.width, self.screen.height = 100, 10
+        self.screen.hor_lines = {"hor_hp_bar": [0.0, 0.5, 1.0, 0.5]}
+        frame = np.zeros((100 * 10, 4), dtype=np.uint8)
+        frame[5 * 100 + 60:5 * 100 + 80] = self.screen.green_hp
+        center, confidence = self.screen.getPlayerLocation(frame)
+        assert center == 69.5 and confidence == 1.0
+        assert self.screen.getPlayerDecentering(frame)[0] == -19
@@ -0,0 +1,22 @@
+from unittest import TestCase
+
+from src.MacroCompiler import MacroCompiler
+
+
+class TestMacroCompiler(TestCase):
+
+    def setUp(self) -> None:
+        movements = {"n": [[0.5, 0.8], [0.5, 0.6]], "nw": [[0.5, 0.8], [0.4, 0.7]]}
+        self.compiler = MacroCompiler(movements, 1080, 1920)
+
+    def test_compile(self):
+        steps = self.compiler.compile(0.1, [['N', .5], ['nw', 2.5]])
+        assert steps == [[540, 1536, 540, 1152, .5, 0.1], [540, 1536, 432, 1344, 2.5, 0.1]]
+        assert abs(MacroCompiler.duration(steps) - 3.2) < 1e-9
+
+    def test_script(self):
+        script = MacroCompiler.toScript(self.compiler.compile(0, [['n', .5], ['nw', 2.5]]))
+        assert script.startswith("echo $$ > %s; " % MacroCompiler.pid_file)
+        assert "input swipe 540 1536 540 1152 500; input swipe 540 1536 432 1344 2500; rm -f" in script
+        assert "sleep" not in script
+        assert "sleep 0.250" in MacroCompiler.toScript(self.compiler.compile(.25, [['n', .5]]))
@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from src.PlayScheduler import PlayScheduler
+
+
+class TestPlayScheduler(TestCase):
+
+    def setUp(self) -> None:
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "play_timings.json")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.folder)
+
+    def test_intervals_from_history(self):
+        scheduler = PlayScheduler(self.path, min_interval=0.5, max_interval=6)
+        scheduler.startRoom(6, 3)
+        assert scheduler.nextInterval() == 3  # no history
+        assert scheduler.nextInterval(activity=True) == 0.5
+        scheduler.history = {"6": {"3": [30, 36, 60]}}
+        assert scheduler.nextInterval() == 6  # long before expected clear time
+        scheduler.room_start -= 20
+        assert scheduler.nextInterval() == 6
+        scheduler.history = {"6": {"3": [12]}}
+        assert scheduler.nextInterval() == 2
+
+    def test_history_persisted(self):
+        scheduler = PlayScheduler(self.path, history_size=2)
+        for _ in range(3):
+            scheduler.startRoom(6, 3)
+            scheduler.room_start -= 5
+            scheduler.endRoom(cleared=True)
+        scheduler.startRoom(6, 4)
+        scheduler.endRoom(cleared=False)
+        loaded = PlayScheduler(self.path)
+        assert len(loaded.history["6"]["3"]) == 2 and "4" not in loaded.history["6"]
+        assert 5 <= loaded.expectedClearTime(6, 3) < 6
+        assert loaded.expectedClearTime(6, 4) is None
+
+    def test_wait_counts_elapsed_time(self):
+        scheduler = PlayScheduler(self.path, max_interval=6)
+        scheduler.startRoom(1, 1)
+        scheduler.last_poll -= 2
+        assert 0.9 < scheduler.waitTime() <= 1
+        scheduler.last_poll -= 10
+        assert scheduler.waitTime() == 0
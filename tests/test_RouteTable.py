@@ -0,0 +1,41 @@
+import os
+import json
+import tempfile
+from unittest import TestCase
+from src.RouteTable import RouteTable
+from src.MacroCompiler import MacroCompiler
+
+
+class TestRouteTable(TestCase):
+
+    def setUp(self) -> None:
+        self.folder = tempfile.mkdtemp()
+        routes = {
+            "default": {"phases": {"cross": [["n", 1]], "exit": [["w", .5], ["ne", 2]]}},
+            "6": {"phases": {"cross": [["n", .5], ["popups", 2], ["e", 1]]},
+                  "levels": {"3,4": {"exit": [["e", 1]]}}},
+        }
+        for name, route in routes.items():
+            with open(os.path.join(self.folder, name + ".json"), 'w') as file:
+                file.write(json.dumps(route))
+        self.movements = {"n": [[0.5, 0.5], [0.5, 0.25]], "e": [[0.5, 0.5], [0.75, 0.5]],
+                          "w": [[0.5, 0.5], [0.25, 0.5]], "ne": [[0.5, 0.5], [0.75, 0.25]]}
+        self.table = RouteTable(self.folder)
+        self.table.compile(MacroCompiler(self.movements, 100, 200))
+
+    def test_compile_splits_on_popups(self):
+        cross = self.table.get(6, 1, "cross")
+        assert cross == [("macro", [[50, 100, 50, 50, .5, 0]], "n"), ("popups", 2),
+                         ("macro", [[50, 100, 75, 100, 1, 0]], "e")]
+
+    def test_overrides(self):
+        assert self.table.get(6, 3, "exit") == self.table.get(6, 4, "exit") == [
+            ("macro", [[50, 100, 75, 100, 1, 0]], "e")]
+        assert self.table.get(6, 5, "exit") == self.table.get(2, 5, "exit")
+        assert self.table.get(2, 5, "exit")[0][2] == "w ne"
+        assert self.table.get(2, 5, "boss_door") == []
+
+    def test_missing_folder(self):
+        table = RouteTable(os.path.join(self.folder, "missing"))
+        table.compile(MacroCompiler(self.movements, 100, 200))
+        assert table.get(6, 1, "cross") == []
@@ -0,0 +1,93 @@
+import socket
+import struct
+import time
+from unittest import TestCase
+
+import numpy as np
+
+from src.ScreenCaptureStream import ScreenCaptureStream
+from src.UsbConnector import ScreenCaptureMode
+
+
+def raw_frame(w, h, value):
+    return struct.pack('<IIII', w, h, 1, 0) + bytes([value]) * (w * h * 4)
+
+
+class _SocketConnection:
+    def __init__(self, sock):
+        self.socket = sock
+
+    def close(self):
+        self.socket.close()
+
+
+class _FakeStreamConnector:
+    def __init__(self, w, h):
+        self.w, self.h = w, h
+        self.capture_mode = ScreenCaptureMode.Raw
+        self.device_side, self.host_side = socket.socketpair()
+
+    def isConnected(self):
+        return True
+
+    def _screencap_raw(self):
+        return raw_frame(self.w, self.h, 0)
+
+    def adb_exec_stream(self, cmd):
+        return _SocketConnection(self.host_side)
+
+
+class TestScreenCaptureStream(TestCase):
+
+    def setUp(self) -> None:
+        self.conn = _FakeStreamConnector(4, 3)
+        self.stream = ScreenCaptureStream(self.conn, ring_size=3, max_frame_age=5, max_wait_fresh=2)
+        assert self.stream.start()
+
+    def tearDown(self) -> None:
+        self.stream.stop()
+        self.conn.device_side.close()
+
+    def _waitCaptured(self, n):
+        end = time.time() + 2
+        while self.stream.captured_frames < n and time.time() < end:
+            time.sleep(0.01)
+
+    def test_latest_frame(self):
+        self.conn.device_side.sendall(raw_frame(4, 3, 7))
+        frame = self.stream.getLatestFrame()
+        assert frame is not None
+        assert frame.shape == (12, 4)
+        assert np.all(frame == 7)
+
+    def test_dropped_frames(self):
+        for v in range(1, 6):
+            self.conn.device_side.sendall(raw_frame(4, 3, v))
+        self._waitCaptured(5)
+        assert self.stream.captured_frames == 5
+        assert self.stream.dropped_frames == 4
+        assert np.all(self.stream.getLatestFrame() == 5)
+
+    def test_frame_dropped_when_all_slots_busy(self):
+        self.conn.device_side.sendall(raw_frame(4, 3, 1))
+        self._waitCaptured(1)
+        with self.stream._cond:
+            self.stream._reading = set(range(self.stream.ring_size)) - {self.stream._latest}
+        self.conn.device_side.sendall(raw_frame(4, 3, 2))
+        end = time.time() + 2
+        while self.stream.dropped_frames < 1 and time.time() < end:
+            time.sleep(0.01)
+        assert self.stream.dropped_frames == 1
+        assert self.stream.captured_frames == 1
+        with self.stream._cond:
+            self.stream._reading = set()
+        assert np.all(self.stream.getLatestFrame() == 1)
+        self.conn.device_side.sendall(raw_frame(4, 3, 3))
+        self._waitCaptured(2)
+        assert np.all(self.stream.getLatestFrame() == 3)
+
+    def test_stale_frame(self):
+        self.conn.device_side.sendall(raw_frame(4, 3, 1))
+        self._waitCaptured(1)
+        self.stream.max_wait_fresh = 0.05
+        assert self.stream.getLatestFrame(max_age=0.0) is None
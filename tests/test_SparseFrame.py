@@ -0,0 +1,38 @@
+from unittest import TestCase
+
+import numpy as np
+
+from src.SparseFrame import SparseFrame, merge_row_bands
+
+
+class TestSparseFrame(TestCase):
+
+    def setUp(self) -> None:
+        self.w, self.h = 20, 30
+        self.full = np.random.RandomState(0).randint(0, 256, (self.w * self.h, 4)).astype(np.uint8)
+        self.bands = merge_row_bands([[0, 2, 1, 3], [5, 4, 10, 6], [0, 20, 20, 21]], self.h, gap=2)
+        self.sparse = SparseFrame.fromFullFrame(self.full, self.w, self.h, self.bands)
+
+    def test_merge_row_bands(self):
+        assert self.bands == [[2, 6], [20, 21]]
+        assert merge_row_bands([[0, 28, 1, 40]], self.h) == [[28, 30]]
+
+    def test_pixels_as_full_frame(self):
+        for idx in [2 * self.w, 3 * self.w + 7, 5 * self.w + 19, 20 * self.w + 3]:
+            assert np.array_equal(self.sparse[idx], self.full[idx])
+        with self.assertRaises(IndexError):
+            _ = self.sparse[10 * self.w]
+
+    def test_slices_as_full_frame(self):
+        start = 4 * self.w + 5
+        assert np.array_equal(self.sparse[start:start + 10], self.full[start:start + 10])
+        # slice crossing into next captured row
+        start = 3 * self.w + 15
+        assert np.array_equal(self.sparse[start:start + 10], self.full[start:start + 10])
+
+    def test_crop(self):
+        crp = self.sparse.crop([3, 2, 12, 6])
+        expected = self.full.reshape(self.h, self.w, 4)[2:6, 3:12]
+        assert np.array_equal(crp, expected)
+        assert self.sparse.covers([0, 20, 5, 21])
+        assert not self.sparse.covers([0, 6, 5, 8])
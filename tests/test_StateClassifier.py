@@ -0,0 +1,62 @@
+from unittest import TestCase
+
+import numpy as np
+
+from src.GameScreenConnector import GameScreenConnector
+from src.StateClassifier import StateClassifier
+
+
+class TestStateClassifier(TestCase):
+
+    def setUp(self) -> None:
+        self.w, self.h = 40, 60
+        rs = np.random.RandomState(3)
+        self.coords = {}
+        for i in range(12):
+            n = rs.randint(1, 6)
+            state = {"coordinates": rs.rand(n, 2).tolist(),
+                     "values": rs.randint(0, 256, (n, 4)).tolist()}
+            if i % 3 == 1:
+                state["around"] = int(rs.randint(0, 20))
+            elif i % 3 == 2:
+                state["around"] = rs.randint(0, 20, 3).tolist()
+            self.coords["state_%d" % i] = state
+        self.coords["wrong_size"] = {"coordinates": [[0.1, 0.1]], "values": []}
+        self.screen = GameScreenConnector("datas")
+        self.screen.width, self.screen.height = self.w, self.h
+        self.screen.static_coords = self.coords
+        self.classifier = StateClassifier(self.coords, self.w, self.h)
+        self.rs = rs
+
+    def _frameMatching(self, name):
+        # random frame with pixels of given state set near expected values
+        frame = self.rs.randint(0, 256, (self.w * self.h, 4)).astype(np.uint8)
+        v = self.coords[name]
+        for attr, val in zip(v["coordinates"], v["values"]):
+            idx = int(attr[0] * self.w) + int(attr[1] * self.h) * self.w
+            frame[idx] = np.clip(np.array(val) + self.rs.randint(-3, 4, 4), 0, 255)
+        return frame
+
+    def test_same_results_as_points_check(self):
+        for name in self.coords:
+            for _ in range(5):
+                frame = self._frameMatching(name)
+                self.screen.state_classifier = None
+                expected = self.screen.getFrameStateComplete(frame)
+                expected_state = self.screen.getFrameState(frame)
+                matches = self.classifier.matches(frame)
+                assert [expected[k] for k in self.classifier.names] == matches.tolist()
+                assert expected_state == self.classifier.classify(frame)
+
+    def test_wrong_size_never_matches(self):
+        assert not self.classifier.matches(self._frameMatching("wrong_size"))[-1]
+
+    def test_evaluate_stack(self):
+        frames = np.stack([self._frameMatching(name) for name in self.coords])
+        matches, margins = self.classifier.evaluate(frames)
+        assert matches.shape == (len(frames), len(self.classifier.names))
+        assert margins.shape == (len(frames), len(self.classifier.indices))
+        for i, frame in enumerate(frames):
+            assert matches[i].tolist() == self.classifier.matches(frame).tolist()
+            for s in np.flatnonzero(matches[i]):
+                assert np.all(margins[i][self.classifier.segments == s] >= 0)
@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+from PIL import Image
+
+from src.TemplateStore import TemplateStore
+from src.Utils import get_matrix_diff
+
+
+class TestTemplateStore(TestCase):
+
+    def setUp(self) -> None:
+        self.folder = tempfile.mkdtemp()
+        self.paths = {}
+        for i, mode in enumerate(["RGBA", "RGB"]):
+            path = os.path.join(self.folder, "t%d.png" % i)
+            Image.new(mode, (6, 4), (10 * i, 20, 30)).save(path)
+            self.paths["t%d" % i] = path
+        self.cache_path = os.path.join(self.folder, "cache.npz")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.folder)
+
+    def test_load_uint8_rgba(self):
+        templates = TemplateStore(self.cache_path).load(self.paths)
+        for name in self.paths:
+            assert templates[name].dtype == np.uint8
+            assert templates[name].shape == (4, 6, 4)
+        assert list(templates["t1"][0, 0]) == [10, 20, 30, 255]
+        assert os.path.exists(self.cache_path)
+
+    def test_cache_invalidated_on_change(self):
+        TemplateStore(self.cache_path).load(self.paths)
+        Image.new("RGBA", (6, 4), (1, 2, 3, 4)).save(self.paths["t0"])
+        st = os.stat(self.paths["t0"])
+        os.utime(self.paths["t0"], ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        templates = TemplateStore(self.cache_path).load(self.paths)
+        assert list(templates["t0"][0, 0]) == [1, 2, 3, 4]
+
+    def test_signatures_cached(self):
+        def signature(t):
+            return t[:2, :2].copy()
+        store = TemplateStore(self.cache_path, signature=signature)
+        store.load(self.paths)
+        assert store.signatures["t1"].shape == (2, 2, 4)
+        store = TemplateStore(self.cache_path, signature=lambda t: None)
+        store.signature.cache_key = "signature"
+        store.load(self.paths)
+        assert store.signatures["t1"].shape == (2, 2, 4)
+
+    def test_uint8_matrix_diff(self):
+        a = np.zeros((2, 2, 4), dtype=np.uint8)
+        b = np.full((2, 2, 4), 10, dtype=np.uint8)
+        assert get_matrix_diff(a, b) == 10
+        assert get_matrix_diff(b, a) == 10
@@ -0,0 +1,36 @@
+import os
+import tempfile
+from unittest import TestCase
+from src.TimingProfile import TimingProfile
+
+
+class TestTimingProfile(TestCase):
+
+    def setUp(self) -> None:
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "device_timings.json")
+
+    def test_budget_default_until_fitted(self):
+        profile = TimingProfile(self.path, min_samples=3)
+        assert profile.budget("tap:start>menu_home", 6) == 6
+        profile.select("1080x1920", "serial1")
+        profile.record("tap:start>menu_home", 1.0)
+        profile.record("tap:start>menu_home", 1.2)
+        profile.fit()
+        assert profile.budget("tap:start>menu_home", 6) == 6
+
+    def test_fit_quantile_and_persist(self):
+        profile = TimingProfile(self.path, quantile=0.95, margin=0.5, min_samples=5, history_size=20)
+        profile.select("1080x1920", "serial1")
+        for i in range(30):
+            profile.record("tap:start>menu_home", 1.0 + (i % 10) / 10)
+        assert len(profile.profile["samples"]["tap:start>menu_home"]) == 20
+        budgets = profile.fit()
+        assert abs(budgets["tap:start>menu_home"] - (1.9 + 0.5)) < 0.01
+        profile.save()
+
+        loaded = TimingProfile(self.path)
+        loaded.select("1080x1920", "serial2")
+        assert loaded.budget("tap:start>menu_home", 6) == 6
+        loaded.select("1080x1920", "serial1")
+        assert loaded.budget("tap:start>menu_home", 6) == budgets["tap:start>menu_home"]
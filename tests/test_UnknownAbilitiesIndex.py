@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+from PIL import Image
+
+from src.UnknownAbilitiesIndex import UnknownAbilitiesIndex, dhash
+
+
+class TestUnknownAbilitiesIndex(TestCase):
+
+    def setUp(self) -> None:
+        self.folder = tempfile.mkdtemp()
+        rs = np.random.RandomState(2)
+        self.a = Image.fromarray(rs.randint(0, 256, (40, 40, 4)).astype(np.uint8))
+        self.b = Image.fromarray(rs.randint(0, 256, (40, 40, 4)).astype(np.uint8))
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.folder)
+
+    def test_near_duplicates_counted(self):
+        index = UnknownAbilitiesIndex(self.folder)
+        path, saved = index.add(self.a)
+        assert saved and os.path.basename(path) == "unknown_ability_0.png"
+        noisy = Image.fromarray(np.clip(np.asarray(self.a).astype(np.int16) + 2, 0, 255).astype(np.uint8))
+        assert index.add(noisy) == (path, False)
+        path_b, saved = index.add(self.b)
+        assert saved and os.path.basename(path_b) == "unknown_ability_1.png"
+        # reloaded from disk
+        index = UnknownAbilitiesIndex(self.folder)
+        assert index.next_id == 2
+        assert [e["count"] for e in index.entries] == [2, 1]
+
+    def test_rebuild_from_existing_files(self):
+        self.a.save(os.path.join(self.folder, "unknown_ability_7.png"))
+        index = UnknownAbilitiesIndex(self.folder)
+        assert index.next_id == 8
+        assert index.nearest(dhash(self.a)) == (0, 0)
+        assert not index.add(self.a)[1]
+
+    def test_duplicates_saved_on_flush(self):
+        index = UnknownAbilitiesIndex(self.folder, flush_hits=3)
+        index.add(self.a)
+        index.add(self.a)
+        assert UnknownAbilitiesIndex(self.folder).entries[0]["count"] == 1
+        index.flush()
+        assert UnknownAbilitiesIndex(self.folder).entries[0]["count"] == 2
+        for _ in range(3):
+            index.add(self.a)
+        assert UnknownAbilitiesIndex(self.folder).entries[0]["count"] == 5
@@ -0,0 +1,119 @@
+import io
+import struct
+from unittest import TestCase
+
+import numpy as np
+from PIL import Image
+
+from src.UsbConnector import UsbConnector, ScreenCaptureMode, decode_raw_screencap
+
+
+def build_raw_screencap(w, h, header_size=16, fmt=1):
+    pixels = np.arange(w * h * 4, dtype=np.uint32).astype(np.uint8)
+    header = struct.pack('<III', w, h, fmt)
+    if header_size == 16:
+        header += struct.pack('<I', 0)
+    return header + pixels.tobytes(), pixels.reshape(w * h, 4)
+
+
+class _FailingRawDevice:
+    def __init__(self, png_bytes):
+        self.png_bytes = png_bytes
+
+    def create_connection(self):
+        raise RuntimeError("no exec service")
+
+    def screencap(self):
+        return self.png_bytes
+
+
+class _DroppingRawDevice(_FailingRawDevice):
+    def create_connection(self):
+        raise ConnectionResetError("connection reset by peer")
+
+
+class _RawConnection:
+    def __init__(self, device):
+        self.device = device
+        self.cmd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def send(self, cmd):
+        self.cmd = cmd
+        self.device.commands.append(cmd)
+
+    def read_all(self):
+        return self.device.raw if self.cmd == "exec:/system/bin/screencap" else b"broken"
+
+
+class _NoBandsRawDevice:
+    def __init__(self, raw):
+        self.raw = raw
+        self.commands = []
+
+    def create_connection(self):
+        return _RawConnection(self)
+
+
+class TestUsbConnector(TestCase):
+
+    def test_decode_raw_header_16(self):
+        data, expected = build_raw_screencap(4, 3, header_size=16)
+        w, h, pixels = decode_raw_screencap(data)
+        assert (w, h) == (4, 3)
+        assert pixels.dtype == np.uint8
+        assert np.array_equal(pixels, expected)
+
+    def test_decode_raw_header_12(self):
+        data, expected = build_raw_screencap(5, 2, header_size=12)
+        w, h, pixels = decode_raw_screencap(data)
+        assert (w, h) == (5, 2)
+        assert np.array_equal(pixels, expected)
+
+    def test_decode_raw_wrong_format(self):
+        data, _ = build_raw_screencap(4, 3, fmt=5)
+        with self.assertRaises(ValueError):
+            decode_raw_screencap(data)
+
+    def test_raw_fallback_to_png(self):
+        im = Image.new("RGBA", (3, 2), (10, 20, 30, 255))
+        buf = io.BytesIO()
+        im.save(buf, format="PNG")
+        conn = UsbConnector(connect_now=False)
+        conn.connected = True
+        conn.my_device = _FailingRawDevice(buf.getvalue())
+        assert conn.capture_mode == ScreenCaptureMode.Raw
+        pixels = conn.adb_screen_getpixels(False)
+        assert conn.capture_mode == ScreenCaptureMode.Png, "Connector should fall back to png"
+        assert pixels.shape == (6, 4)
+        assert list(pixels[0]) == [10, 20, 30, 255]
+
+    def test_raw_io_error_falls_back_for_one_frame(self):
+        im = Image.new("RGBA", (3, 2), (10, 20, 30, 255))
+        buf = io.BytesIO()
+        im.save(buf, format="PNG")
+        conn = UsbConnector(connect_now=False)
+        conn.connected = True
+        conn.my_device = _DroppingRawDevice(buf.getvalue())
+        pixels = conn.adb_screen_getpixels(False)
+        assert conn.capture_mode == ScreenCaptureMode.Raw, "I/O errors should not disable raw capture"
+        assert list(pixels[0]) == [10, 20, 30, 255]
+        assert conn.adb_screen_getregions([[0, 0, 3, 1]]) is not None
+
+    def test_regions_fallback_to_full_frame(self):
+        data, expected = build_raw_screencap(4, 3)
+        conn = UsbConnector(connect_now=False)
+        conn.connected = True
+        conn.my_device = _NoBandsRawDevice(data)
+        for _ in range(3):
+            frame = conn.adb_screen_getregions([[0, 1, 4, 2]])
+            assert frame is not None
+        assert not conn.roi_capture
+        assert conn.capture_mode == ScreenCaptureMode.Raw
+        bands_cmds = [c for c in conn.my_device.commands if conn.roi_tmp_file in c]
+        assert len(bands_cmds) == 1, "Band capture should not be retried after a failure"